@@ -2,9 +2,8 @@
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D  # Necesario para la leyenda personalizada
 import numpy as np
-import csv
 import os
-from calculos import CalculadoraPsicrometrica  # Asegúrate de importar la clase correcta
+from calculos_vec import CalculadoraPsicrometrica, leer_columnas
 
 # ========= CONFIGURACIÓN DE LA CARTA =========
 Z = 2250  # (msnm)
@@ -33,44 +32,14 @@ def generar_carta_psicrometrica(z, Tbs_vals, phi_vals):
 
 # ========= FUNCIÓN DE LECTURA (Tbs y Tbh) =========
 def leer_tbs_tbh(filepath):
-    tbs_list = []
-    tbh_list = []
-    nombres_tbs = ['tbs', 't_seca', 't_bulbo_seco', 'temp', 't']
-    nombres_tbh = ['tbh', 't_humeda', 't_bulbo_humedo', 'wet', 'tw']
-
+    """Lee Tbs y Tbh con el lector común (alias 'tbs'/'tbh' de ALIAS_COLUMNAS)."""
     if not os.path.exists(filepath):
         print(f"Error: El archivo {filepath} no existe.")
         return [], []
-
-    with open(filepath, 'r', newline='', encoding='utf-8') as f:
-        sample = f.read(1024)
-        delim = ';' if ';' in sample and ',' not in sample else ','
-        f.seek(0)
-        reader = csv.reader(f, delimiter=delim)
-        rows = list(reader)
-        if not rows: return [], []
-
-        header = [h.strip().lower() for h in rows[0]]
-        idx_tbs = -1
-        idx_tbh = -1
-
-        for i, col in enumerate(header):
-            if col in nombres_tbs: idx_tbs = i
-            if col in nombres_tbh: idx_tbh = i
-
-        if idx_tbs == -1: idx_tbs = 0
-        if idx_tbh == -1: idx_tbh = 1
-
-        for row in rows[1:]:
-            try:
-                if len(row) > max(idx_tbs, idx_tbh):
-                    val_tbs = float(row[idx_tbs])
-                    val_tbh = float(row[idx_tbh])
-                    tbs_list.append(val_tbs)
-                    tbh_list.append(val_tbh)
-            except ValueError:
-                continue
-    return tbs_list, tbh_list
+    datos, informe = leer_columnas(filepath, ('tbs', 'tbh'))
+    if informe['invalidas']:
+        print(f"Aviso: se omitieron {informe['invalidas']} filas no numéricas de {filepath}.")
+    return datos['tbs'].tolist(), datos['tbh'].tolist()
 
 
 # ========= PROCESAMIENTO PRINCIPAL =========
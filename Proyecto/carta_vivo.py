@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Carta psicrométrica en vivo: el fondo se dibuja una sola vez y las lecturas
+# nuevas se agregan con blitting (sólo se redibuja la capa de puntos)
+from collections import deque
+import csv
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from calculos_vec import CalculadoraPsicrometrica, calcular_lote
+
+# ========= CONFIGURACIÓN =========
+Z = 2250  # (msnm)
+Tbs_vals = [t for t in range(0, 45, 5)]  # Rango eje X
+phi_vals = [i / 100 for i in range(10, 101, 10)]  # Curvas de HR
+VENTANA = 300  # lecturas visibles (300 x 2 s = 10 min)
+
+
+def generar_carta_lote(z, Tbs_vals, phi_vals):
+    """Igual que generar_carta_psicrometrica de carta_p2.py, con el motor por lotes."""
+    T, PHI = np.meshgrid(Tbs_vals, phi_vals)
+    res = calcular_lote(z, T.ravel(), PHI.ravel())
+    return {clave: res[campo].reshape(T.shape)
+            for clave, campo in (("W", "W_kgkg"), ("H", "h_kJkg"), ("Veh", "veh_m3kg"), ("Tbh", "Tbh_C"))}
+
+
+class CartaEnVivo:
+    """
+    Carta psicrométrica para seguir al prototipo en tiempo real.
+    Las curvas de HR y los contornos de h, Tbh y v se dibujan una vez; cada
+    lectura nueva sólo restaura el fondo guardado y dibuja el scatter.
+    """
+
+    def __init__(self, z=Z, Tbs_vals=Tbs_vals, phi_vals=phi_vals, ventana=VENTANA):
+        """
+        Args:
+            z (float): altitud (msnm)
+            Tbs_vals, phi_vals: rango del eje X y curvas de HR (fracción)
+            ventana (int): número de lecturas recientes que se muestran
+        """
+        self.z = z
+        self.tbs = deque(maxlen=ventana)
+        self.w = deque(maxlen=ventana)
+        self.hr = deque(maxlen=ventana)
+
+        self.fig, self.ax = plt.subplots(figsize=(14, 10))
+        self._dibujar_fondo(generar_carta_lote(z, Tbs_vals, phi_vals), Tbs_vals, phi_vals)
+
+        # capa de datos animada: queda fuera del dibujo normal del canvas
+        self.puntos = self.ax.scatter([], [], c=[], cmap='viridis', vmin=0, vmax=100,
+                                      s=60, edgecolors='black', linewidths=0.8, zorder=10,
+                                      animated=True)
+        cbar = self.fig.colorbar(self.puntos, ax=self.ax, pad=0.02)
+        cbar.set_label("Humedad Relativa Calculada (%)", rotation=270, labelpad=15)
+        self.fig.tight_layout()
+
+        self.fondo = None
+        self.fig.canvas.mpl_connect('draw_event', self._guardar_fondo)
+        plt.show(block=False)
+        self.fig.canvas.draw()
+
+    def _dibujar_fondo(self, carta, Tbs_vals, phi_vals):
+        """Mismas capas que carta_p2.py (HR, h, Tbh, v y leyenda)."""
+        ax = self.ax
+        ax.set_title(f"Carta Psicrométrica en vivo (Z={self.z}m)", fontsize=16, fontweight='bold')
+        ax.set_xlabel("Temperatura de Bulbo Seco (°C)", fontsize=12)
+        ax.set_ylabel("Razón de Humedad W (kg vapor/kg aire seco)", fontsize=12)
+
+        for i, hr in enumerate(phi_vals):
+            color_linea = 'blue' if hr < 1.0 else 'red'
+            ax.plot(Tbs_vals, carta["W"][i], color=color_linea, alpha=0.3 if hr < 1.0 else 0.5,
+                    linewidth=1.5 if hr == 1.0 else 0.6)
+            ax.text(Tbs_vals[-1], carta["W"][i][-1], f"{int(hr * 100)}%",
+                    fontsize=7, color=color_linea, alpha=0.7, verticalalignment='center')
+
+        T, _ = np.meshgrid(Tbs_vals, phi_vals)
+        W = carta["W"]
+        niveles_h = np.arange(np.nanmin(carta["H"]), np.nanmax(carta["H"]), 20)
+        cs_h = ax.contour(T, W, carta["H"], niveles_h, colors='black', linestyles='--', alpha=0.3, linewidths=0.8)
+        ax.clabel(cs_h, inline=True, fmt='%d', fontsize=7, colors='black')
+        cs_tbh = ax.contour(T, W, carta["Tbh"], np.arange(0, 35, 5), colors='green', linestyles=':',
+                            alpha=0.5, linewidths=1)
+        ax.clabel(cs_tbh, inline=True, fmt='%d', fontsize=8, colors='green')
+        niveles_v = np.linspace(np.nanmin(carta["Veh"]), np.nanmax(carta["Veh"]), 6)
+        cs_v = ax.contour(T, W, carta["Veh"], niveles_v, colors='purple', linestyles='-.', alpha=0.4, linewidths=0.8)
+        ax.clabel(cs_v, inline=True, fmt='%.2f', fontsize=7, colors='purple')
+
+        leyenda_elementos = [
+            Line2D([0], [0], color='black', linestyle='--', linewidth=1, alpha=0.6, label='Entalpía (h) [kJ/kg]'),
+            Line2D([0], [0], color='green', linestyle=':', linewidth=1.5, alpha=0.8, label='T. Bulbo Húmedo (Tbh) [°C]'),
+            Line2D([0], [0], color='purple', linestyle='-.', linewidth=1, alpha=0.6, label='Volumen Esp. (v) [m³/kg]'),
+            Line2D([0], [0], color='blue', lw=1, alpha=0.3, label='Humedad Relativa (HR)'),
+            Line2D([0], [0], marker='o', color='w', markerfacecolor='yellow', markeredgecolor='black', markersize=10,
+                   label='Datos Medidos')
+        ]
+        ax.legend(handles=leyenda_elementos, loc='upper left', fontsize=9, framealpha=0.9, edgecolor='gray')
+        ax.grid(True, linestyle='--', alpha=0.4)
+        ax.set_xlim(Tbs_vals[0], Tbs_vals[-1] + 2)
+        ax.set_ylim(0, np.nanmax(W) * 1.05)
+
+    def _guardar_fondo(self, evento=None):
+        """Guarda el fondo tras cada redibujado completo (p. ej. al cambiar de tamaño)."""
+        self.fondo = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.ax.draw_artist(self.puntos)
+        self.fig.canvas.blit(self.fig.bbox)
+
+    def agregar(self, tbs, tbh):
+        """
+        Agrega una lectura (Tbs y Tbh del psicrómetro, °C) y actualiza la carta.
+        Devuelve (W, HR %) calculados para la lectura.
+        """
+        calc = CalculadoraPsicrometrica(self.z, tbs, 0)
+        hr = calc.calcular_hr_psicrometrica(tbh)
+        w = calc.calcular_razon_humedad()
+        self.tbs.append(tbs)
+        self.w.append(w)
+        self.hr.append(hr)
+
+        self.puntos.set_offsets(np.column_stack([self.tbs, self.w]))
+        self.puntos.set_array(np.asarray(self.hr))
+        if self.fondo is None:
+            self.fig.canvas.draw()
+        canvas = self.fig.canvas
+        canvas.restore_region(self.fondo)
+        self.ax.draw_artist(self.puntos)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        return w, hr
+
+    def seguir_csv(self, filepath, intervalo=2.0, col_tbs='Tbs', col_tbh='Tbh'):
+        """
+        Sigue un CSV que crece (p. ej. datalog.csv copiado del prototipo o
+        escrito por un lector serial) y grafica cada fila nueva.
+        Termina al cerrar la ventana.
+        """
+        while not os.path.exists(filepath):
+            self.fig.canvas.start_event_loop(intervalo)
+        with open(filepath, 'r', newline='', encoding='utf-8') as f:
+            header = [h.strip() for h in f.readline().split(',')]
+            idx_tbs, idx_tbh = header.index(col_tbs), header.index(col_tbh)
+            pendiente = ''
+            while plt.fignum_exists(self.fig.number):
+                linea = f.readline()
+                if not linea:
+                    # sin datos nuevos: esperar la siguiente lectura
+                    self.fig.canvas.start_event_loop(intervalo)
+                    continue
+                pendiente += linea
+                if not pendiente.endswith('\n'):
+                    continue  # línea a medio escribir
+                linea, pendiente = pendiente, ''
+                row = next(csv.reader([linea]))
+                try:
+                    self.agregar(float(row[idx_tbs]), float(row[idx_tbh]))
+                except (ValueError, IndexError):
+                    continue
+
+
+if __name__ == '__main__':
+    carta = CartaEnVivo()
+    carta.seguir_csv("datalog.csv")
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Reconversión fuera de línea de lecturas crudas del ADC de los NTC del
+# prototipo (mismo divisor y modelo Steinhart-Hart que readNTC en
+# sketch_nov15c.ino), con coeficientes por sensor y promedios por ventana
+import numpy as np
+from calculos_vec import calcular_lote, hr_psicrometrica, presion_atmosferica
+
+# ========= CONFIGURACIÓN (constantes de sketch_nov15c.ino) =========
+ALTITUD = 2250.0         # ALTITUDE (msnm)
+VOLTAJE_REFERENCIA = 3.3  # referenceVoltage (V)
+BITS_ADC = 12            # ADC del ESP32
+MUESTRAS_POR_LECTURA = 20  # SAMPLES_COUNT: lecturas del ADC promediadas en cada readNTC
+VENTANA_REGISTRO = 600   # s; el prototipo registra el promedio cada 10 min
+
+# Un juego de coeficientes por sensor; se pueden agregar o recalibrar aquí
+SENSORES = {
+    'ntc1': {'A': 0.001129148, 'B': 0.000234125, 'C': 0.0000000876741,
+             'r_ref': 10000.0, 'v_ref': VOLTAJE_REFERENCIA},  # bulbo seco
+    'ntc2': {'A': 0.001129148, 'B': 0.000234125, 'C': 0.0000000876741,
+             'r_ref': 10000.0, 'v_ref': VOLTAJE_REFERENCIA},  # bulbo húmedo
+}
+
+
+def cuentas_a_voltaje(cuentas, bits=BITS_ADC, v_ref=VOLTAJE_REFERENCIA):
+    """Cuentas del ADC a voltios con la recta nominal 0 - v_ref."""
+    return np.asarray(cuentas, dtype=float) * (v_ref / (2 ** bits - 1))
+
+
+def resistencia_ntc(voltaje, r_ref, v_ref=VOLTAJE_REFERENCIA):
+    """
+    Resistencia del NTC (ohm) en el divisor de readNTC: R = V·Rref / (Vref - V).
+    Voltajes fuera de (0, v_ref) (sensor abierto o en corto) dan NaN.
+    """
+    voltaje = np.asarray(voltaje, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = voltaje * r_ref / (v_ref - voltaje)
+    return np.where((voltaje > 0) & (voltaje < v_ref), r, np.nan)
+
+
+def steinhart_hart(resistencia, A, B, C):
+    """Temperatura (°C) por Steinhart-Hart: 1/T = A + B·ln R + C·(ln R)³."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ln_r = np.log(np.asarray(resistencia, dtype=float))
+        return 1.0 / (A + B * ln_r + C * ln_r ** 3) - 273.15
+
+
+def convertir_ntc(lecturas, sensor='ntc1', unidades='cuentas', muestras_por_lectura=1, bits=BITS_ADC):
+    """
+    Convierte un arreglo de lecturas crudas de un NTC a °C.
+    Args:
+        lecturas (array): cuentas del ADC o milivolts (analogReadMilliVolts)
+        sensor (str o dict): nombre en SENSORES o dict con A, B, C, r_ref y v_ref
+        unidades (str): 'cuentas' o 'mV'
+        muestras_por_lectura (int): si las lecturas son las muestras individuales
+            del ADC, cuántas se promedian (en voltaje) por temperatura, como
+            hace readNTC con SAMPLES_COUNT; 1 = cada lectura ya es un promedio
+        bits (int): resolución del ADC para unidades='cuentas'
+    Returns:
+        np.ndarray: temperatura (°C), NaN en lecturas fuera de rango
+    """
+    coef = SENSORES[sensor] if isinstance(sensor, str) else sensor
+    if unidades == 'cuentas':
+        voltaje = cuentas_a_voltaje(lecturas, bits, coef['v_ref'])
+    elif unidades == 'mV':
+        voltaje = np.asarray(lecturas, dtype=float) / 1000.0
+    else:
+        raise ValueError("unidades debe ser 'cuentas' o 'mV'")
+    if muestras_por_lectura > 1:
+        n = len(voltaje) // muestras_por_lectura * muestras_por_lectura
+        voltaje = voltaje[:n].reshape(-1, muestras_por_lectura).mean(axis=1)
+    return steinhart_hart(resistencia_ntc(voltaje, coef['r_ref'], coef['v_ref']),
+                          coef['A'], coef['B'], coef['C'])
+
+
+def _a_segundos(tiempos):
+    t = np.asarray(tiempos)
+    if t.dtype.kind in 'iuf':
+        return t.astype(np.float64)
+    return t.astype('datetime64[ms]').astype(np.int64) / 1000.0
+
+
+def promediar_ventanas(tiempos, columnas, ventana_s=VENTANA_REGISTRO):
+    """
+    Promedia columnas por ventanas de reloj de ventana_s segundos, como el
+    registro del prototipo: cada ventana (t - ventana_s, t] se etiqueta con su
+    límite final t (múltiplo de ventana_s). Las filas con NaN en cualquier
+    columna se descartan completas, igual que el firmware descarta la muestra
+    cuando el DHT11 falla.
+    Args:
+        tiempos (array): segundos (p. ej. Unix) o datetime64
+        columnas (dict): {nombre: array} con la misma longitud que tiempos
+    Returns:
+        tuple: (etiquetas, {nombre: promedios}, muestras por ventana); las
+        etiquetas son datetime64[s] si tiempos lo era
+    """
+    segundos = _a_segundos(tiempos)
+    nombres = list(columnas)
+    valores = np.vstack([np.asarray(columnas[c], dtype=float) for c in nombres])
+    validas = np.all(np.isfinite(valores), axis=0) & np.isfinite(segundos)
+    segundos, valores = segundos[validas], valores[:, validas]
+    fin = np.ceil(segundos / ventana_s).astype(np.int64)
+    if fin.size == 0:
+        vacio = np.empty(0)
+        return vacio.astype(np.int64), {c: vacio for c in nombres}, vacio.astype(np.int64)
+    # np.bincount sobre ventanas relativas a la primera: O(n) sin ordenar
+    indice = fin - fin.min()
+    conteo = np.bincount(indice)
+    ocupadas = np.nonzero(conteo)[0]
+    promedios = {c: np.bincount(indice, weights=valores[k])[ocupadas] / conteo[ocupadas]
+                 for k, c in enumerate(nombres)}
+    etiquetas = (ocupadas + fin.min()) * ventana_s
+    if np.asarray(tiempos).dtype.kind == 'M':
+        etiquetas = etiquetas.astype('datetime64[s]')
+    return etiquetas, promedios, conteo[ocupadas]
+
+
+def reconvertir(tiempos, lecturas_tbs, lecturas_tbh, hr_dht=None, z=ALTITUD, sensor_tbs='ntc1',
+                sensor_tbh='ntc2', unidades='cuentas', muestras_por_lectura=1, ventana_s=VENTANA_REGISTRO,
+                **opciones_lote):
+    """
+    Reconversión completa: lecturas crudas -> °C -> promedios por ventana ->
+    propiedades psicrométricas con calcular_lote.
+    Args:
+        tiempos (array): tiempo de cada lectura (segundos o datetime64)
+        lecturas_tbs, lecturas_tbh (array): lecturas crudas de NTC1 y NTC2
+        hr_dht (array, opcional): HR del DHT11 (%). Si se da, las propiedades
+            se calculan con Tbs/HR como en el firmware; si no, la HR sale del
+            psicrómetro (Tbs, Tbh)
+        muestras_por_lectura (int): ver convertir_ntc; con MUESTRAS_POR_LECTURA
+            las lecturas son las muestras individuales del ADC y se promedian
+            como en readNTC. tiempos y hr_dht traen un valor por muestra y
+            cada temperatura toma los de la última muestra de su grupo
+        ventana_s (float o None): ventana de promedio; None = sin promediar
+        opciones_lote: se pasan a calcular_lote (p. ej. errores='mascara',
+            deduplicar=True)
+    Returns:
+        dict: 'tiempo', 'Tbs_ntc', 'Tbh_ntc', 'muestras' y las columnas de calcular_lote
+    """
+    columnas = {'Tbs_ntc': convertir_ntc(lecturas_tbs, sensor_tbs, unidades, muestras_por_lectura),
+                'Tbh_ntc': convertir_ntc(lecturas_tbh, sensor_tbh, unidades, muestras_por_lectura)}
+    # un valor por temperatura: el de la última muestra de cada grupo completo
+    tiempos = np.asarray(tiempos)[muestras_por_lectura - 1::muestras_por_lectura]
+    if hr_dht is not None:
+        columnas['hr_dht'] = np.asarray(hr_dht, dtype=float)[muestras_por_lectura - 1::muestras_por_lectura]
+    if ventana_s:
+        tiempos, columnas, muestras = promediar_ventanas(tiempos, columnas, ventana_s)
+    else:
+        muestras = np.ones(len(columnas['Tbs_ntc']), dtype=np.int64)
+    if hr_dht is not None:
+        hr = columnas.pop('hr_dht') / 100.0
+    else:
+        # sólo filas con ambas temperaturas; el resto queda en NaN para calcular_lote
+        tbs, tbh = columnas['Tbs_ntc'], columnas['Tbh_ntc']
+        validas = np.isfinite(tbs) & np.isfinite(tbh) & (tbs > -100) & (tbs < 200)
+        hr = np.full(tbs.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hr[validas] = hr_psicrometrica(tbs[validas], tbh[validas], presion_atmosferica(z))
+    opciones_lote.setdefault('hr_en_fraccion', True)
+    resultado = calcular_lote(z, columnas['Tbs_ntc'], hr, **opciones_lote)
+    resultado.update(columnas, tiempo=np.asarray(tiempos), muestras=muestras)
+    return resultado
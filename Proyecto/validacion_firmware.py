@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# Validación cruzada del registro del prototipo: recalcula con calcular_lote
+# las columnas que calculatePsychrometrics (sketch_nov15c.ino) guarda en
+# datalog.csv y marca las filas cuya diferencia excede la tolerancia
+import csv
+import sys
+import numpy as np
+from calculos_vec import ESTADOS_INVALIDOS, calcular_lote
+
+# ========= CONFIGURACIÓN (constantes de sketch_nov15c.ino) =========
+ALTITUD = 2250.0  # ALTITUDE (msnm)
+ENCABEZADO = ('timestamp', 'Tbs', 'Tbh', 'HR', 'Tbs_DHT', 'pv', 'pvs', 'dpva', 'w', 'ws', 'mu', 'veh', 'h', 'tpr')
+
+# Columna del firmware -> columna de calcular_lote; la bandera de cada una
+# en 'discrepancias' es 1 << (posición en esta lista)
+COLUMNAS_FIRMWARE = [
+    ('pv', 'pv_Pa'), ('pvs', 'pvs_Pa'), ('dpva', 'dpva_Pa'), ('w', 'W_kgkg'), ('ws', 'Ws_kgkg'),
+    ('mu', 'mu'), ('veh', 'veh_m3kg'), ('h', 'h_kJkg'), ('tpr', 'Tpr_C'),
+]
+BANDERAS_FIRMWARE = {columna: 1 << k for k, (columna, _) in enumerate(COLUMNAS_FIRMWARE)}
+
+# Cotas de la aritmética del firmware frente a calcular_lote (error absoluto,
+# relativo; se suman). El ESP32 evalúa todo en float32, incluido el exponente
+# de pvs (términos de magnitud ~40 que se cancelan), así que pvs y todo lo
+# que depende de ella llevan ~1e-5 de error relativo. Medidas con
+# emular_firmware sobre 2e6 estados (-40..60 °C, HR 1..100 %, z 0..4000 m),
+# con margen ~x3.
+COTAS_FIRMWARE = {
+    'pv_Pa': (1e-2, 5e-5),
+    'pvs_Pa': (1e-2, 5e-5),
+    'dpva_Pa': (0.6, 0.0),
+    'W_kgkg': (1e-6, 5e-5),
+    'Ws_kgkg': (1e-6, 5e-5),
+    'mu': (5e-6, 1e-5),
+    'veh_m3kg': (1e-6, 5e-6),
+    'h_kJkg': (0.03, 0.0),
+    'Tpr_C': (1e-3, 0.0),
+}
+
+
+def leer_datalog(ruta):
+    """
+    Lee datalog.csv conservando el texto de cada celda (la resolución con la
+    que se escribió cada valor depende de sus decimales). Las líneas con un
+    número de campos distinto al del encabezado (escrituras truncadas en la
+    SD) se descartan y se cuentan.
+    Returns:
+        tuple: ({columna: np.ndarray de str}, líneas descartadas)
+    """
+    filas = []
+    descartadas = 0
+    with open(ruta, newline='', encoding='utf-8', errors='replace') as f:
+        for fila in csv.reader(f):
+            if not fila or fila[0].strip() == ENCABEZADO[0]:
+                continue
+            if len(fila) != len(ENCABEZADO):
+                descartadas += 1
+                continue
+            filas.append([celda.strip() for celda in fila])
+    textos = np.array(filas, dtype=str).reshape(-1, len(ENCABEZADO))
+    return {nombre: textos[:, k] for k, nombre in enumerate(ENCABEZADO)}, descartadas
+
+
+def _a_flotante(textos):
+    """Texto a float; lo que no es número ('ovf' de String(float), vacío...) queda en NaN."""
+    try:
+        return textos.astype(float)
+    except ValueError:
+        def convertir(texto):
+            try:
+                return float(texto)
+            except ValueError:
+                return np.nan
+        return np.array([convertir(t) for t in textos], dtype=float)
+
+
+def _resolucion(textos):
+    """Media unidad del último decimal escrito (String(float) escribe 2 decimales)."""
+    punto = np.char.find(textos, '.')
+    decimales = np.where(punto >= 0, np.char.str_len(textos) - punto - 1, 0)
+    return 0.5 * 10.0 ** -decimales
+
+
+def emular_firmware(z, tbs, hr):
+    """
+    calculatePsychrometrics de sketch_nov15c.ino con arreglos float32 (mismas
+    fórmulas, ramas y orden de operaciones). Sirve para medir COTAS_FIRMWARE
+    y para generar registros de prueba.
+    Args:
+        z (float): altitud msnm
+        tbs (array): °C
+        hr (array): HR en fracción (0-1), como hr_fraction en el firmware
+    Returns:
+        dict: columnas de calcular_lote (pv_Pa ... Tpr_C) en float32; Tpr = 0
+        y mu = 0 donde el firmware no las define
+    """
+    f = np.float32
+    tbs = np.asarray(tbs, dtype=f)
+    hr = np.asarray(hr, dtype=f)
+    patm = f(101.325) * (f(1.0) - f(2.25577e-5) * f(z)) ** f(5.2529)
+    tbsk = f(273.15) + tbs
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        ln_t = np.log(tbsk)
+        pvs_hielo = np.exp(f(-5.6745359e3) / tbsk + f(6.3925247) - f(9.6778430e-3) * tbsk +
+                           f(6.2215701e-7) * tbsk ** 2 + f(2.0747825e-9) * tbsk ** 3 -
+                           f(9.484024e-13) * tbsk ** 4 + f(4.1635019) * ln_t)
+        pvs_agua = np.exp(f(-5.8002206e3) / tbsk + f(1.3914993) - f(48.640239e-3) * tbsk +
+                          f(41.764768e-6) * tbsk ** 2 - f(14.452093e-9) * tbsk ** 3 + f(6.5459673) * ln_t)
+        pvs = np.where((tbs > -100) & (tbs < 0), pvs_hielo,
+                       np.where((tbs >= 0) & (tbs < 200), pvs_agua, f(0.0))).astype(f)
+        pv = hr * pvs
+        dpva = pvs - pv
+        w = f(0.621945) * ((pv / f(1000.0)) / (patm - pv / f(1000.0)))
+        ws = f(0.621945) * ((pvs / f(1000.0)) / (patm - pvs / f(1000.0)))
+        mu = np.where(ws > 0, w / ws, f(0.0)).astype(f)
+        veh = ((f(287.055) * tbsk) / (patm * f(1000.0))) * ((f(1.0) + f(1.6087) * w) / (f(1.0) + w))
+        h = f(1.006) * tbs + w * (f(2501.0) + f(1.805) * tbs)
+        ln_pv = np.log(pv)
+        tpr = np.where((tbs > -60) & (tbs < 0), f(-60.450) + f(7.0322) * ln_pv + f(0.3700) * ln_pv ** 2,
+                       f(-35.957) - f(1.8726) * ln_pv + f(1.1689) * ln_pv ** 2)
+        tpr = np.where((pv > 0) & (tbs > -60) & (tbs < 70), tpr, f(0.0)).astype(f)
+    return {'pv_Pa': pv, 'pvs_Pa': pvs, 'dpva_Pa': dpva, 'W_kgkg': w, 'Ws_kgkg': ws, 'mu': mu,
+            'veh_m3kg': veh, 'h_kJkg': h, 'Tpr_C': tpr}
+
+
+def _sensibilidad(z, tbs, hr, referencia, d_tbs, d_hr):
+    """
+    Mayor cambio de cada columna cuando Tbs y HR se mueven dentro de su
+    redondeo en el registro. Si el intervalo de Tbs cruza 0 °C se evalúan
+    además ambos lados del cambio de rama del firmware (hielo / agua), donde
+    pvs y Tpr saltan.
+    """
+    sensibilidad = {campo: np.zeros(tbs.size) for _, campo in COLUMNAS_FIRMWARE}
+    cruza = np.abs(tbs) <= d_tbs
+    # los efectos de Tbs y de HR se suman; de cada uno, el mayor de sus extremos
+    for extremos in (((tbs + d_tbs, hr), (tbs - d_tbs, hr),
+                      (np.where(cruza, -1e-9, tbs), hr), (np.where(cruza, 0.0, tbs), hr)),
+                     ((tbs, np.minimum(hr + d_hr, 1.0)), (tbs, np.maximum(hr - d_hr, 1e-6)))):
+        mayor = {campo: np.zeros(tbs.size) for campo in sensibilidad}
+        for tbs_p, hr_p in extremos:
+            perturbado = calcular_lote(z, tbs_p, hr_p, errores='mascara', hr_en_fraccion=True)
+            for campo in mayor:
+                with np.errstate(invalid='ignore'):
+                    mayor[campo] = np.fmax(mayor[campo], np.abs(perturbado[campo] - referencia[campo]))
+        for campo in sensibilidad:
+            sensibilidad[campo] += mayor[campo]
+    return sensibilidad
+
+
+def validar_datalog(ruta, z=ALTITUD, cotas=COTAS_FIRMWARE):
+    """
+    Recalcula en una sola pasada vectorizada las columnas del firmware a
+    partir de Tbs (NTC1) y HR (DHT) registrados, y las compara con lo escrito.
+    La tolerancia de cada celda suma:
+        - la cota de la aritmética float32 del firmware (cotas[campo]:
+          absoluta + relativa, por defecto COTAS_FIRMWARE),
+        - la media unidad del último decimal escrito en esa celda,
+        - lo que cambia la propiedad si Tbs y HR se mueven dentro de su
+          propio redondeo en el registro.
+    Tpr = 0 del firmware equivale a NaN de calcular_lote (Tbs fuera de
+    -60..70 °C). Las filas con Tbs/HR inválidos (DHT sin lectura: 'nan') se
+    cuentan aparte y no se comparan.
+    Args:
+        ruta (str): datalog.csv de la SD
+        z (float): altitud con la que se compiló el firmware
+        cotas (dict): {campo: (cota_abs, cota_rel)} de la aritmética
+    Returns:
+        dict: 'tiempo', 'discrepancias' (banderas BANDERAS_FIRMWARE por
+        fila), 'invalidas' (filas no comparadas), 'descartadas' (líneas
+        mal formadas) y 'columnas': {columna: {'max_abs', 'max_rel',
+        'media_abs', 'resolucion', 'fuera'}} ('resolucion' es el mayor
+        redondeo del registro en esa columna; 'fuera', las filas marcadas)
+    """
+    textos, descartadas = leer_datalog(ruta)
+    tbs = _a_flotante(textos['Tbs'])
+    hr = _a_flotante(textos['HR']) / 100.0
+    referencia = calcular_lote(z, tbs, hr, errores='mascara', hr_en_fraccion=True)
+    validas = (referencia['estado'] & ESTADOS_INVALIDOS) == 0
+    sensibilidad = _sensibilidad(z, tbs, hr, referencia, _resolucion(textos['Tbs']),
+                                 _resolucion(textos['HR']) / 100.0)
+
+    discrepancias = np.zeros(tbs.size, dtype=np.uint16)
+    columnas = {}
+    for columna, campo in COLUMNAS_FIRMWARE:
+        registrado = _a_flotante(textos[columna])
+        esperado = referencia[campo]
+        if columna == 'tpr':
+            esperado = np.where(np.isnan(esperado) & validas, 0.0, esperado)
+        redondeo = _resolucion(textos[columna])
+        cota_abs, cota_rel = cotas[campo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            error = np.abs(registrado - esperado)
+            relativo = np.where(esperado != 0, error / np.abs(esperado), 0.0)
+            tolerancia = cota_abs + cota_rel * np.abs(esperado) + redondeo + sensibilidad[campo]
+            # un valor no numérico en una fila válida también es discrepancia
+            fuera = validas & ~(error <= tolerancia)
+        discrepancias[fuera] |= BANDERAS_FIRMWARE[columna]
+        comparables = validas & np.isfinite(error)
+        columnas[columna] = {
+            'max_abs': float(error[comparables].max()) if comparables.any() else 0.0,
+            'max_rel': float(relativo[comparables].max()) if comparables.any() else 0.0,
+            'media_abs': float(error[comparables].mean()) if comparables.any() else 0.0,
+            'resolucion': float(2 * redondeo[validas].max()) if validas.any() else 0.0,
+            'fuera': int(fuera.sum()),
+        }
+    return {'tiempo': textos['timestamp'], 'discrepancias': discrepancias,
+            'invalidas': int((~validas).sum()), 'descartadas': descartadas, 'columnas': columnas}
+
+
+def nombres_discrepancia(bandera):
+    """Columnas marcadas en una bandera de 'discrepancias'."""
+    return [columna for columna, bit in BANDERAS_FIRMWARE.items() if bandera & bit]
+
+
+def imprimir_reporte(reporte, max_filas=20):
+    """Resumen por columna y las primeras filas fuera de tolerancia."""
+    print(f"{'columna':<8}{'max_abs':>12}{'max_rel':>12}{'media_abs':>12}{'resolución':>12}{'fuera':>8}")
+    for columna, e in reporte['columnas'].items():
+        print(f"{columna:<8}{e['max_abs']:>12.4g}{e['max_rel']:>12.4g}{e['media_abs']:>12.4g}"
+              f"{e['resolucion']:>12.4g}{e['fuera']:>8d}")
+    print(f"Filas no comparadas (Tbs/HR inválidos): {reporte['invalidas']}; "
+          f"líneas mal formadas: {reporte['descartadas']}")
+    marcadas = np.nonzero(reporte['discrepancias'])[0]
+    print(f"Filas fuera de tolerancia: {marcadas.size}")
+    for i in marcadas[:max_filas]:
+        print(f"  {reporte['tiempo'][i]}: {', '.join(nombres_discrepancia(reporte['discrepancias'][i]))}")
+
+
+if __name__ == '__main__':
+    reporte = validar_datalog(sys.argv[1] if len(sys.argv) > 1 else 'datalog.csv')
+    imprimir_reporte(reporte)
+    sys.exit(1 if reporte['discrepancias'].any() else 0)
@@ -0,0 +1,157 @@
+# Eduardo Cano García
+# 7° 6
+# Almacén local (SQLite) de resultados por estación, consultable por rango de tiempo
+import sqlite3
+import numpy as np
+from calculos_vec import CAMPOS_SALIDA
+
+CAMPOS_ALMACEN = CAMPOS_SALIDA + ['estado']
+FILAS_POR_TRANSACCION = 100000
+
+_SQL_TABLA = (
+    "CREATE TABLE IF NOT EXISTS resultados ("
+    "estacion TEXT NOT NULL, tiempo INTEGER NOT NULL, z REAL NOT NULL, "
+    + ", ".join(f"{c} REAL" for c in CAMPOS_SALIDA) + ", estado INTEGER, "
+    # la llave primaria (estacion, tiempo, z) es también el índice para
+    # consultas por estación y rango de tiempo
+    "PRIMARY KEY (estacion, tiempo, z)) WITHOUT ROWID"
+)
+_SQL_INSERTAR = (
+    "INSERT OR REPLACE INTO resultados (estacion, tiempo, z, " + ", ".join(CAMPOS_ALMACEN) + ") "
+    "VALUES (" + ", ".join("?" * (3 + len(CAMPOS_ALMACEN))) + ")"
+)
+
+
+def _a_segundos(tiempo):
+    """
+    Convierte tiempos (datetime64, datetime, texto ISO 'AAAA-MM-DD HH:MM:SS'
+    o segundos Unix) a segundos Unix enteros (UTC, sin zona horaria).
+    """
+    t = np.asarray(tiempo)
+    if t.dtype.kind in 'iuf':
+        return t.astype(np.int64)
+    return t.astype('datetime64[s]').astype(np.int64)
+
+
+class AlmacenResultados:
+    """
+    Resultados de calcular_lote en una base SQLite local, con llave
+    (estación, tiempo, z). Cargar de nuevo el mismo intervalo reemplaza las
+    filas existentes.
+    """
+
+    def __init__(self, ruta='resultados.sqlite'):
+        """
+        Args:
+            ruta (str): archivo de la base (se crea si no existe)
+        """
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        with self.conexion:
+            self.conexion.execute(_SQL_TABLA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def agregar(self, estacion, tiempos, z, columnas):
+        """
+        Inserta un lote de resultados en transacciones de FILAS_POR_TRANSACCION
+        filas con una sola sentencia preparada.
+        Args:
+            estacion (str): nombre o clave de la estación
+            tiempos (array): marca de tiempo de cada fila (ver _a_segundos)
+            z (float o array): altitud msnm
+            columnas (dict): salida de calcular_lote (la columna 'estado' es
+                opcional; sin ella las filas se guardan con estado 0)
+        Returns:
+            int: filas insertadas o reemplazadas
+        """
+        tiempos = _a_segundos(tiempos)
+        n = len(tiempos)
+        z = np.broadcast_to(np.asarray(z, dtype=float), (n,))
+        valores = []
+        for campo in CAMPOS_ALMACEN:
+            if campo == 'estado' and campo not in columnas:
+                valores.append([0] * n)
+                continue
+            columna = np.asarray(columnas[campo])
+            if len(columna) != n:
+                raise ValueError(f"La columna {campo} no tiene {n} filas.")
+            # NaN se guarda como NULL
+            valores.append(columna.astype(np.int64 if campo == 'estado' else np.float64).tolist())
+        tiempos, z = tiempos.tolist(), z.tolist()
+
+        for inicio in range(0, n, FILAS_POR_TRANSACCION):
+            fin = min(inicio + FILAS_POR_TRANSACCION, n)
+            filas = zip([estacion] * (fin - inicio), tiempos[inicio:fin], z[inicio:fin],
+                        *[v[inicio:fin] for v in valores])
+            with self.conexion:
+                self.conexion.executemany(_SQL_INSERTAR, filas)
+        return n
+
+    def _filtro(self, estacion, inicio, fin):
+        condiciones, parametros = ["estacion = ?"], [estacion]
+        if inicio is not None:
+            condiciones.append("tiempo >= ?")
+            parametros.append(int(_a_segundos(inicio)))
+        if fin is not None:
+            condiciones.append("tiempo < ?")
+            parametros.append(int(_a_segundos(fin)))
+        return " AND ".join(condiciones), parametros
+
+    def consultar(self, estacion, inicio=None, fin=None, campos=None):
+        """
+        Filas de una estación en [inicio, fin), ordenadas por tiempo.
+        Args:
+            inicio, fin: límites de tiempo (ver _a_segundos); None = sin límite
+            campos (list, opcional): columnas de CAMPOS_ALMACEN; por defecto todas
+        Returns:
+            dict: {'tiempo': datetime64[s], 'z': ..., campo: np.ndarray}; los
+            valores nulos (NaN al guardar) vuelven como NaN
+        """
+        campos = list(CAMPOS_ALMACEN if campos is None else campos)
+        desconocidos = set(campos) - set(CAMPOS_ALMACEN)
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos: {sorted(desconocidos)}")
+        condicion, parametros = self._filtro(estacion, inicio, fin)
+        filas = self.conexion.execute(
+            f"SELECT tiempo, z, {', '.join(campos)} FROM resultados WHERE {condicion} ORDER BY tiempo, z",
+            parametros).fetchall()
+        if not filas:
+            datos = np.empty((len(campos) + 2, 0))
+        else:
+            datos = np.array(filas, dtype=float).T
+        salida = {'tiempo': datos[0].astype(np.int64).astype('datetime64[s]'), 'z': datos[1]}
+        for i, campo in enumerate(campos):
+            # estado nunca es nulo: mismas banderas uint8 que calcular_lote
+            salida[campo] = datos[i + 2].astype(np.uint8) if campo == 'estado' else datos[i + 2]
+        return salida
+
+    def resumen(self, estacion, campo, inicio=None, fin=None):
+        """
+        Mínimo, media y máximo de un campo en [inicio, fin), calculados en la
+        base (p. ej. el DPV máximo de la estación 2 en marzo).
+        Returns:
+            dict: {'n', 'minimo', 'media', 'maximo'} (ignora NULL/NaN)
+        """
+        if campo not in CAMPOS_ALMACEN:
+            raise ValueError(f"Campo desconocido: {campo}")
+        condicion, parametros = self._filtro(estacion, inicio, fin)
+        n, minimo, media, maximo = self.conexion.execute(
+            f"SELECT COUNT({campo}), MIN({campo}), AVG({campo}), MAX({campo}) "
+            f"FROM resultados WHERE {condicion}", parametros).fetchone()
+        return {'n': n, 'minimo': minimo, 'media': media, 'maximo': maximo}
+
+    def estaciones(self):
+        """Estaciones guardadas con su número de filas y su primer/último tiempo."""
+        return {estacion: {'filas': n, 'inicio': np.datetime64(t0, 's'), 'fin': np.datetime64(t1, 's')}
+                for estacion, n, t0, t1 in self.conexion.execute(
+                    "SELECT estacion, COUNT(*), MIN(tiempo), MAX(tiempo) FROM resultados GROUP BY estacion")}
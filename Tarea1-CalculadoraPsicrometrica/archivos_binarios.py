@@ -0,0 +1,80 @@
+# Eduardo Cano García
+# 7° 6
+# Entrada/salida de columnas binarias mapeadas en memoria (numpy.memmap)
+import os
+import numpy as np
+from calculos_vec import CAMPOS_SALIDA, calcular_lote
+
+
+def abrir_columna(ruta, dtype='<f8'):
+    """
+    Abre una columna binaria sin cargarla completa en RAM.
+    Args:
+        ruta (str): archivo .npy (se respeta su encabezado) o binario crudo
+        dtype: tipo de los datos crudos; siempre se lee como little-endian
+    Returns:
+        np.memmap (o arreglo mapeado de np.load) de solo lectura, 1D
+    """
+    if os.path.splitext(ruta)[1].lower() == '.npy':
+        columna = np.load(ruta, mmap_mode='r')
+    else:
+        columna = np.memmap(ruta, dtype=np.dtype(dtype).newbyteorder('<'), mode='r')
+    if columna.ndim != 1:
+        raise ValueError(f"{ruta}: se esperaba una columna 1D, forma {columna.shape}")
+    return columna
+
+
+def _crear_salida(ruta, n, dtype, formato):
+    """Crea un archivo de resultados mapeado en memoria de n elementos."""
+    if formato == 'npy':
+        return np.lib.format.open_memmap(ruta, mode='w+', dtype=dtype, shape=(n,))
+    return np.memmap(ruta, dtype=np.dtype(dtype).newbyteorder('<'), mode='w+', shape=(n,))
+
+
+def procesar_binario(ruta_tbs, ruta_hr, z, directorio_salida, ventana=1000000,
+                     dtype_entrada='<f8', dtype=np.float64, formato='npy',
+                     resolucion=None, cache=None):
+    """
+    Procesa columnas binarias Tbs/HR por ventanas, sin parseo de texto ni
+    copia completa en memoria, y escribe cada propiedad en su propio archivo
+    mapeado (<directorio_salida>/<campo>.npy o .bin).
+    Args:
+        ruta_tbs, ruta_hr (str): columnas de entrada (.npy o crudo little-endian)
+        z (float o str): altitud msnm, o ruta a una columna de altitudes
+        directorio_salida (str): carpeta donde se crean los resultados
+        ventana (int): muestras procesadas por bloque
+        dtype_entrada: tipo de las columnas crudas (ignorado para .npy)
+        dtype: np.float64 o np.float32 para los resultados
+        formato (str): 'npy' (con encabezado) o 'bin' (crudo little-endian)
+        resolucion, cache: se pasan a calcular_lote (deduplicación por bloque)
+    Returns:
+        dict: {campo: np.memmap} con los resultados
+    """
+    if formato not in ('npy', 'bin'):
+        raise ValueError("formato debe ser 'npy' o 'bin'.")
+    tbs = abrir_columna(ruta_tbs, dtype_entrada)
+    hr = abrir_columna(ruta_hr, dtype_entrada)
+    if tbs.shape != hr.shape:
+        raise ValueError("Las columnas Tbs y HR deben tener la misma longitud.")
+    z_col = abrir_columna(z, dtype_entrada) if isinstance(z, str) else None
+    if z_col is not None and z_col.shape != tbs.shape:
+        raise ValueError("La columna de altitudes debe tener la misma longitud que Tbs.")
+
+    n = tbs.shape[0]
+    os.makedirs(directorio_salida, exist_ok=True)
+    salidas = {campo: _crear_salida(os.path.join(directorio_salida, f"{campo}.{formato}"), n, dtype, formato)
+               for campo in CAMPOS_SALIDA}
+
+    deduplicar = resolucion is not None or cache is not None
+    for inicio in range(0, n, ventana):
+        fin = min(inicio + ventana, n)
+        z_ventana = z_col[inicio:fin] if z_col is not None else z
+        columnas = calcular_lote(z_ventana, tbs[inicio:fin], hr[inicio:fin],
+                                 resolucion=resolucion, deduplicar=deduplicar,
+                                 cache=cache, dtype=dtype)
+        for campo in CAMPOS_SALIDA:
+            salidas[campo][inicio:fin] = columnas[campo]
+
+    for columna in salidas.values():
+        columna.flush()
+    return salidas
@@ -0,0 +1,272 @@
+# Eduardo Cano García
+# 7° 6
+# Conformidad de los motores rápidos contra la referencia escalar y tablas publicadas
+import sys
+import numpy as np
+from calculos_vec import (CAMPOS_SALIDA, COTAS_FLOAT32, calcular_lote, calcular_vectorial,
+                          _residuo_bulbo_humedo_np)
+from superficies import tbh_exacto, tbh_tabulado
+
+# -----------------------
+# Estados de referencia
+# -----------------------
+
+ALTITUDES_REF = [0, 1000, 2000, 2250, 3000, 4000]  # msnm
+TEMPERATURAS_REF = [-95, -80, -60, -40, -25, -10, -5, -0.5, 0, 0.5, 5, 10, 15, 20, 25, 30, 35, 40, 50, 60]  # °C
+HR_REF = [0.05, 0.2, 0.4, 0.6, 0.8, 0.95, 1.0]
+
+# ASHRAE Handbook—Fundamentals (2009), cap. 1, tabla 3: aire saturado a 101.325 kPa
+# (t °C, pws kPa, Ws kg/kg, hs kJ/kg). Ws y hs de la tabla incluyen el factor
+# de mejora (~1.004) que las ecuaciones ASAE de la calculadora no usan.
+TABLA_ASHRAE_SATURACION = [
+    (-60, 0.00108, 0.0000067, -60.334),
+    (-40, 0.01285, 0.0000793, -40.041),
+    (-20, 0.10326, 0.0006373, -18.546),
+    (-10, 0.25990, 0.0016062, -6.072),
+    (0, 0.61115, 0.003789, 9.475),
+    (10, 1.2282, 0.007661, 29.354),
+    (20, 2.3392, 0.014758, 57.544),
+    (30, 4.2467, 0.027329, 100.004),
+    (40, 7.3844, 0.049141, 166.664),
+    (50, 12.351, 0.086858, 275.345),
+]
+
+# ASHRAE Handbook—Fundamentals (2009), cap. 1, tabla 1: atmósfera estándar (z m, patm kPa)
+TABLA_ASHRAE_PRESION = [
+    (0, 101.325),
+    (1000, 89.875),
+    (2000, 79.495),
+    (3000, 70.108),
+    (4000, 61.640),
+]
+
+# Tolerancias relativas frente a las tablas publicadas (pws a -60 °C sólo
+# tiene 3 cifras significativas en la tabla)
+COTAS_TABLAS = {'pvs_Pa': 2e-3, 'Ws_kgkg': 1e-2, 'h_kJkg': 1e-2, 'patm_kPa': 1e-3}
+
+# Cotas (absoluta, relativa) de los motores en float64 frente a calcular_todo.
+# Tbh se compara en °C en las filas donde motor y referencia resolvieron por
+# bisección; en saturación la referencia elige entre la bisección y el
+# respaldo empírico según el signo de un residuo de ~1e-18, que cambia con
+# diferencias de 1 ulp entre math.exp y np.exp, así que en las filas con
+# respaldo (de cualquiera de los dos) sólo se exige no empeorar su residuo.
+COTAS_FLOAT64 = {campo: (1e-9, 1e-12) for campo in CAMPOS_SALIDA}
+# COTAS_FLOAT32 acota el Tbh por residuo; aquí se compara en °C contra la
+# misma bisección en float64 (diferencias < 1e-5 °C)
+COTAS_FLOAT32_TBH = dict(COTAS_FLOAT32, Tbh_C=(1e-4, 0.0))
+# el motor tabulado se compara con la solución exacta: la bisección de la
+# referencia para en |residuo| < 0.001 kg/kg, hasta ~2.5 °C lejos de ella
+COTAS_TABULADO = dict(COTAS_FLOAT64, Tbh_C=(1e-2, 0.0))
+COTA_RESIDUO_TBH = 0.001 + 1e-6  # kg/kg, criterio de paro de la bisección de referencia
+
+
+def estados_referencia():
+    """Malla completa (z, Tbs, HR) de estados de referencia como arreglos 1D."""
+    z, tbs, hr = np.meshgrid(ALTITUDES_REF, TEMPERATURAS_REF, HR_REF, indexing='ij')
+    return z.ravel().astype(float), tbs.ravel().astype(float), hr.ravel().astype(float)
+
+
+# -----------------------
+# Motores disponibles
+# -----------------------
+
+def _motor_escalar(z, tbs, hr):
+    """Un objeto CalculadoraPsicrometrica por muestra (calcular_todo)."""
+    columnas = {campo: [] for campo in CAMPOS_SALIDA}
+    for zi, ti, hi in zip(z.tolist(), tbs.tolist(), hr.tolist()):
+        fila = calcular_vectorial(zi, [ti], [hi])[0]
+        for campo in CAMPOS_SALIDA:
+            columnas[campo].append(np.nan if fila[campo] is None else fila[campo])
+    return {campo: np.array(valores) for campo, valores in columnas.items()}
+
+
+def _motor_tabulado(z, tbs, hr):
+    """calcular_lote con Tbh interpolada en las superficies por altitud."""
+    columnas = calcular_lote(z, tbs, hr)
+    columnas['Tbh_C'] = tbh_tabulado(z, columnas['Tbs_C'], columnas['W_kgkg'])
+    return columnas
+
+
+# nombre: (función(z, tbs, hr) -> dict de columnas, cotas {campo: (abs, rel)})
+MOTORES = {
+    'escalar': (_motor_escalar, COTAS_FLOAT64),
+    'vectorial': (lambda z, tbs, hr: calcular_lote(z, tbs, hr), COTAS_FLOAT64),
+    'vectorial_dedup': (lambda z, tbs, hr: calcular_lote(z, tbs, hr, deduplicar=True), COTAS_FLOAT64),
+    'float32': (lambda z, tbs, hr: calcular_lote(z, tbs, hr, dtype=np.float32), COTAS_FLOAT32_TBH),
+    'tabulado': (_motor_tabulado, COTAS_TABULADO),
+}
+# motores cuyo Tbh se compara con tbh_exacto en lugar de con la bisección de referencia
+MOTORES_TBH_EXACTA = {'tabulado'}
+
+
+def registrar_motor(nombre, funcion, cotas, tbh_exacta=False):
+    """
+    Agrega un motor al arnés de conformidad.
+    Args:
+        nombre (str): nombre en el reporte
+        funcion: función(z, tbs, hr) -> dict {campo: np.ndarray}
+        cotas (dict): {campo: (error_abs, error_rel)}; se cumple la más holgada.
+            La de 'Tbh_C' es en °C y se aplica en las filas resueltas por
+            bisección; en las de respaldo empírico se valida el residuo.
+        tbh_exacta (bool): el motor resuelve Tbh exacta (no reproduce la
+            bisección de la referencia) y se compara con tbh_exacto
+    """
+    MOTORES[nombre] = (funcion, cotas)
+    if tbh_exacta:
+        MOTORES_TBH_EXACTA.add(nombre)
+    else:
+        MOTORES_TBH_EXACTA.discard(nombre)
+
+
+# -----------------------
+# Comparación
+# -----------------------
+
+def _errores(ref, valores):
+    """Errores absoluto y relativo ignorando posiciones NaN en ambos."""
+    ref = np.asarray(ref, dtype=float)
+    valores = np.asarray(valores, dtype=float)
+    nan_distintos = np.isnan(ref) != np.isnan(valores)
+    validos = ~(np.isnan(ref) | np.isnan(valores))
+    abs_ = np.abs(ref - valores)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel = np.where(ref != 0, abs_ / np.abs(ref), 0.0)
+    return abs_, rel, validos, int(nan_distintos.sum())
+
+
+def _usa_respaldo(columnas):
+    """Filas cuyo Tbh es el respaldo empírico (la bisección no tuvo cambio de signo)."""
+    tbs = np.asarray(columnas['Tbs_C'], dtype=float)
+    hr = np.asarray(columnas['HR_frac'], dtype=float)
+    respaldo = tbs - (1 - hr) * (tbs - 14) / 3
+    return np.isclose(np.asarray(columnas['Tbh_C'], dtype=float), respaldo, rtol=1e-6, atol=1e-5)
+
+
+def _entrada(abs_, rel, validos, nan_distintos, cota_abs, cota_rel, por_residuo=False):
+    ok = nan_distintos == 0 and bool(np.all(((abs_ <= cota_abs) | (rel <= cota_rel))[validos]))
+    return {
+        'max_abs': float(abs_[validos].max()) if validos.any() else 0.0,
+        'max_rel': float(rel[validos].max()) if validos.any() else 0.0,
+        'nan_distintos': nan_distintos,
+        'por_residuo': por_residuo,
+        'ok': ok,
+    }
+
+
+def _comparar_tbh(nombre, tbh, resultado, referencia, cota_abs, cota_rel):
+    """
+    Tbh en °C contra la referencia en las filas donde ambos usaron la
+    bisección (contra tbh_exacto en todas, para MOTORES_TBH_EXACTA); en las
+    de respaldo empírico, |residuo| de la ecuación psicrométrica en kg/kg.
+    Returns:
+        dict: {'Tbh_C': ..., 'Tbh_C_respaldo': ...} como en comparar_motor
+    """
+    tbs, w, patm = referencia['Tbs_C'], referencia['W_kgkg'], referencia['patm_kPa']
+    if nombre in MOTORES_TBH_EXACTA:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ref = tbh_exacto(tbs, w, patm)
+        respaldo = np.zeros(tbh.shape, dtype=bool)
+    else:
+        ref = referencia['Tbh_C']
+        respaldo = _usa_respaldo(referencia) | _usa_respaldo(resultado)
+    abs_, rel, validos, _ = _errores(ref, tbh)
+    nan_distintos = int((np.isnan(ref) != np.isnan(tbh)).sum())
+    reporte = {'Tbh_C': _entrada(abs_, rel, validos & ~respaldo, nan_distintos, cota_abs, cota_rel)}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        residuo = np.abs(_residuo_bulbo_humedo_np(tbh, tbs, w, patm))
+        residuo_ref = np.abs(_residuo_bulbo_humedo_np(referencia['Tbh_C'], tbs, w, patm))
+    validos = respaldo & ~np.isnan(residuo)
+    reporte['Tbh_C_respaldo'] = _entrada(residuo, np.zeros_like(residuo), validos, 0,
+                                         np.maximum(COTA_RESIDUO_TBH, residuo_ref + 1e-6), 0.0,
+                                         por_residuo=True)
+    return reporte
+
+
+def comparar_motor(nombre, z, tbs, hr, referencia):
+    """
+    Ejecuta un motor sobre los estados de referencia y lo compara.
+    Returns:
+        dict: {campo: {'max_abs', 'max_rel', 'nan_distintos', 'por_residuo', 'ok'}};
+        'Tbh_C' cubre las filas resueltas por bisección y 'Tbh_C_respaldo'
+        (por_residuo) las de respaldo empírico, con max_abs en kg/kg
+    """
+    funcion, cotas = MOTORES[nombre]
+    resultado = funcion(z, tbs, hr)
+    reporte = {}
+    for campo in CAMPOS_SALIDA:
+        cota_abs, cota_rel = cotas[campo]
+        if campo == 'Tbh_C':
+            reporte.update(_comparar_tbh(nombre, np.asarray(resultado[campo], dtype=float),
+                                         resultado, referencia, cota_abs, cota_rel))
+            continue
+        abs_, rel, validos, nan_distintos = _errores(referencia[campo], resultado[campo])
+        reporte[campo] = _entrada(abs_, rel, validos, nan_distintos, cota_abs, cota_rel)
+    return reporte
+
+
+def comparar_tablas(nombre):
+    """
+    Compara un motor contra las tablas ASHRAE de saturación (z = 0) y de
+    presión atmosférica. Returns: {propiedad: {'max_rel', 'ok'}}
+    """
+    funcion, _ = MOTORES[nombre]
+    tabla = np.array(TABLA_ASHRAE_SATURACION, dtype=float)
+    sat = funcion(np.zeros(len(tabla)), tabla[:, 0], np.ones(len(tabla)))
+    presion = np.array(TABLA_ASHRAE_PRESION, dtype=float)
+    atm = funcion(presion[:, 0], np.full(len(presion), 20.0), np.full(len(presion), 0.5))
+
+    publicados = {
+        'pvs_Pa': (tabla[:, 1] * 1000, sat['pvs_Pa']),
+        'Ws_kgkg': (tabla[:, 2], sat['Ws_kgkg']),
+        'h_kJkg': (tabla[:, 3], sat['h_kJkg']),
+        'patm_kPa': (presion[:, 1], atm['patm_kPa']),
+    }
+    reporte = {}
+    for campo, (ref, valores) in publicados.items():
+        _, rel, validos, _ = _errores(ref, valores)
+        max_rel = float(rel[validos].max())
+        reporte[campo] = {'max_rel': max_rel, 'ok': max_rel <= COTAS_TABLAS[campo]}
+    return reporte
+
+
+def ejecutar_conformidad(motores=None):
+    """
+    Corre todos los motores (o los indicados) contra calcular_todo y contra
+    las tablas ASHRAE.
+    Returns:
+        dict: {motor: {'referencia': {...}, 'tablas': {...}, 'ok': bool}}
+    """
+    z, tbs, hr = estados_referencia()
+    referencia = _motor_escalar(z, tbs, hr)
+    resultados = {}
+    for nombre in (motores or list(MOTORES)):
+        contra_ref = comparar_motor(nombre, z, tbs, hr, referencia)
+        contra_tablas = comparar_tablas(nombre)
+        ok = all(r['ok'] for r in contra_ref.values()) and all(r['ok'] for r in contra_tablas.values())
+        resultados[nombre] = {'referencia': contra_ref, 'tablas': contra_tablas, 'ok': ok}
+    return resultados
+
+
+def imprimir_reporte(resultados):
+    """Imprime una tabla por motor con el error máximo de cada propiedad."""
+    for nombre, res in resultados.items():
+        print("\n" + "=" * 72)
+        print(f"Motor: {nombre}  ->  {'OK' if res['ok'] else 'FALLA'}")
+        print("-" * 72)
+        print(f"{'Propiedad':^12} | {'max abs':^12} | {'max rel':^12} | {'NaN dif.':^8} | {'Estado':^6}")
+        for campo, r in res['referencia'].items():
+            etiqueta = 'Tbh_C (res.)' if r['por_residuo'] else campo
+            print(f"{etiqueta:^12} | {r['max_abs']:^12.3e} | {r['max_rel']:^12.3e} | "
+                  f"{r['nan_distintos']:^8d} | {'ok' if r['ok'] else 'FALLA':^6}")
+        print("-" * 72)
+        for campo, r in res['tablas'].items():
+            print(f"{'ASHRAE ' + campo:^12} | {'':^12} | {r['max_rel']:^12.3e} | {'':^8} | "
+                  f"{'ok' if r['ok'] else 'FALLA':^6}")
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    resultados = ejecutar_conformidad(sys.argv[1:] or None)
+    imprimir_reporte(resultados)
+    sys.exit(0 if all(r['ok'] for r in resultados.values()) else 1)
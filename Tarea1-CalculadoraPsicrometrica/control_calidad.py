@@ -0,0 +1,266 @@
+# Eduardo Cano García
+# 7° 6
+# Control de calidad de datos de estación antes del cálculo psicrométrico:
+# pruebas de rango, salto, persistencia y consistencia entre variables
+import numpy as np
+from calculos_vec import calcular_lote, hr_psicrometrica, presion_atmosferica
+
+# Banderas de la columna 'control'; se combinan por bits como ESTADO_*
+CC_OK = 0
+CC_NO_NUMERICO = 1          # Tbs o HR (o Tbh, si se da) es NaN/inf
+CC_TBS_RANGO = 2            # Tbs fuera de [tbs_min, tbs_max]
+CC_HR_RANGO = 4             # HR fuera de [hr_min, hr_max]
+CC_SALTO_TBS = 8            # Tbs difiere más que salto_tbs de la lectura anterior y de la última aceptada
+CC_SALTO_HR = 16            # ídem para HR
+CC_PERSISTENCIA_TBS = 32    # Tbs repetida persistencia_tbs lecturas seguidas (sensor pegado)
+CC_PERSISTENCIA_HR = 64     # ídem para HR
+CC_TBH_MAYOR_TBS = 128      # Tbh > Tbs + tolerancia_tbh
+CC_PSICROMETRO = 256        # HR del sensor y HR del psicrómetro (Tbs, Tbh) no coinciden
+NOMBRES_CONTROL = {
+    CC_NO_NUMERICO: 'no_numerico',
+    CC_TBS_RANGO: 'tbs_rango',
+    CC_HR_RANGO: 'hr_rango',
+    CC_SALTO_TBS: 'salto_tbs',
+    CC_SALTO_HR: 'salto_hr',
+    CC_PERSISTENCIA_TBS: 'persistencia_tbs',
+    CC_PERSISTENCIA_HR: 'persistencia_hr',
+    CC_TBH_MAYOR_TBS: 'tbh_mayor_tbs',
+    CC_PSICROMETRO: 'psicrometro',
+}
+# Las pruebas de persistencia sólo avisan: una HR de DHT11 (1 %) puede
+# repetirse horas en la noche sin que el sensor falle
+CC_RECHAZO = (CC_NO_NUMERICO | CC_TBS_RANGO | CC_HR_RANGO | CC_SALTO_TBS | CC_SALTO_HR |
+              CC_TBH_MAYOR_TBS | CC_PSICROMETRO)
+
+# Límites por defecto para registros cada 10 min de las estaciones EMA (HR en %)
+LIMITES = {
+    'tbs_min': -30.0, 'tbs_max': 50.0,     # °C
+    'hr_min': 1.0, 'hr_max': 100.0,        # %
+    'salto_tbs': 5.0,                      # °C entre lecturas consecutivas
+    'salto_hr': 25.0,                      # % entre lecturas consecutivas
+    'persistencia_tbs': 36,                # lecturas iguales (6 h a 10 min)
+    'persistencia_hr': 144,                # lecturas iguales (24 h a 10 min)
+    'tolerancia_tbh': 0.3,                 # °C que Tbh puede superar a Tbs
+    'tolerancia_psicrometro': 15.0,        # % de diferencia de HR aceptada
+    'hueco_s': None,                       # s; tras un hueco mayor no se prueba el salto
+}
+
+
+def _longitud_racha(valores, finitos, racha):
+    """
+    Posición (1, 2, ...) de cada lectura finita dentro de su racha de valores
+    iguales, continuando la racha (valor, longitud) del bloque previo.
+    Returns:
+        tuple: (posiciones con la forma de valores, 0 en no finitos; racha final)
+    """
+    posiciones = np.zeros(valores.size, dtype=np.int64)
+    v = valores[finitos]
+    if v.size == 0:
+        return posiciones, racha
+    nueva = np.ones(v.size, dtype=bool)
+    nueva[1:] = v[1:] != v[:-1]
+    inicios = np.nonzero(nueva)[0]
+    inicio_racha = inicios[np.cumsum(nueva) - 1]
+    pos = np.arange(v.size) - inicio_racha + 1
+    if v[0] == racha[0]:
+        # la primera racha continúa la del bloque anterior
+        pos[inicio_racha == 0] += racha[1]
+    posiciones[finitos] = pos
+    return posiciones, (v[-1], int(pos[-1]))
+
+
+class ControlCalidad:
+    """
+    Pruebas vectorizadas por bloques; conserva entre llamadas la última
+    lectura válida y la racha en curso, así que un archivo procesado en
+    bloques da las mismas banderas que de una sola vez.
+    """
+
+    def __init__(self, z=None, **limites):
+        """
+        Args:
+            z (float, opcional): altitud msnm, necesaria para la prueba del psicrómetro
+            limites: sobrescriben LIMITES
+        """
+        desconocidos = set(limites) - set(LIMITES)
+        if desconocidos:
+            raise ValueError(f"Límites desconocidos: {sorted(desconocidos)}")
+        self.z = z
+        self.limites = dict(LIMITES, **limites)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el estado entre bloques y los conteos acumulados."""
+        self._anterior = {'tbs': (np.nan, np.nan), 'hr': (np.nan, np.nan)}  # (valor, tiempo)
+        # última aceptada (valor, tiempo) si la lectura anterior se marcó como salto
+        self._retenida = {'tbs': None, 'hr': None}
+        self._racha = {'tbs': (np.nan, 0), 'hr': (np.nan, 0)}
+        self.banderas_acumuladas = np.zeros(len(NOMBRES_CONTROL) + 1, dtype=np.int64)
+        self.filas = 0
+
+    def _salto(self, nombre, valores, validos, tiempos):
+        """
+        Prueba de salto: se marca la lectura que difiere más que el límite
+        de la lectura válida anterior y también de la última aceptada. Un
+        pico aislado se rechaza sin arrastrar a la lectura buena que le
+        sigue, y un cambio de nivel real se acepta desde su segunda lectura.
+        """
+        limite = self.limites['salto_' + nombre]
+        hueco = self.limites['hueco_s']
+        indices = np.nonzero(validos)[0]
+        v = valores[indices]
+        t = tiempos[indices] if tiempos is not None else np.full(v.size, np.nan)
+        valor_previo, tiempo_previo = self._anterior[nombre]
+
+        # contra la lectura válida anterior (vectorizado); sólo los candidatos
+        # se comparan además con la última aceptada
+        referencia = np.concatenate(([valor_previo], v[:-1]))
+        t_ref = np.concatenate(([tiempo_previo], t[:-1]))
+        with np.errstate(invalid='ignore'):
+            falla = np.abs(v - referencia) > limite
+            if hueco is not None:
+                falla &= ~(t - t_ref > hueco)
+        salto = np.zeros(v.size, dtype=bool)
+        retenida = self._retenida[nombre]
+        for i in np.nonzero(falla)[0]:
+            previa_marcada = salto[i - 1] if i > 0 else retenida is not None
+            if not previa_marcada:
+                # la anterior fue aceptada: difiere de ella, es salto
+                salto[i] = True
+                retenida = (referencia[i], t_ref[i])
+                continue
+            ref_v, ref_t = retenida
+            nuevo_tramo = hueco is not None and t[i] - ref_t > hueco
+            salto[i] = not nuevo_tramo and abs(v[i] - ref_v) > limite
+
+        if v.size:
+            self._anterior[nombre] = (v[-1], t[-1])
+            self._retenida[nombre] = retenida if salto[-1] else None
+        resultado = np.zeros(valores.shape, dtype=bool)
+        resultado[indices[salto]] = True
+        return resultado
+
+    def aplicar(self, tbs, hr, tbh=None, tiempos=None):
+        """
+        Aplica todas las pruebas a un bloque (el siguiente del anterior).
+        Args:
+            tbs (array): °C
+            hr (array): % (0-100)
+            tbh (array, opcional): °C, activa las pruebas de consistencia
+            tiempos (array, opcional): segundos o datetime64, para 'hueco_s'
+        Returns:
+            np.ndarray uint16 con la combinación de banderas CC_* por fila
+        """
+        tbs = np.asarray(tbs, dtype=float)
+        hr = np.asarray(hr, dtype=float)
+        lim = self.limites
+        banderas = np.zeros(tbs.shape, dtype=np.uint16)
+        finitos = np.isfinite(tbs) & np.isfinite(hr)
+        if tbh is not None:
+            tbh = np.asarray(tbh, dtype=float)
+            finitos &= np.isfinite(tbh)
+        banderas[~finitos] |= CC_NO_NUMERICO
+        if tiempos is not None:
+            tiempos = np.asarray(tiempos)
+            if tiempos.dtype.kind == 'M':
+                tiempos = tiempos.astype('datetime64[s]').astype(np.int64)
+            tiempos = tiempos.astype(float)
+
+        with np.errstate(invalid='ignore'):
+            tbs_ok = np.isfinite(tbs) & (tbs >= lim['tbs_min']) & (tbs <= lim['tbs_max'])
+            hr_ok = np.isfinite(hr) & (hr >= lim['hr_min']) & (hr <= lim['hr_max'])
+        banderas[np.isfinite(tbs) & ~tbs_ok] |= CC_TBS_RANGO
+        banderas[np.isfinite(hr) & ~hr_ok] |= CC_HR_RANGO
+        # los saltos se miden entre lecturas dentro de rango
+        banderas[self._salto('tbs', tbs, tbs_ok, tiempos)] |= CC_SALTO_TBS
+        banderas[self._salto('hr', hr, hr_ok, tiempos)] |= CC_SALTO_HR
+
+        for nombre, valores, bandera in (('tbs', tbs, CC_PERSISTENCIA_TBS), ('hr', hr, CC_PERSISTENCIA_HR)):
+            posiciones, self._racha[nombre] = _longitud_racha(valores, np.isfinite(valores), self._racha[nombre])
+            banderas[posiciones >= lim['persistencia_' + nombre]] |= bandera
+
+        if tbh is not None:
+            with np.errstate(invalid='ignore'):
+                banderas[finitos & (tbh > tbs + lim['tolerancia_tbh'])] |= CC_TBH_MAYOR_TBS
+            if self.z is not None:
+                comparables = finitos & tbs_ok & (tbh <= tbs)
+                hr_psi = np.full(tbs.shape, np.nan)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    hr_psi[comparables] = 100.0 * hr_psicrometrica(tbs[comparables], tbh[comparables],
+                                                                   presion_atmosferica(self.z))
+                    banderas[comparables & (np.abs(hr_psi - hr) > lim['tolerancia_psicrometro'])] |= CC_PSICROMETRO
+
+        self.filas += banderas.size
+        self.banderas_acumuladas += _contar_bits(banderas)
+        return banderas
+
+    def resumen(self):
+        """Conteos acumulados de todos los bloques (ver resumen_control)."""
+        return _resumen_desde_conteos(self.filas, self.banderas_acumuladas)
+
+
+def _contar_bits(banderas):
+    """[rechazadas, filas con cada bandera de NOMBRES_CONTROL...]"""
+    conteos = [int(((banderas & CC_RECHAZO) != 0).sum())]
+    conteos += [int(((banderas & b) != 0).sum()) for b in NOMBRES_CONTROL]
+    return np.array(conteos, dtype=np.int64)
+
+
+def _resumen_desde_conteos(total, conteos):
+    resumen = {'total': int(total), 'aceptadas': int(total - conteos[0]), 'rechazadas': int(conteos[0])}
+    for nombre, cuenta in zip(NOMBRES_CONTROL.values(), conteos[1:]):
+        resumen[nombre] = int(cuenta)
+    return resumen
+
+
+def resumen_control(banderas):
+    """
+    Cuenta filas por bandera de control (como resumen_estados).
+    Returns:
+        dict: {'total', 'aceptadas', 'rechazadas', <nombre de bandera>: cuenta}
+    """
+    banderas = np.asarray(banderas)
+    return _resumen_desde_conteos(banderas.size, _contar_bits(banderas))
+
+
+def calcular_controlado(z, tbs, hr, tbh=None, tiempos=None, control=None, accion='mascara',
+                        rechazo=CC_RECHAZO, **opciones_lote):
+    """
+    Control de calidad seguido de calcular_lote sólo sobre las filas
+    aceptadas: las rechazadas no llegan a la bisección de Tbh.
+    Args:
+        z (float): altitud msnm
+        tbs, hr, tbh, tiempos: ver ControlCalidad.aplicar (hr en %)
+        control (ControlCalidad, opcional): para encadenar bloques de un
+            mismo archivo; por defecto uno nuevo con LIMITES
+        accion (str): 'mascara' (las rechazadas quedan en NaN en su lugar) o
+            'descartar' (se eliminan de la salida)
+        rechazo (int): banderas que rechazan una fila (por defecto CC_RECHAZO)
+        opciones_lote: se pasan a calcular_lote (p. ej. deduplicar=True)
+    Returns:
+        dict: columnas de calcular_lote más 'control' (banderas CC_*) y, con
+        'descartar', 'indice' (fila original de cada salida)
+    """
+    if accion not in ('mascara', 'descartar'):
+        raise ValueError("accion debe ser 'mascara' o 'descartar'.")
+    control = control if control is not None else ControlCalidad(z)
+    tbs = np.asarray(tbs, dtype=float)
+    hr = np.asarray(hr, dtype=float)
+    banderas = control.aplicar(tbs, hr, tbh, tiempos)
+    aceptadas = np.nonzero((banderas & rechazo) == 0)[0]
+    opciones_lote.setdefault('errores', 'mascara')
+    columnas = calcular_lote(z, tbs[aceptadas], hr[aceptadas] / 100.0, hr_en_fraccion=True, **opciones_lote)
+    if accion == 'descartar':
+        columnas['control'] = banderas[aceptadas]
+        columnas['indice'] = aceptadas
+        return columnas
+    completas = {}
+    for campo, valores in columnas.items():
+        relleno = 0 if campo == 'estado' else np.nan
+        completas[campo] = np.full(tbs.shape, relleno, dtype=valores.dtype)
+        completas[campo][aceptadas] = valores
+    # las filas rechazadas conservan sus entradas para poder revisarlas
+    completas['Tbs_C'] = tbs.astype(completas['Tbs_C'].dtype)
+    completas['HR_frac'] = (hr / 100.0).astype(completas['HR_frac'].dtype)
+    completas['control'] = banderas
+    return completas
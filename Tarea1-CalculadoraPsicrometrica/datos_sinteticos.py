@@ -0,0 +1,265 @@
+# Eduardo Cano García
+# 7° 6
+# Generador de datos sintéticos de estación (Tbs, HR, Tbh con marca de tiempo)
+# para pruebas de escala y de carga de los procesos de lectura y cálculo
+# Uso: python datos_sinteticos.py salida.csv|salida.xlsx|directorio_binario filas [intervalo_s]
+import os
+import sys
+import time
+import numpy as np
+from calculos_vec import presion_atmosferica, presion_vapor_saturado, razon_humedad
+from superficies import tbh_tabulado
+
+FILAS_POR_BLOQUE = 1000000
+MAX_FILAS_EXCEL = 1048575  # filas de una hoja .xlsx menos el encabezado
+SEGUNDOS_DIA = 86400.0
+SEGUNDOS_ANIO = 365.25 * SEGUNDOS_DIA
+
+# Clima por defecto: parecido a las estaciones EMA del altiplano
+CLIMA = {
+    'z': 2250.0,              # msnm
+    'tbs_media': 15.0,        # °C
+    'amplitud_diaria': 7.0,   # °C, máximo hacia las 15 h
+    'amplitud_anual': 4.0,    # °C, máximo a fines de mayo
+    'hr_media': 60.0,         # %
+    'amplitud_hr': 25.0,      # %, en contrafase con la temperatura diaria
+    'ruido_tbs': 0.3,         # °C, desviación estándar
+    'ruido_hr': 3.0,          # %
+}
+FALLAS = {
+    'prob_hueco': 1e-4,       # probabilidad de que empiece un hueco en cada fila
+    'duracion_hueco': 36,     # filas faltantes en promedio por hueco
+    'prob_corrupta': 5e-4,    # filas con una celda ilegible
+}
+# Lo que escribe una estación o un registrador cuando falla una lectura
+_TOKENS_CORRUPTOS = np.array(['ERR', '', 'nan', '#N/A', '---', '-999x'])
+ENCABEZADO = ('fecha', 'Tbs', 'HR', 'Tbh')
+
+
+def generar_bloques(filas, inicio='2024-01-01T00:00:00', intervalo_s=600, con_tbh=True, semilla=None,
+                    filas_por_bloque=FILAS_POR_BLOQUE, **parametros):
+    """
+    Genera la serie por bloques, sin tenerla completa en memoria.
+    Tbs = media + ciclo anual + ciclo diario + ruido; HR en contrafase con el
+    ciclo diario, recortada a 2-100 %; Tbh del estado (Tbs, W) con las
+    superficies de consulta (superficies.tbh_tabulado).
+    Args:
+        filas (int): filas a generar antes de quitar los huecos
+        inicio (str o datetime64): marca de tiempo de la primera fila
+        intervalo_s (int): segundos entre filas
+        con_tbh (bool): incluir la columna de bulbo húmedo
+        semilla (int, opcional): para repetir exactamente la misma serie
+        parametros: sobrescriben CLIMA y FALLAS
+    Yields:
+        dict: 'fecha' (datetime64[s]), 'Tbs' (°C), 'HR' (%), 'Tbh' (°C) y
+        'corrupta' (bool, filas que el escritor debe dañar); las filas de
+        los huecos ya no aparecen
+    """
+    desconocidos = set(parametros) - set(CLIMA) - set(FALLAS)
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos: {sorted(desconocidos)}")
+    p = dict(CLIMA, **FALLAS)
+    p.update(parametros)
+    rng = np.random.default_rng(semilla)
+    t0 = np.datetime64(inicio, 's')
+    patm = presion_atmosferica(p['z'])
+    hueco_pendiente = 0  # filas de un hueco que continúan en el bloque siguiente
+
+    for primera in range(0, filas, filas_por_bloque):
+        n = min(filas_por_bloque, filas - primera)
+        segundos = (primera + np.arange(n, dtype=np.int64)) * int(intervalo_s)
+        fecha = t0 + segundos.astype('timedelta64[s]')
+        # fase respecto a las 15 h y a fin de mayo (día ~150)
+        diaria = np.cos(2 * np.pi * ((segundos % SEGUNDOS_DIA) / SEGUNDOS_DIA - 15 / 24))
+        anual = np.cos(2 * np.pi * (segundos / SEGUNDOS_ANIO - 150 / 365.25))
+        tbs = (p['tbs_media'] + p['amplitud_anual'] * anual + p['amplitud_diaria'] * diaria
+               + rng.normal(0.0, p['ruido_tbs'], n))
+        hr = np.clip(p['hr_media'] - p['amplitud_hr'] * diaria + rng.normal(0.0, p['ruido_hr'], n), 2.0, 100.0)
+        bloque = {'fecha': fecha, 'Tbs': np.round(tbs, 2), 'HR': np.round(hr, 1)}
+        if con_tbh:
+            w = razon_humedad(bloque['HR'] / 100.0 * presion_vapor_saturado(bloque['Tbs']), patm)
+            bloque['Tbh'] = np.round(tbh_tabulado(p['z'], bloque['Tbs'], w), 2)
+
+        # huecos: rachas de filas ausentes con duración geométrica
+        limites = np.zeros(n + 1, dtype=np.int64)
+        limites[0] += 1
+        limites[min(hueco_pendiente, n)] -= 1
+        inicios = np.nonzero(rng.random(n) < p['prob_hueco'])[0]
+        finales = inicios + rng.geometric(1.0 / max(p['duracion_hueco'], 1), inicios.size)
+        np.add.at(limites, inicios, 1)
+        np.add.at(limites, np.minimum(finales, n), -1)
+        en_hueco = np.cumsum(limites[:-1]) > 0
+        hueco_pendiente = max(int(finales.max(initial=n)) - n, hueco_pendiente - n, 0)
+
+        bloque['corrupta'] = rng.random(n) < p['prob_corrupta']
+        yield {clave: valores[~en_hueco] for clave, valores in bloque.items()}
+
+
+def _lineas_csv(bloque, delim, rng):
+    """Texto CSV de un bloque; las filas corruptas llevan un token ilegible en Tbs o HR."""
+    columnas = [np.datetime_as_string(bloque['fecha'], unit='s').tolist(),
+                bloque['Tbs'].tolist(), bloque['HR'].tolist()]
+    formato = delim.join(['{}', '{:.2f}', '{:.1f}'])
+    if 'Tbh' in bloque:
+        columnas.append(bloque['Tbh'].tolist())
+        formato += delim + '{:.2f}'
+    # str.format sobre listas es ~2x más rápido que np.char.mod o np.savetxt
+    lineas = list(map(formato.format, *columnas))
+    filas = np.nonzero(bloque['corrupta'])[0].tolist()
+    cuales = rng.integers(1, 3, len(filas)).tolist()
+    tokens = rng.choice(_TOKENS_CORRUPTOS, len(filas)).tolist()
+    for fila, columna, token in zip(filas, cuales, tokens):
+        partes = lineas[fila].split(delim)
+        partes[columna] = token
+        lineas[fila] = delim.join(partes)
+    lineas.append('')
+    return '\n'.join(lineas)
+
+
+def escribir_csv(ruta, filas, delim=',', semilla=None, **opciones):
+    """
+    Escribe la serie sintética en CSV (o TXT con delim='\\t') bloque por bloque.
+    Args:
+        ruta (str): archivo de salida
+        filas (int): filas a generar (antes de huecos)
+        opciones: ver generar_bloques
+    Returns:
+        dict: {'filas': escritas, 'corruptas': dañadas, 'bytes': tamaño}
+    """
+    rng = np.random.default_rng(None if semilla is None else semilla + 1)
+    escritas = corruptas = 0
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        encabezado = ENCABEZADO if opciones.get('con_tbh', True) else ENCABEZADO[:3]
+        f.write(delim.join(encabezado) + '\n')
+        for bloque in generar_bloques(filas, semilla=semilla, **opciones):
+            f.write(_lineas_csv(bloque, delim, rng))
+            escritas += len(bloque['Tbs'])
+            corruptas += int(bloque['corrupta'].sum())
+    return {'filas': escritas, 'corruptas': corruptas, 'bytes': os.path.getsize(ruta)}
+
+
+def escribir_xlsx(ruta, filas, semilla=None, **opciones):
+    """
+    Escribe la serie en .xlsx con openpyxl en modo de sólo escritura (fila por
+    fila, sin guardar la hoja en memoria). Una hoja admite MAX_FILAS_EXCEL.
+    Returns:
+        dict: {'filas': escritas, 'corruptas': dañadas, 'bytes': tamaño}
+    """
+    if filas > MAX_FILAS_EXCEL:
+        raise ValueError(f"Una hoja de Excel admite como máximo {MAX_FILAS_EXCEL} filas; use CSV o binario.")
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Para escribir .xlsx instala 'openpyxl', o genera CSV o binario.")
+    rng = np.random.default_rng(None if semilla is None else semilla + 1)
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    con_tbh = opciones.get('con_tbh', True)
+    hoja.append(list(ENCABEZADO if con_tbh else ENCABEZADO[:3]))
+    escritas = corruptas = 0
+    for bloque in generar_bloques(filas, semilla=semilla, **opciones):
+        columnas = [np.datetime_as_string(bloque['fecha'], unit='s').tolist(),
+                    bloque['Tbs'].tolist(), bloque['HR'].tolist()]
+        if con_tbh:
+            columnas.append(bloque['Tbh'].tolist())
+        for fila in np.nonzero(bloque['corrupta'])[0].tolist():
+            columnas[int(rng.integers(1, 3))][fila] = str(rng.choice(_TOKENS_CORRUPTOS))
+        for fila in zip(*columnas):
+            hoja.append(fila)
+        escritas += len(bloque['Tbs'])
+        corruptas += int(bloque['corrupta'].sum())
+    libro.save(ruta)
+    return {'filas': escritas, 'corruptas': corruptas, 'bytes': os.path.getsize(ruta)}
+
+
+def escribir_binario(directorio, filas, formato='npy', semilla=None, **opciones):
+    """
+    Escribe una columna binaria por variable (fecha.npy en segundos Unix
+    int64, Tbs, HR y Tbh en float64), lista para archivos_binarios.procesar_binario.
+    Las filas corruptas quedan en NaN (procesar_binario aborta con NaN: use
+    prob_corrupta=0 para alimentarlo directamente). El archivo se crea con el tamaño de
+    'filas' y se recorta al final a las filas que quedaron tras los huecos.
+    Args:
+        formato (str): 'npy' o 'bin' (crudo little-endian)
+    Returns:
+        dict: {'filas': escritas, 'corruptas': dañadas, 'rutas': {columna: ruta}}
+    """
+    if formato not in ('npy', 'bin'):
+        raise ValueError("formato debe ser 'npy' o 'bin'.")
+    os.makedirs(directorio, exist_ok=True)
+    nombres = ENCABEZADO if opciones.get('con_tbh', True) else ENCABEZADO[:3]
+    rutas = {c: os.path.join(directorio, f"{c}.{formato}") for c in nombres}
+    tipos = {c: np.dtype('<i8') if c == 'fecha' else np.dtype('<f8') for c in nombres}
+    # se escribe crudo y, para npy, se agrega el encabezado al conocer el tamaño final
+    archivos = {c: open(rutas[c] + '.tmp', 'wb') for c in nombres}
+    escritas = corruptas = 0
+    try:
+        for bloque in generar_bloques(filas, semilla=semilla, **opciones):
+            for c in ('Tbs', 'HR'):
+                bloque[c][bloque['corrupta']] = np.nan
+            bloque['fecha'] = bloque['fecha'].astype(np.int64)
+            for c in nombres:
+                archivos[c].write(bloque[c].astype(tipos[c]).tobytes())
+            escritas += len(bloque['Tbs'])
+            corruptas += int(bloque['corrupta'].sum())
+    finally:
+        for f in archivos.values():
+            f.close()
+    for c in nombres:
+        if formato == 'bin':
+            os.replace(rutas[c] + '.tmp', rutas[c])
+            continue
+        with open(rutas[c], 'wb') as destino, open(rutas[c] + '.tmp', 'rb') as origen:
+            np.lib.format.write_array_header_1_0(
+                destino, {'descr': np.lib.format.dtype_to_descr(tipos[c]), 'fortran_order': False,
+                          'shape': (escritas,)})
+            while True:
+                trozo = origen.read(64 * 1024 * 1024)
+                if not trozo:
+                    break
+                destino.write(trozo)
+        os.remove(rutas[c] + '.tmp')
+    return {'filas': escritas, 'corruptas': corruptas, 'rutas': rutas}
+
+
+def simular_sensor(ruta, filas_por_segundo=1.0, filas=None, delim=',', semilla=None, **opciones):
+    """
+    Sensor falso: agrega filas a un CSV al ritmo indicado (como datalog.csv
+    del prototipo), para probar lectores que siguen un archivo en vivo.
+    Las marcas de tiempo avanzan con intervalo_s aunque se escriba más rápido.
+    Args:
+        filas_por_segundo (float): ritmo de escritura
+        filas (int, opcional): detenerse tras tantas filas; None = sin fin
+    """
+    rng = np.random.default_rng(None if semilla is None else semilla + 1)
+    nuevo = not os.path.exists(ruta) or os.path.getsize(ruta) == 0
+    # bloques de ~1 s de filas: una escritura y un flush por bloque
+    por_bloque = max(1, int(round(filas_por_segundo)))
+    total = filas if filas is not None else sys.maxsize
+    with open(ruta, 'a', encoding='utf-8', newline='') as f:
+        if nuevo:
+            encabezado = ENCABEZADO if opciones.get('con_tbh', True) else ENCABEZADO[:3]
+            f.write(delim.join(encabezado) + '\n')
+        siguiente = time.monotonic()
+        for bloque in generar_bloques(total, semilla=semilla, filas_por_bloque=por_bloque, **opciones):
+            f.write(_lineas_csv(bloque, delim, rng))
+            f.flush()
+            siguiente += por_bloque / filas_por_segundo
+            time.sleep(max(0.0, siguiente - time.monotonic()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Uso: python datos_sinteticos.py salida.csv|salida.xlsx|directorio filas [intervalo_s]")
+        sys.exit(1)
+    salida, n = sys.argv[1], int(float(sys.argv[2]))
+    intervalo = int(sys.argv[3]) if len(sys.argv) > 3 else 600
+    ext = os.path.splitext(salida)[1].lower()
+    inicio = time.perf_counter()
+    if ext in ('.csv', '.txt'):
+        info = escribir_csv(salida, n, delim='\t' if ext == '.txt' else ',', intervalo_s=intervalo)
+    elif ext == '.xlsx':
+        info = escribir_xlsx(salida, n, intervalo_s=intervalo)
+    else:
+        info = escribir_binario(salida, n, intervalo_s=intervalo)
+    print(f"{info['filas']} filas ({info['corruptas']} corruptas) en {time.perf_counter() - inicio:.1f} s")
@@ -0,0 +1,234 @@
+# Eduardo Cano García
+# 7° 6
+# Detección de huecos en series de tiempo y regularización a la cadencia
+# esperada: rellena huecos cortos (Tbs lineal o armónica, HR directa o vía
+# punto de rocío) y marca los largos
+import numpy as np
+from calculos_vec import presion_vapor_saturado
+
+# Banderas de la columna 'relleno'
+RELLENO_OBSERVADO = 0   # lectura original
+RELLENO_INTERPOLADO = 1  # hueco corto rellenado
+RELLENO_HUECO_LARGO = 2  # hueco mayor que max_hueco_s: queda en NaN
+
+SEGUNDOS_DIA = 86400.0
+ARMONICOS = 2  # armónicos del ciclo diario en el modelo de Tbs
+
+
+def _a_segundos(tiempos):
+    t = np.asarray(tiempos)
+    if t.dtype.kind == 'M':
+        return t.astype('datetime64[s]').astype(np.int64)
+    return t.astype(np.int64)
+
+
+def detectar_huecos(tiempos, intervalo_s):
+    """
+    Huecos respecto a la cadencia esperada (tiempos ordenados).
+    Args:
+        tiempos (array): segundos o datetime64
+        intervalo_s (int): cadencia esperada (600 para registros cada 10 min)
+    Returns:
+        dict: 'inicio' y 'fin' (lecturas que rodean cada hueco, en el tipo de
+        tiempos), 'faltantes' (lecturas que faltan) y 'total_faltantes'
+    """
+    t = np.asarray(tiempos)
+    s = _a_segundos(t)
+    pasos = np.diff(s)
+    en_hueco = np.nonzero(pasos > 1.5 * intervalo_s)[0]
+    faltantes = np.round(pasos[en_hueco] / intervalo_s).astype(np.int64) - 1
+    return {'inicio': t[en_hueco], 'fin': t[en_hueco + 1], 'faltantes': faltantes,
+            'total_faltantes': int(faltantes.sum())}
+
+
+def punto_rocio_exacto(pv):
+    """
+    Temperatura (°C) con presion_vapor_saturado(T) = pv (Pa), por bisección
+    vectorizada; inversa exacta de la presión de saturación (sobre hielo
+    bajo 0 °C), a diferencia de la correlación de temperatura_punto_rocio.
+    """
+    pv = np.asarray(pv, dtype=float)
+    bajo = np.full(pv.shape, -99.0)
+    alto = np.full(pv.shape, 99.0)
+    validos = np.isfinite(pv) & (pv > 0)
+    for _ in range(40):  # 198 °C / 2**40 ~ 2e-10 °C
+        medio = (bajo + alto) / 2.0
+        mayor = presion_vapor_saturado(medio) > np.where(validos, pv, 1.0)
+        alto = np.where(mayor, medio, alto)
+        bajo = np.where(mayor, bajo, medio)
+    return np.where(validos, (bajo + alto) / 2.0, np.nan)
+
+
+def _modelo_armonico(segundos, valores):
+    """
+    Ajuste por mínimos cuadrados de media + ARMONICOS armónicos diarios.
+    Returns:
+        función(segundos) -> modelo, o None si hay menos de un día de datos
+    """
+    validos = np.isfinite(valores)
+    if validos.sum() < 4 * ARMONICOS + 2 or np.ptp(segundos[validos]) < SEGUNDOS_DIA:
+        return None
+
+    def base(s):
+        fase = 2 * np.pi * (s % SEGUNDOS_DIA) / SEGUNDOS_DIA
+        return np.column_stack([np.ones(s.size)] + [f(k * fase) for k in range(1, ARMONICOS + 1)
+                                                   for f in (np.cos, np.sin)])
+
+    coeficientes = np.linalg.lstsq(base(segundos[validos].astype(float)), valores[validos], rcond=None)[0]
+    return lambda s: base(np.asarray(s, dtype=float)) @ coeficientes
+
+
+def _regularizar_bloque(slots, columnas, intervalo_s, max_faltantes, tbs_armonica, humedad):
+    """
+    Coloca las lecturas en la malla regular slots[0]..slots[-1] y rellena
+    huecos cortos. Una ranura cuenta como observada si todas sus columnas
+    son finitas; si hay varias lecturas en una ranura queda la última.
+    """
+    n = int(slots[-1] - slots[0]) + 1
+    posicion = slots - slots[0]
+    malla = {}
+    for nombre, valores in columnas.items():
+        malla[nombre] = np.full(n, np.nan)
+        malla[nombre][posicion] = valores
+    observada = np.ones(n, dtype=bool)
+    for valores in malla.values():
+        observada &= np.isfinite(valores)
+
+    indices = np.arange(n)
+    previa = np.maximum.accumulate(np.where(observada, indices, -1))
+    siguiente = np.minimum.accumulate(np.where(observada, indices, n)[::-1])[::-1]
+    interior = ~observada & (previa >= 0) & (siguiente < n)
+    rellenar = interior & (siguiente - previa - 1 <= max_faltantes)
+    relleno = np.where(observada, RELLENO_OBSERVADO, RELLENO_HUECO_LARGO).astype(np.uint8)
+    relleno[rellenar] = RELLENO_INTERPOLADO
+    if not rellenar.any():
+        for nombre in malla:
+            malla[nombre][~observada] = np.nan
+        return malla, relleno
+
+    i = indices[rellenar]
+    a, b = previa[rellenar], siguiente[rellenar]
+    fraccion = (i - a) / (b - a)
+    segundos = (slots[0] + indices) * intervalo_s
+
+    def lineal(v):
+        return v[a] + fraccion * (v[b] - v[a])
+
+    originales = {nombre: v.copy() for nombre, v in malla.items()}
+    for nombre, v in malla.items():
+        v[~observada] = np.nan
+        if nombre not in ('tbs', 'hr'):
+            v[i] = lineal(originales[nombre])
+
+    if 'tbs' in malla:
+        tbs = originales['tbs']
+        valores = lineal(tbs)
+        modelo = _modelo_armonico(segundos[observada], tbs[observada]) if tbs_armonica else None
+        if modelo is not None:
+            # forma del ciclo diario dentro del hueco, anclada en los extremos observados
+            h = modelo(segundos)
+            valores += h[i] - lineal(h)
+        malla['tbs'][i] = valores
+
+    if 'hr' in malla:
+        hr = originales['hr']
+        if humedad == 'tpr' and 'tbs' in malla:
+            # el punto de rocío varía mucho menos que la HR en el ciclo diario
+            tbs = originales['tbs']
+            tpr = np.full(n, np.nan)
+            extremos = np.union1d(a, b)
+            with np.errstate(invalid='ignore'):
+                tpr[extremos] = punto_rocio_exacto(hr[extremos] / 100.0 * presion_vapor_saturado(tbs[extremos]))
+            tpr_i = np.minimum(lineal(tpr), malla['tbs'][i])
+            malla['hr'][i] = 100.0 * presion_vapor_saturado(tpr_i) / presion_vapor_saturado(malla['tbs'][i])
+        else:
+            malla['hr'][i] = lineal(hr)
+    return malla, relleno
+
+
+class Regularizador:
+    """
+    Regulariza una serie que llega por bloques ordenados en el tiempo. Cada
+    bloque se completa hasta su última lectura; esa lectura se guarda para
+    rellenar un hueco que cruce al bloque siguiente. El modelo armónico se
+    ajusta por bloque, así que el relleno de Tbs depende un poco (milésimas
+    de °C) del tamaño de bloque; el lineal no.
+    """
+
+    def __init__(self, intervalo_s=600, max_hueco_s=3600, tbs_armonica=True, humedad='tpr'):
+        """
+        Args:
+            intervalo_s (int): cadencia esperada (s)
+            max_hueco_s (int): duración máxima (s) de un hueco que se rellena
+            tbs_armonica (bool): Tbs lineal más la forma del ciclo diario
+                ajustada al bloque (si el bloque cubre al menos un día)
+            humedad (str): 'tpr' (interpola el punto de rocío y recalcula la
+                HR con la Tbs rellenada) o 'hr' (interpola la HR directamente)
+        """
+        if humedad not in ('tpr', 'hr'):
+            raise ValueError("humedad debe ser 'tpr' o 'hr'.")
+        self.intervalo_s = int(intervalo_s)
+        self.max_faltantes = int(max_hueco_s // intervalo_s)
+        self.tbs_armonica = tbs_armonica
+        self.humedad = humedad
+        self._previa = None  # (ranura, {columna: valor}) de la última lectura entregada
+        self._es_fecha = False
+
+    def agregar(self, tiempos, columnas):
+        """
+        Args:
+            tiempos (array): segundos o datetime64, ordenados
+            columnas (dict): {'tbs': °C, 'hr': %, otras...}; las que no son
+                tbs/hr se interpolan linealmente
+        Returns:
+            dict: 'tiempo' regular, cada columna y 'relleno' (RELLENO_*)
+        """
+        t = np.asarray(tiempos)
+        if self._previa is None:
+            self._es_fecha = t.dtype.kind == 'M'
+        # ranuras contadas desde la época Unix: la malla queda alineada al reloj
+        slots = np.round(_a_segundos(t) / self.intervalo_s).astype(np.int64)
+        columnas = {c: np.asarray(v, dtype=float) for c, v in columnas.items()}
+        if self._previa is not None:
+            if slots.size and slots[0] <= self._previa[0]:
+                raise ValueError("Los bloques deben llegar ordenados y sin traslape.")
+            slots = np.concatenate(([self._previa[0]], slots))
+            columnas = {c: np.concatenate(([self._previa[1][c]], v)) for c, v in columnas.items()}
+        if slots.size == 0:
+            return self._vacio(columnas)
+
+        malla, relleno = _regularizar_bloque(slots, columnas, self.intervalo_s, self.max_faltantes,
+                                             self.tbs_armonica, self.humedad)
+        ranuras = slots[0] + np.arange(relleno.size)
+        observadas = np.nonzero(relleno == RELLENO_OBSERVADO)[0]
+        inicio = 1 if self._previa is not None else 0
+        if observadas.size == 0 or observadas[-1] < inicio:
+            return self._vacio(columnas)
+        # se entrega hasta la última lectura; lo que sigue puede rellenarse con el bloque siguiente
+        fin = observadas[-1] + 1
+        self._previa = (ranuras[fin - 1], {c: v[fin - 1] for c, v in malla.items()})
+        salida = {c: v[inicio:fin] for c, v in malla.items()}
+        salida['relleno'] = relleno[inicio:fin]
+        segundos = ranuras[inicio:fin] * self.intervalo_s
+        salida['tiempo'] = segundos.astype('datetime64[s]') if self._es_fecha else segundos
+        return salida
+
+    def _vacio(self, columnas):
+        salida = {c: np.empty(0) for c in columnas}
+        salida['relleno'] = np.empty(0, dtype=np.uint8)
+        salida['tiempo'] = np.empty(0, dtype='datetime64[s]' if self._es_fecha else np.int64)
+        return salida
+
+
+def regularizar(tiempos, columnas, intervalo_s=600, max_hueco_s=3600, filas_por_bloque=1000000, **opciones):
+    """
+    Regulariza una serie completa por bloques (ver Regularizador).
+    Returns:
+        dict: 'tiempo', columnas y 'relleno' concatenados
+    """
+    regularizador = Regularizador(intervalo_s, max_hueco_s, **opciones)
+    n = len(tiempos)
+    partes = [regularizador.agregar(tiempos[k:k + filas_por_bloque],
+                                    {c: v[k:k + filas_por_bloque] for c, v in columnas.items()})
+              for k in range(0, max(n, 1), filas_por_bloque)]
+    return {c: np.concatenate([p[c] for p in partes]) for c in partes[0]}
@@ -0,0 +1,92 @@
+# Eduardo Cano García
+# 7° 6
+# Propagación de incertidumbre por Monte Carlo: cada estado medido se
+# perturba N veces según el modelo de error de sus sensores y todas las
+# muestras pasan juntas por calcular_lote
+import numpy as np
+from calculos_vec import calcular_lote
+from superficies import tbh_tabulado
+
+# Modelos de error por sensor: {variable: (distribución, parámetro)}
+#   'uniforme': error en ±parámetro (exactitud nominal de la hoja de datos)
+#   'normal': error normal con desviación estándar = parámetro
+# tbs en °C, hr en puntos de % de HR
+MODELOS_ERROR = {
+    'dht11': {'tbs': ('uniforme', 2.0), 'hr': ('uniforme', 5.0)},
+    'dht22': {'tbs': ('uniforme', 0.5), 'hr': ('uniforme', 2.0)},
+    'ntc': {'tbs': ('normal', 0.2)},
+}
+CAMPOS_INCERTIDUMBRE = ['W_kgkg', 'h_kJkg', 'Tpr_C', 'Tbh_C']
+PERCENTILES = (2.5, 50.0, 97.5)
+MAX_MUESTRAS_BLOQUE = 2000000  # muestras (estados x N) por llamada a calcular_lote
+
+
+def _perturbacion(rng, modelo, forma):
+    if modelo is None:
+        return np.zeros(forma)
+    distribucion, parametro = modelo
+    if distribucion == 'uniforme':
+        return rng.uniform(-parametro, parametro, forma)
+    if distribucion == 'normal':
+        return rng.normal(0.0, parametro, forma)
+    raise ValueError(f"Distribución desconocida: {distribucion}")
+
+
+def propagar(z, tbs, hr, modelo='dht11', n_muestras=1000, percentiles=PERCENTILES,
+             campos=CAMPOS_INCERTIDUMBRE, semilla=None, max_muestras=MAX_MUESTRAS_BLOQUE,
+             tbh_precisa=True):
+    """
+    Percentiles de cada propiedad por estado medido.
+    Args:
+        z (float o array): altitud msnm
+        tbs (array): °C medidos
+        hr (array): HR medida en % (0-100)
+        modelo (str o dict): nombre en MODELOS_ERROR o {'tbs': ..., 'hr': ...};
+            una variable sin modelo no se perturba
+        n_muestras (int): muestras Monte Carlo por estado
+        percentiles (tuple): percentiles a reportar (0-100)
+        campos (list): columnas de CAMPOS_SALIDA a resumir
+        semilla (int, opcional): para repetir los resultados
+        max_muestras (int): tope de muestras por bloque (acota la memoria:
+            unos 13 arreglos float64 de este tamaño en calcular_lote)
+        tbh_precisa (bool): tomar Tbh de las superficies de consulta (error
+            ~0.005 °C) en lugar de la bisección de calcular_lote, que se
+            detiene a 0.001 kg/kg de residuo (hasta ~1 °C) y ensancharía el
+            intervalo de Tbh con error del solver
+    Returns:
+        dict: {campo: np.ndarray (estados x percentiles)}, 'percentiles' y
+        'saturadas' (fracción de muestras de cada estado con HR recortada a
+        100 %: un valor alto indica que el intervalo está sesgado)
+    """
+    modelo = MODELOS_ERROR[modelo] if isinstance(modelo, str) else modelo
+    tbs = np.asarray(tbs, dtype=float).ravel()
+    hr = np.asarray(hr, dtype=float).ravel()
+    if tbs.shape != hr.shape:
+        raise ValueError("tbs y hr deben tener la misma longitud.")
+    n = tbs.size
+    z = np.broadcast_to(np.asarray(z, dtype=float), (n,))
+    rng = np.random.default_rng(semilla)
+    salida = {campo: np.full((n, len(percentiles)), np.nan) for campo in campos}
+    saturadas = np.zeros(n)
+
+    por_bloque = max(1, max_muestras // n_muestras)
+    for inicio in range(0, n, por_bloque):
+        fin = min(inicio + por_bloque, n)
+        forma = (fin - inicio, n_muestras)
+        tbs_m = tbs[inicio:fin, None] + _perturbacion(rng, modelo.get('tbs'), forma)
+        hr_m = hr[inicio:fin, None] + _perturbacion(rng, modelo.get('hr'), forma)
+        # la HR perturbada no puede salir de (0, 100] %
+        saturadas[inicio:fin] = (hr_m > 100.0).mean(axis=1)
+        hr_m = np.clip(hr_m, 0.1, 100.0)
+        z_m = np.broadcast_to(z[inicio:fin, None], forma)
+        columnas = calcular_lote(z_m.ravel(), tbs_m.ravel(), hr_m.ravel() / 100.0, errores='mascara',
+                                 hr_en_fraccion=True)
+        if tbh_precisa and 'Tbh_C' in campos:
+            columnas['Tbh_C'] = tbh_tabulado(z_m.ravel(), columnas['Tbs_C'], columnas['W_kgkg'])
+        for campo in campos:
+            valores = columnas[campo].reshape(forma)
+            calcular = np.nanpercentile if np.isnan(valores).any() else np.percentile
+            salida[campo][inicio:fin] = calcular(valores, percentiles, axis=1).T
+    salida['percentiles'] = np.asarray(percentiles, dtype=float)
+    salida['saturadas'] = saturadas
+    return salida
@@ -0,0 +1,155 @@
+# Eduardo Cano García
+# 7° 6
+# Procesos del aire húmedo (calentamiento, enfriamiento, enfriamiento evaporativo,
+# humidificación y mezcla) aplicados a series de tiempo completas
+import numpy as np
+from calculos_vec import _presion_atmosferica_np, razon_humedad, temperatura_bulbo_humedo
+from resolver_estados import _pvs, resolver_lote
+
+CP_AGUA_LIQUIDA = 4.186   # kJ/kg*K
+H_VAPOR_SATURADO = 2676.0  # kJ/kg, vapor a 100 °C (humidificación con vapor)
+
+
+# -----------------------
+# Utilidades
+# -----------------------
+
+def _entalpia(tbs, w):
+    """Entalpía (kJ/kg_as), misma expresión que calcular_entalpia."""
+    return 1.006 * tbs + w * (2501 + 1.805 * tbs)
+
+
+def _tbs_desde_h_w(h, w):
+    """Tbs (°C) a partir de h (kJ/kg_as) y W (kg/kg)."""
+    return (h - 2501 * w) / (1.006 + 1.805 * w)
+
+
+def _ws(tbs, patm):
+    """W de saturación a Tbs (NaN fuera del rango de pvs)."""
+    return razon_humedad(_pvs(tbs), patm)
+
+
+def _estado(z, tbs, w, forma, dtype):
+    """Propiedades completas del estado (Tbs, W) con la forma de las entradas."""
+    columnas = resolver_lote(np.ravel(z), tbs=np.ravel(tbs), w=np.ravel(w), dtype=dtype)
+    return {campo: valores.reshape(forma) for campo, valores in columnas.items()}
+
+
+def _preparar(*arreglos):
+    """Difunde (broadcast) todas las entradas a una forma común float64."""
+    arreglos = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in arreglos])
+    return [a.copy() for a in arreglos]
+
+
+def flujo_masico(caudal_m3s, veh):
+    """Flujo másico de aire seco (kg_as/s) a partir del caudal (m3/s) y v (m3/kg_as)."""
+    return np.asarray(caudal_m3s, dtype=float) / np.asarray(veh, dtype=float)
+
+
+def tbh_desde_w(z, tbs, w, tolerancia=1e-6):
+    """
+    Tbh (°C) a partir de la altitud, Tbs y W con temperatura_bulbo_humedo
+    y tolerancia fina (la de calcular_todo, 0.001 kg/kg, es demasiado
+    gruesa para procesos).
+    """
+    tbs, w, z = _preparar(tbs, w, z)
+    return temperatura_bulbo_humedo(tbs, w, _presion_atmosferica_np(z), tolerancia=tolerancia)
+
+
+# -----------------------
+# Procesos
+# -----------------------
+
+def calentamiento_sensible(z, tbs, w, flujo=1.0, q_kw=None, tbs_salida=None, dtype=np.float64):
+    """
+    Calentamiento (o enfriamiento sin condensación) a W constante.
+    Args:
+        z, tbs, w: altitud (msnm), Tbs (°C) y W (kg/kg) de entrada; escalares o arreglos
+        flujo: flujo másico de aire seco (kg_as/s)
+        q_kw: calor agregado (kW, negativo para enfriar); o bien
+        tbs_salida: temperatura de salida deseada (°C)
+    Returns:
+        dict: propiedades de salida (columnas de calcular_lote) más 'Q_kW'
+    """
+    if (q_kw is None) == (tbs_salida is None):
+        raise ValueError("Indique q_kw o tbs_salida (sólo uno).")
+    z, tbs, w, flujo, objetivo = _preparar(z, tbs, w, flujo, q_kw if q_kw is not None else tbs_salida)
+    h_entrada = _entalpia(tbs, w)
+    if q_kw is not None:
+        tbs_fin = _tbs_desde_h_w(h_entrada + objetivo / flujo, w)
+    else:
+        tbs_fin = objetivo
+    salida = _estado(z, tbs_fin, w, tbs.shape, dtype)
+    salida['Q_kW'] = flujo * (_entalpia(tbs_fin, w) - h_entrada)
+    return salida
+
+
+def enfriamiento(z, tbs, w, tbs_salida, flujo=1.0, dtype=np.float64):
+    """
+    Enfriamiento con serpentín hasta tbs_salida. Si la salida queda bajo el
+    punto de rocío, el aire sale saturado y el exceso de vapor se condensa.
+    Returns:
+        dict: propiedades de salida más 'Q_kW' (negativo) y 'agua_kg_s'
+        (condensado, positivo)
+    """
+    z, tbs, w, tbs_fin, flujo = _preparar(z, tbs, w, tbs_salida, flujo)
+    patm = _presion_atmosferica_np(z)
+    w_fin = np.minimum(w, _ws(tbs_fin, patm))
+    condensado = flujo * (w - w_fin)
+    salida = _estado(z, tbs_fin, w_fin, tbs.shape, dtype)
+    # el condensado sale a la temperatura de salida
+    salida['Q_kW'] = (flujo * (_entalpia(tbs_fin, w_fin) - _entalpia(tbs, w)) +
+                      condensado * CP_AGUA_LIQUIDA * tbs_fin)
+    salida['agua_kg_s'] = condensado
+    return salida
+
+
+def enfriamiento_evaporativo(z, tbs, w, eficiencia=0.8, flujo=1.0, dtype=np.float64):
+    """
+    Enfriamiento evaporativo directo (pared húmeda y extractores):
+    Tbs_sal = Tbs - eficiencia * (Tbs - Tbh), a entalpía constante.
+    Args:
+        eficiencia: eficiencia de saturación de la pared (0-1)
+    Returns:
+        dict: propiedades de salida más 'agua_kg_s' (agua evaporada)
+    """
+    z, tbs, w, eficiencia, flujo = _preparar(z, tbs, w, eficiencia, flujo)
+    tbh = tbh_desde_w(z, tbs, w)
+    tbs_fin = tbs - eficiencia * (tbs - tbh)
+    h = _entalpia(tbs, w)
+    w_fin = (h - 1.006 * tbs_fin) / (2501 + 1.805 * tbs_fin)
+    salida = _estado(z, tbs_fin, w_fin, tbs.shape, dtype)
+    salida['agua_kg_s'] = flujo * (w_fin - w)
+    return salida
+
+
+def humidificacion(z, tbs, w, agua_kg_s, flujo=1.0, vapor=True, t_agua=20.0, dtype=np.float64):
+    """
+    Humidificación por inyección de vapor (vapor=True) o atomización de agua
+    líquida a t_agua (°C).
+    Args:
+        agua_kg_s: agua agregada (kg/s)
+    Returns:
+        dict: propiedades de salida más 'estado' con las filas sobresaturadas
+        marcadas como HR fuera de rango
+    """
+    z, tbs, w, agua, flujo, t_agua = _preparar(z, tbs, w, agua_kg_s, flujo, t_agua)
+    h_agua = np.where(vapor, H_VAPOR_SATURADO, CP_AGUA_LIQUIDA * t_agua)
+    w_fin = w + agua / flujo
+    h_fin = _entalpia(tbs, w) + agua / flujo * h_agua
+    return _estado(z, _tbs_desde_h_w(h_fin, w_fin), w_fin, tbs.shape, dtype)
+
+
+def mezcla(z, tbs_1, w_1, flujo_1, tbs_2, w_2, flujo_2, dtype=np.float64):
+    """
+    Mezcla adiabática de dos corrientes (balance de masa y energía).
+    Returns:
+        dict: propiedades de la mezcla más 'flujo_kg_s'
+    """
+    z, tbs_1, w_1, m_1, tbs_2, w_2, m_2 = _preparar(z, tbs_1, w_1, flujo_1, tbs_2, w_2, flujo_2)
+    m = m_1 + m_2
+    w_fin = (m_1 * w_1 + m_2 * w_2) / m
+    h_fin = (m_1 * _entalpia(tbs_1, w_1) + m_2 * _entalpia(tbs_2, w_2)) / m
+    salida = _estado(z, _tbs_desde_h_w(h_fin, w_fin), w_fin, tbs_1.shape, dtype)
+    salida['flujo_kg_s'] = m
+    return salida
@@ -0,0 +1,87 @@
+# Eduardo Cano García
+# 7° 6
+# Procesamiento por teselas de campos climáticos en rejilla (tiempo x lat x lon)
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from calculos_vec import calcular_lote
+
+CAMPOS_ATLAS = ('W_kgkg', 'dpva_Pa', 'Tbh_C')
+
+
+def _teselas(forma_espacial, tamano):
+    """Genera las rebanadas (lat, lon) que cubren la rejilla en bloques de tamano."""
+    n_lat, n_lon = forma_espacial
+    paso_lat, paso_lon = tamano
+    for i in range(0, n_lat, paso_lat):
+        for j in range(0, n_lon, paso_lon):
+            yield (slice(i, min(i + paso_lat, n_lat)), slice(j, min(j + paso_lon, n_lon)))
+
+
+def _procesar_tesela(args):
+    """Calcula una tesela; función de módulo para poder enviarse a procesos."""
+    tbs, hr, z, campos, opciones = args
+    z = np.broadcast_to(z, tbs.shape)
+    columnas = calcular_lote(z.ravel(), tbs.ravel(), hr.ravel(), **opciones)
+    return {campo: columnas[campo].reshape(tbs.shape) for campo in campos}
+
+
+def calcular_rejilla(tbs, hr, z, campos=CAMPOS_ATLAS, tamano_tesela=(64, 64), trabajadores=None,
+                     salida=None, errores='mascara', dtype=np.float64, resolucion=None):
+    """
+    Calcula propiedades psicrométricas sobre campos en rejilla por teselas,
+    sin cargar ni calcular todo el dominio a la vez.
+    Args:
+        tbs, hr (array): campos (lat, lon) o (tiempo, lat, lon); pueden ser
+            arreglos mapeados en memoria (np.load(..., mmap_mode='r'))
+        z (array): altitud msnm por celda (lat, lon), o escalar
+        campos (iterable): columnas de calcular_lote a producir
+        tamano_tesela (tuple): celdas (lat, lon) por tesela; cada tesela
+            incluye todos los pasos de tiempo
+        trabajadores (int, opcional): número de procesos; None = secuencial
+        salida (dict, opcional): {campo: arreglo} ya creado (p. ej. np.memmap)
+            con la forma de tbs donde escribir; si no, se crean en memoria
+        errores, dtype, resolucion: se pasan a calcular_lote (con resolucion
+            se deduplica dentro de cada tesela)
+    Returns:
+        dict: {campo: np.ndarray} con la misma forma que tbs
+    """
+    if tbs.shape != hr.shape:
+        raise ValueError("tbs y hr deben tener la misma forma.")
+    if tbs.ndim not in (2, 3):
+        raise ValueError("Se esperan campos (lat, lon) o (tiempo, lat, lon).")
+    forma_espacial = tbs.shape[-2:]
+    z = np.asarray(z, dtype=float)
+    if z.ndim and z.shape != forma_espacial:
+        raise ValueError(f"z debe ser escalar o tener forma {forma_espacial}.")
+
+    if salida is None:
+        salida = {campo: np.empty(tbs.shape, dtype=dtype) for campo in campos}
+    opciones = {'errores': errores, 'dtype': dtype, 'resolucion': resolucion,
+                'deduplicar': resolucion is not None}
+
+    def tareas():
+        for sl in _teselas(forma_espacial, tamano_tesela):
+            z_tesela = z[sl] if z.ndim else z
+            # np.asarray copia sólo la tesela cuando la entrada está mapeada
+            yield sl, (np.asarray(tbs[..., sl[0], sl[1]]), np.asarray(hr[..., sl[0], sl[1]]),
+                       z_tesela, tuple(campos), opciones)
+
+    if not trabajadores:
+        for sl, args in tareas():
+            for campo, valores in _procesar_tesela(args).items():
+                salida[campo][..., sl[0], sl[1]] = valores
+        return salida
+
+    with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+        # ventana acotada de teselas en vuelo para no acumular el dominio en memoria
+        pendientes = []
+        for sl, args in tareas():
+            pendientes.append((sl, ejecutor.submit(_procesar_tesela, args)))
+            if len(pendientes) >= 2 * trabajadores:
+                sl_listo, futuro = pendientes.pop(0)
+                for campo, valores in futuro.result().items():
+                    salida[campo][..., sl_listo[0], sl_listo[1]] = valores
+        for sl_listo, futuro in pendientes:
+            for campo, valores in futuro.result().items():
+                salida[campo][..., sl_listo[0], sl_listo[1]] = valores
+    return salida
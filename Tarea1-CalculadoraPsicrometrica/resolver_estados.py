@@ -0,0 +1,152 @@
+# Eduardo Cano García
+# 7° 6
+# Resolución vectorizada del estado del aire a partir de distintos pares de propiedades
+import numpy as np
+from calculos_vec import (CalculadoraPsicrometrica, calcular_lote, _como_flotante,
+                          _presion_atmosferica_np, _presion_vapor_saturado_np,
+                          _razon_humedad_np)
+
+# Pares soportados (en cualquier orden). Todos tienen forma cerrada salvo
+# ('h', 'hr') y ('hr', 'w'), que se resuelven por bisección vectorizada en Tbs.
+PARES_SOPORTADOS = [
+    ('hr', 'tbs'), ('tbs', 'w'), ('tbs', 'tpr'), ('h', 'tbs'), ('tbh', 'tbs'),
+    ('tbs', 'veh'), ('h', 'w'), ('h', 'hr'), ('hr', 'w'),
+]
+
+# Intervalo de búsqueda de Tbs para los pares sin forma cerrada (°C)
+TBS_MIN_BUSQUEDA = -90.0
+TBS_MAX_BUSQUEDA = 80.0
+
+
+def _pvs(tbs):
+    """pvs (Pa) con NaN fuera de (-100, 200) °C en lugar de excepción."""
+    validos = (tbs > -100) & (tbs < 200)
+    return np.where(validos, _presion_vapor_saturado_np(np.where(validos, tbs, 20.0)), np.nan)
+
+
+def _pv_desde_w(w, patm):
+    """Pv (Pa) a partir de W (kg/kg) y patm (kPa); inversa de la razón de humedad."""
+    return 1000.0 * w * patm / (0.621945 + w)
+
+
+def _w_psicrometrica(tbs, tbh, patm):
+    """W (kg/kg) a partir de Tbs y Tbh medidos; misma ecuación que el cálculo de Tbh."""
+    ws_tbh = _razon_humedad_np(_pvs(tbh), patm)
+    numerador = (2501 - 2.326 * tbh) * ws_tbh - 1.006 * (tbs - tbh)
+    denominador = 2501 + 1.86 * tbs - 4.186 * tbh
+    return numerador / denominador
+
+
+def _pv_desde_tpr(tbs, tpr):
+    """
+    Pv (Pa) invirtiendo la correlación de Tpr de la calculadora
+    (Tpr = a + b ln Pv + c ln² Pv, con la rama elegida por Tbs), de modo que
+    el estado resuelto devuelve exactamente el mismo Tpr. NaN si Tbs está
+    fuera de (-60, 70) °C, donde la correlación no está definida.
+    """
+    hielo = (tbs > -60) & (tbs < 0)
+    agua = (tbs >= 0) & (tbs < 70)
+    a = np.where(hielo, -60.450, -35.957)
+    b = np.where(hielo, 7.0322, -1.8726)
+    c = np.where(hielo, 0.3700, 1.1689)
+    ln_pv = (-b + np.sqrt(b ** 2 - 4 * c * (a - tpr))) / (2 * c)
+    return np.where(hielo | agua, np.exp(ln_pv), np.nan)
+
+
+def _biseccion_tbs(funcion, objetivo, n, tolerancia=1e-6, max_iteraciones=60):
+    """
+    Busca Tbs tal que funcion(Tbs) = objetivo para n muestras a la vez,
+    suponiendo funcion creciente en [TBS_MIN_BUSQUEDA, TBS_MAX_BUSQUEDA].
+    Devuelve NaN donde el objetivo queda fuera del intervalo.
+    """
+    tbs_min = np.full(n, TBS_MIN_BUSQUEDA)
+    tbs_max = np.full(n, TBS_MAX_BUSQUEDA)
+    fuera = (funcion(tbs_min) > objetivo) | (funcion(tbs_max) < objetivo)
+    for _ in range(max_iteraciones):
+        tbs_prueba = (tbs_min + tbs_max) / 2.0
+        arriba = funcion(tbs_prueba) > objetivo
+        tbs_max = np.where(arriba, tbs_prueba, tbs_max)
+        tbs_min = np.where(arriba, tbs_min, tbs_prueba)
+        if np.all(tbs_max - tbs_min < tolerancia):
+            break
+    return np.where(fuera | np.isnan(objetivo), np.nan, (tbs_min + tbs_max) / 2.0)
+
+
+def resolver_tbs_hr(z, **propiedades):
+    """
+    Convierte un par de propiedades a (Tbs, HR) de forma vectorizada.
+    Args:
+        z (float o array): altitud msnm
+        propiedades: exactamente dos de tbs (°C), hr (0-1 o 0-100), w (kg/kg),
+            tpr (°C), h (kJ/kg), tbh (°C), veh (m3/kg); ver PARES_SOPORTADOS
+    Returns:
+        tuple: (tbs, hr) como arreglos float64; hr en fracción (puede quedar
+        fuera de (0, 1] o en NaN si el par no describe un estado físico)
+    """
+    par = tuple(sorted(propiedades))
+    if par not in PARES_SOPORTADOS:
+        raise ValueError(f"Par de propiedades no soportado: {par}. Use uno de {PARES_SOPORTADOS}.")
+    valores = [_como_flotante(propiedades[nombre], np.float64).ravel() for nombre in par]
+    if valores[0].shape != valores[1].shape:
+        raise ValueError("Las dos propiedades deben tener la misma longitud.")
+    a, b = valores
+    n = a.shape[0]
+    patm = _presion_atmosferica_np(np.broadcast_to(_como_flotante(z, np.float64), (n,)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if par == ('hr', 'tbs'):
+            hr, tbs = np.where(a > 1.0, a / 100.0, a), b
+        elif par == ('tbs', 'w'):
+            tbs, w = a, b
+            hr = _pv_desde_w(w, patm) / _pvs(tbs)
+        elif par == ('tbs', 'tpr'):
+            tbs, tpr = a, b
+            hr = _pv_desde_tpr(tbs, tpr) / _pvs(tbs)
+        elif par == ('h', 'tbs'):
+            h, tbs = a, b
+            w = (h - 1.006 * tbs) / (2501 + 1.805 * tbs)
+            hr = _pv_desde_w(w, patm) / _pvs(tbs)
+        elif par == ('tbh', 'tbs'):
+            tbh, tbs = a, b
+            hr = _pv_desde_w(_w_psicrometrica(tbs, tbh, patm), patm) / _pvs(tbs)
+        elif par == ('tbs', 'veh'):
+            tbs, veh = a, b
+            r = veh * patm * 1000.0 / (CalculadoraPsicrometrica.RA * (273.15 + tbs))
+            w = (r - 1) / (1.6087 - r)
+            hr = _pv_desde_w(w, patm) / _pvs(tbs)
+        elif par == ('h', 'w'):
+            h, w = a, b
+            tbs = (h - 2501 * w) / (1.006 + 1.805 * w)
+            hr = _pv_desde_w(w, patm) / _pvs(tbs)
+        else:
+            # sin forma cerrada: bisección en Tbs con HR fija
+            hr = np.where(a > 1.0, a / 100.0, a) if par[0] == 'hr' else np.where(b > 1.0, b / 100.0, b)
+
+            def w_de(tbs):
+                return _razon_humedad_np(hr * _pvs(tbs), patm)
+
+            if par == ('h', 'hr'):
+                h = a
+                tbs = _biseccion_tbs(lambda t: 1.006 * t + w_de(t) * (2501 + 1.805 * t), h, n)
+            else:
+                w = b
+                tbs = _biseccion_tbs(w_de, w, n)
+    return tbs, hr
+
+
+def resolver_lote(z, errores='mascara', dtype=np.float64, **propiedades):
+    """
+    Calcula el conjunto completo de propiedades (columnas de CAMPOS_SALIDA)
+    a partir de cualquier par soportado, sin bucles por fila.
+    Ejemplo: resolver_lote(2250, tbs=tbs_arr, tpr=tpr_arr)
+    Args:
+        z (float o array): altitud msnm
+        errores (str): como en calcular_lote; por defecto 'mascara', ya que un
+            par inconsistente (p. ej. Tpr > Tbs) da HR fuera de rango
+        dtype: np.float64 o np.float32 para los resultados
+        propiedades: el par de propiedades (ver resolver_tbs_hr)
+    Returns:
+        dict: {campo: np.ndarray} (más 'estado' con errores='mascara')
+    """
+    tbs, hr = resolver_tbs_hr(z, **propiedades)
+    return calcular_lote(z, tbs, hr, dtype=dtype, errores=errores, hr_en_fraccion=True)
@@ -0,0 +1,237 @@
+# Eduardo Cano García
+# 7° 6
+# Servicio HTTP/JSON local para otras herramientas (controladores, tableros)
+# Uso: python servicio_http.py [puerto]
+#   GET  /salud    -> {"ok": true}
+#   POST /estado   {"z": 2250, "tbs": 25, "hr": 60}          -> propiedades de un estado
+#   POST /lote     {"z": 2250, "tbs": [...], "hr": [...]}    -> columnas de calcular_lote
+#   Cualquier par de resolver_estados.PARES_SOPORTADOS sirve en lugar de tbs/hr,
+#   p. ej. {"z": 2250, "tbs": [...], "tbh": [...]}; z puede ser escalar o lista.
+#   "campos": ["W_kgkg", "Tbh_C"] limita las columnas de la respuesta (escribir
+#   el JSON de las 13 columnas cuesta más que calcularlas).
+import asyncio
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from calculos_vec import CAMPOS_SALIDA, calcular_lote
+from resolver_estados import PARES_SOPORTADOS, resolver_lote
+
+HOST = '127.0.0.1'
+PUERTO = 8765
+MAX_CUERPO = 16 * 1024 * 1024    # bytes por solicitud (~400k estados tbs/hr)
+MAX_ENCABEZADOS = 16 * 1024      # bytes de línea de solicitud + encabezados
+MAX_ESTADOS = 500000             # estados por lote
+ESTADOS_EN_PROCESO = 20000       # lotes mayores se calculan en un proceso aparte
+TIEMPO_INACTIVO = 30             # s que se mantiene abierta una conexión sin solicitudes
+
+_PROPIEDADES = sorted({p for par in PARES_SOPORTADOS for p in par})
+_MENSAJES = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+             411: 'Length Required', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+             500: 'Internal Server Error'}
+
+
+class ErrorSolicitud(Exception):
+    """Error atribuible a la solicitud; se responde con su código HTTP."""
+
+    def __init__(self, codigo, mensaje):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def _numeros(nombre, valor):
+    """Arreglo float de un valor JSON; ValueError si no es número o lista de números."""
+    try:
+        return np.asarray(valor, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{nombre}' debe ser un número o una lista de números.")
+
+
+def calcular_solicitud(datos):
+    """
+    Calcula un lote descrito como en /lote: una sola llamada vectorizada
+    (calcular_lote para tbs/hr, resolver_lote para los demás pares).
+    Returns:
+        dict: {campo: lista} con None en lugar de NaN (JSON no admite NaN)
+    """
+    if not isinstance(datos, dict) or 'z' not in datos:
+        raise ValueError("Se espera un objeto JSON con 'z' y un par de propiedades.")
+    campos = datos.get('campos', CAMPOS_SALIDA + ['estado'])
+    if not isinstance(campos, list) or set(campos) - set(CAMPOS_SALIDA + ['estado']):
+        raise ValueError(f"'campos' debe ser una lista con nombres de {CAMPOS_SALIDA + ['estado']}")
+    propiedades = {k: _numeros(k, v) for k, v in datos.items() if k in _PROPIEDADES}
+    desconocidas = set(datos) - set(_PROPIEDADES) - {'z', 'campos'}
+    if desconocidas:
+        raise ValueError(f"Propiedades desconocidas: {sorted(desconocidas)}")
+    if tuple(sorted(propiedades)) not in PARES_SOPORTADOS:
+        raise ValueError(f"Par no soportado: {sorted(propiedades)}. Pares: {PARES_SOPORTADOS}")
+    z = _numeros('z', datos['z'])
+    if set(propiedades) == {'tbs', 'hr'}:
+        # misma regla que calcular_vectorial: hr en 0-1 o 0-100
+        columnas = calcular_lote(z, propiedades['tbs'], propiedades['hr'], errores='mascara')
+    else:
+        columnas = resolver_lote(z, errores='mascara', **propiedades)
+    salida = {}
+    for campo in campos:
+        valores = columnas[campo]
+        if campo == 'estado':
+            salida[campo] = valores.tolist()
+        else:
+            salida[campo] = np.where(np.isnan(valores), None, valores).tolist()
+    return salida
+
+
+def _respuesta_json(datos, unico=False):
+    """
+    calcular_solicitud más la codificación JSON, que para lotes grandes es
+    la parte más cara; función de módulo para ejecutarse en los procesos de
+    trabajo sin bloquear el ciclo de eventos.
+    """
+    salida = calcular_solicitud(datos)
+    if unico:
+        salida = {campo: valores[0] for campo, valores in salida.items()}
+    return json.dumps(salida, ensure_ascii=False).encode('utf-8')
+
+
+def _error_json(mensaje):
+    return json.dumps({'error': mensaje}, ensure_ascii=False).encode('utf-8')
+
+
+class ServicioPsicrometrico:
+    """
+    Servidor HTTP/1.1 mínimo sobre asyncio (sin dependencias externas).
+    Los lotes grandes se calculan en un ProcessPoolExecutor que se crea una
+    vez y se reutiliza entre solicitudes; los pequeños, en el mismo proceso.
+    """
+
+    def __init__(self, host=HOST, puerto=PUERTO, trabajadores=None, max_cuerpo=MAX_CUERPO):
+        self.host = host
+        self.puerto = puerto
+        self.max_cuerpo = max_cuerpo
+        self.trabajadores = trabajadores
+        self._ejecutor = None
+        self._servidor = None
+
+    async def iniciar(self):
+        self._ejecutor = ProcessPoolExecutor(max_workers=self.trabajadores)
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto,
+                                                    limit=MAX_ENCABEZADOS)
+        # puerto=0 elige uno libre
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    async def detener(self):
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        self._ejecutor.shutdown()
+
+    async def servir(self):
+        await self.iniciar()
+        print(f"Servicio psicrométrico en http://{self.host}:{self.puerto}")
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            self._ejecutor.shutdown()
+
+    async def _leer_solicitud(self, lector):
+        """Devuelve (método, ruta, encabezados, cuerpo) o None si se cerró la conexión."""
+        try:
+            bloque = await asyncio.wait_for(lector.readuntil(b'\r\n\r\n'), TIEMPO_INACTIVO)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ErrorSolicitud(431, "Encabezados demasiado grandes.")
+        lineas = bloque.decode('latin-1').split('\r\n')
+        try:
+            metodo, ruta, version = lineas[0].split(' ')
+        except ValueError:
+            raise ErrorSolicitud(400, "Línea de solicitud inválida.")
+        encabezados = {'version': version}
+        for linea in lineas[1:]:
+            if ':' in linea:
+                nombre, valor = linea.split(':', 1)
+                encabezados[nombre.strip().lower()] = valor.strip()
+
+        cuerpo = b''
+        if metodo == 'POST':
+            if 'content-length' not in encabezados:
+                raise ErrorSolicitud(411, "Falta Content-Length.")
+            try:
+                largo = int(encabezados['content-length'])
+            except ValueError:
+                raise ErrorSolicitud(400, "Content-Length inválido.")
+            if largo > self.max_cuerpo:
+                raise ErrorSolicitud(413, f"El cuerpo excede {self.max_cuerpo} bytes.")
+            cuerpo = await lector.readexactly(largo)
+        return metodo, ruta.split('?')[0], encabezados, cuerpo
+
+    async def _responder(self, metodo, ruta, cuerpo):
+        """Devuelve el cuerpo JSON (bytes) de la respuesta."""
+        if ruta == '/salud':
+            if metodo != 'GET':
+                raise ErrorSolicitud(405, "Use GET.")
+            return b'{"ok": true}'
+        if ruta not in ('/estado', '/lote'):
+            raise ErrorSolicitud(404, f"Ruta desconocida: {ruta}")
+        if metodo != 'POST':
+            raise ErrorSolicitud(405, "Use POST con un cuerpo JSON.")
+        try:
+            datos = json.loads(cuerpo)
+        except ValueError:
+            raise ErrorSolicitud(400, "JSON inválido.")
+
+        unico = ruta == '/estado'
+        if not isinstance(datos, dict):
+            raise ErrorSolicitud(400, "Se espera un objeto JSON.")
+        valores = [v for k, v in datos.items() if k != 'campos']
+        try:
+            # listas irregulares o valores no numéricos fallan ya en np.ndim/np.size
+            if unico and any(np.ndim(v) for v in valores):
+                raise ErrorSolicitud(400, "/estado espera valores escalares; use /lote para arreglos.")
+            n = max([np.size(v) for v in valores] or [0])
+            if n > MAX_ESTADOS:
+                raise ErrorSolicitud(413, f"Máximo {MAX_ESTADOS} estados por lote.")
+            if n > ESTADOS_EN_PROCESO:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._ejecutor, _respuesta_json, datos, unico)
+            return _respuesta_json(datos, unico)
+        except (ValueError, TypeError) as e:
+            raise ErrorSolicitud(400, str(e))
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    solicitud = await self._leer_solicitud(lector)
+                    if solicitud is None:
+                        break
+                    metodo, ruta, encabezados, cuerpo = solicitud
+                    codigo, contenido = 200, await self._responder(metodo, ruta, cuerpo)
+                    seguir = (encabezados.get('connection', '').lower() != 'close'
+                              and encabezados['version'] == 'HTTP/1.1')
+                except ErrorSolicitud as e:
+                    codigo, contenido, seguir = e.codigo, _error_json(str(e)), False
+                except Exception as e:
+                    codigo, contenido, seguir = 500, _error_json(repr(e)), False
+                escritor.write(
+                    f"HTTP/1.1 {codigo} {_MENSAJES[codigo]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(contenido)}\r\n"
+                    f"Connection: {'keep-alive' if seguir else 'close'}\r\n\r\n".encode('latin-1') + contenido)
+                await escritor.drain()
+                if not seguir:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # conexión cortada por el cliente, o tarea cancelada al detener el
+            # servidor con una conexión keep-alive inactiva
+            pass
+        finally:
+            escritor.close()
+
+
+if __name__ == '__main__':
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else PUERTO
+    try:
+        asyncio.run(ServicioPsicrometrico(puerto=puerto).servir())
+    except KeyboardInterrupt:
+        pass
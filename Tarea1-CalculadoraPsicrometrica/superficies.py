@@ -0,0 +1,260 @@
+# Eduardo Cano García
+# 7° 6
+# Superficies de consulta precalculadas por altitud: Tbh(Tbs, W) y HR(Tbs, Tbh)
+# con interpolación bilineal y una cota de error por celda
+import hashlib
+import os
+import numpy as np
+from calculos_vec import (_presion_atmosferica_np, _presion_vapor_saturado_np, _razon_humedad_np,
+                          _residuo_bulbo_humedo_np, hr_psicrometrica)
+
+VERSION = 1  # cambiarla invalida las tablas guardadas en disco
+TOLERANCIA_SOLVER = 1e-9  # °C, bisección usada para construir la tabla de Tbh
+
+# Mallas por defecto: rango de Tbs de las estaciones con margen
+MALLA_TBH = {'tbs_min': -20.0, 'tbs_max': 50.0, 'paso_tbs': 0.25, 'paso_w': 0.0002}
+MALLA_HR = {'tbs_min': -20.0, 'tbs_max': 50.0, 'paso_tbs': 0.25, 'tbh_min': -30.0, 'paso_tbh': 0.25}
+
+_SUPERFICIES = {}
+
+
+def tbh_exacto(tbs, w, patm):
+    """
+    Tbh (°C) que anula la ecuación psicrométrica, por bisección vectorizada
+    hasta TOLERANCIA_SOLVER (la de calcular_todo, 0.001 kg/kg, es mucho más
+    gruesa). El intervalo [-99.9, Tbs + 15] también cubre estados
+    sobresaturados; NaN donde no hay cambio de signo o la entrada no es válida.
+    """
+    tbs, w, patm = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (tbs, w, patm)])
+    forma = tbs.shape
+    tbs, w, patm = tbs.ravel(), w.ravel(), patm.ravel()
+    tbh = np.full(tbs.shape, np.nan)
+    validos = np.isfinite(tbs) & np.isfinite(w) & np.isfinite(patm) & (tbs > -99.9) & (tbs < 184)
+    tbs, w, patm = tbs[validos], w[validos], patm[validos]
+    bajo = np.full(tbs.shape, -99.9)
+    alto = tbs + 15.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cambia = (_residuo_bulbo_humedo_np(bajo, tbs, w, patm) < 0) & \
+                 (_residuo_bulbo_humedo_np(alto, tbs, w, patm) > 0)
+        # cada iteración parte el intervalo a la mitad: ~115 °C / 2**n
+        for _ in range(int(np.ceil(np.log2(115.0 / TOLERANCIA_SOLVER)))):
+            medio = (bajo + alto) / 2.0
+            positivo = _residuo_bulbo_humedo_np(medio, tbs, w, patm) > 0
+            alto = np.where(positivo, medio, alto)
+            bajo = np.where(positivo, bajo, medio)
+    tbh[validos] = np.where(cambia, (bajo + alto) / 2.0, np.nan)
+    return tbh.reshape(forma)
+
+
+def _hr_exacta(tbs, tbh, patm):
+    """HR (fracción) del psicrómetro; forma cerrada, sin iteración."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return hr_psicrometrica(tbs, tbh, patm)
+
+
+class SuperficieConsulta:
+    """
+    Tabla f(x, y) en una malla regular con interpolación bilineal.
+    Cada celda lleva una cota del error de interpolación: la estimación de
+    (hx² max|fxx| + hy² max|fyy|) / 8 con segundas diferencias de la tabla,
+    comparada con el error real en el centro de la celda; se toma el doble
+    de la mayor más la tolerancia con que se construyó la tabla.
+    """
+
+    def __init__(self, tipo, z, x0, hx, y0, hy, valores, cotas):
+        self.tipo = tipo
+        self.z = float(z)
+        self.x0, self.hx, self.y0, self.hy = float(x0), float(hx), float(y0), float(hy)
+        self.valores = np.asarray(valores, dtype=float)
+        self.cotas = np.asarray(cotas, dtype=float)
+
+    @property
+    def cota_maxima(self):
+        """Cota máxima sobre las celdas completas (sin esquinas NaN)."""
+        finitas = self.cotas[np.isfinite(self.cotas)]
+        return float(finitas.max()) if finitas.size else np.nan
+
+    def evaluar(self, x, y):
+        """
+        Interpolación bilineal vectorizada (O(1) por punto).
+        Returns:
+            tuple: (valores, cotas) con la forma de x; NaN fuera de la malla o
+            en celdas con alguna esquina sin solución
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        nx, ny = self.valores.shape
+        u = (x - self.x0) / self.hx
+        v = (y - self.y0) / self.hy
+        dentro = (u >= 0) & (u <= nx - 1) & (v >= 0) & (v <= ny - 1)
+        u = np.where(dentro, u, 0.0)
+        v = np.where(dentro, v, 0.0)
+        i = np.minimum(u.astype(np.intp), nx - 2)
+        j = np.minimum(v.astype(np.intp), ny - 2)
+        a, b = u - i, v - j
+        f = self.valores
+        valores = ((1 - a) * (1 - b) * f[i, j] + a * (1 - b) * f[i + 1, j] +
+                   (1 - a) * b * f[i, j + 1] + a * b * f[i + 1, j + 1])
+        cotas = self.cotas[i, j]
+        return np.where(dentro, valores, np.nan), np.where(dentro, cotas, np.nan)
+
+    def guardar(self, ruta):
+        np.savez(ruta, tipo=self.tipo, z=self.z, malla=[self.x0, self.hx, self.y0, self.hy],
+                 valores=self.valores, cotas=self.cotas, version=VERSION)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            x0, hx, y0, hy = datos['malla']
+            return cls(str(datos['tipo']), float(datos['z']), x0, hx, y0, hy,
+                       datos['valores'], datos['cotas'])
+
+
+def _cotas_celdas(x, y, valores, funcion):
+    """
+    Cota del error de interpolación por celda (ver SuperficieConsulta).
+    funcion(x, y) evalúa el valor exacto en los centros de las celdas.
+    """
+    def segunda_diferencia(f, eje):
+        d2 = np.full(f.shape, np.nan)
+        centro = [slice(None)] * 2
+        centro[eje] = slice(1, -1)
+        d2[tuple(centro)] = np.abs(np.diff(f, n=2, axis=eje))
+        # los bordes toman la del vecino interior
+        for borde, vecino in ((0, 1), (-1, -2)):
+            idx_b, idx_v = [slice(None)] * 2, [slice(None)] * 2
+            idx_b[eje], idx_v[eje] = borde, vecino
+            d2[tuple(idx_b)] = d2[tuple(idx_v)]
+        return d2
+
+    def maximo_celda(d2):
+        # máximo sobre las cuatro esquinas de cada celda
+        return np.maximum(np.maximum(d2[:-1, :-1], d2[1:, :-1]), np.maximum(d2[:-1, 1:], d2[1:, 1:]))
+
+    analitica = (maximo_celda(segunda_diferencia(valores, 0)) +
+                 maximo_celda(segunda_diferencia(valores, 1))) / 8.0
+    xc = (x[:-1] + x[1:]) / 2.0
+    yc = (y[:-1] + y[1:]) / 2.0
+    exacto = funcion(xc[:, None], yc[None, :])
+    bilineal = (valores[:-1, :-1] + valores[1:, :-1] + valores[:-1, 1:] + valores[1:, 1:]) / 4.0
+    observada = np.abs(exacto - bilineal)
+    cotas = 2.0 * np.fmax(analitica, observada) + TOLERANCIA_SOLVER
+    # celdas con alguna esquina NaN no se interpolan
+    cotas[np.isnan(bilineal) | np.isnan(exacto)] = np.inf
+    # misma forma que valores para indexar por la esquina inferior de la celda
+    completas = np.full(valores.shape, np.inf)
+    completas[:-1, :-1] = cotas
+    return completas
+
+
+def _obtener(tipo, z, malla, construir, directorio_cache):
+    """Superficie desde memoria, desde disco o construida (y guardada)."""
+    clave = (tipo, float(z), tuple(sorted(malla.items())), VERSION)
+    if clave in _SUPERFICIES:
+        return _SUPERFICIES[clave]
+    ruta = None
+    if directorio_cache:
+        huella = hashlib.md5(repr(clave).encode('utf-8')).hexdigest()[:12]
+        ruta = os.path.join(directorio_cache, f"superficie_{tipo}_z{float(z):g}_{huella}.npz")
+    if ruta and os.path.exists(ruta):
+        superficie = SuperficieConsulta.cargar(ruta)
+    else:
+        superficie = construir()
+        if ruta:
+            os.makedirs(directorio_cache, exist_ok=True)
+            superficie.guardar(ruta)
+    _SUPERFICIES[clave] = superficie
+    return superficie
+
+
+def superficie_tbh(z, directorio_cache=None, **malla):
+    """
+    Tabla Tbh(Tbs, W) para la altitud z. W va de 0 a Ws a tbs_max; los
+    estados sobresaturados de la tabla son la continuación de la misma
+    ecuación y sólo sirven para interpolar junto a la curva de saturación.
+    Args:
+        z (float): altitud msnm
+        directorio_cache (str, opcional): carpeta donde se guarda/reutiliza la tabla
+        malla: tbs_min, tbs_max, paso_tbs (°C) y paso_w (kg/kg); ver MALLA_TBH
+    Returns:
+        SuperficieConsulta
+    """
+    malla = dict(MALLA_TBH, **malla)
+
+    def construir():
+        patm = float(_presion_atmosferica_np(float(z)))
+        tbs = np.arange(malla['tbs_min'], malla['tbs_max'] + malla['paso_tbs'] / 2, malla['paso_tbs'])
+        w_max = float(_razon_humedad_np(_presion_vapor_saturado_np(np.array(malla['tbs_max'])), patm))
+        w = np.arange(0.0, w_max + 1.5 * malla['paso_w'], malla['paso_w'])
+        valores = tbh_exacto(tbs[:, None], w[None, :], patm)
+        cotas = _cotas_celdas(tbs, w, valores, lambda x, y: tbh_exacto(x, y, patm))
+        return SuperficieConsulta('tbh', z, tbs[0], malla['paso_tbs'], w[0], malla['paso_w'], valores, cotas)
+
+    return _obtener('tbh', z, malla, construir, directorio_cache)
+
+
+def superficie_hr(z, directorio_cache=None, **malla):
+    """
+    Tabla HR(Tbs, Tbh) (fracción) del psicrómetro para la altitud z; Tbh
+    llega hasta tbs_max (Tbh > Tbs da HR > 1, como la forma cerrada).
+    Args:
+        malla: tbs_min, tbs_max, paso_tbs, tbh_min y paso_tbh (°C); ver MALLA_HR
+    Returns:
+        SuperficieConsulta
+    """
+    malla = dict(MALLA_HR, **malla)
+
+    def construir():
+        patm = float(_presion_atmosferica_np(float(z)))
+        tbs = np.arange(malla['tbs_min'], malla['tbs_max'] + malla['paso_tbs'] / 2, malla['paso_tbs'])
+        tbh = np.arange(malla['tbh_min'], malla['tbs_max'] + malla['paso_tbh'] / 2, malla['paso_tbh'])
+        valores = _hr_exacta(tbs[:, None], tbh[None, :], patm)
+        cotas = _cotas_celdas(tbs, tbh, valores, lambda x, y: _hr_exacta(x, y, patm))
+        return SuperficieConsulta('hr', z, tbs[0], malla['paso_tbs'], tbh[0], malla['paso_tbh'], valores, cotas)
+
+    return _obtener('hr', z, malla, construir, directorio_cache)
+
+
+def _por_altitud(z, x, y, superficie, exacta, directorio_cache):
+    """Evalúa la superficie de cada altitud distinta; lo que cae fuera se calcula exacto."""
+    z, x, y = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (z, x, y)])
+    valores = np.full(x.shape, np.nan)
+    cotas = np.full(x.shape, np.nan)
+    finitos = np.isfinite(z)
+    if z.size and finitos.all() and np.ptp(z) == 0:
+        # una sola altitud (lo usual): sin np.unique ni máscaras por fila
+        valores, cotas = superficie(z.flat[0], directorio_cache).evaluar(x, y)
+    else:
+        for zi in np.unique(z[finitos]):
+            filas = z == zi
+            valores[filas], cotas[filas] = superficie(zi, directorio_cache).evaluar(x[filas], y[filas])
+    fuera = np.isnan(valores)
+    if np.any(fuera):
+        with np.errstate(invalid='ignore'):
+            valores[fuera] = exacta(x[fuera], y[fuera], _presion_atmosferica_np(z[fuera]))
+        cotas[fuera] = np.where(np.isnan(valores[fuera]), np.nan, TOLERANCIA_SOLVER)
+    return valores, cotas
+
+
+def tbh_tabulado(z, tbs, w, directorio_cache=None, con_cota=False):
+    """
+    Tbh (°C) por interpolación en superficie_tbh; fuera de la malla (o en
+    celdas sin solución) se resuelve con tbh_exacto.
+    Args:
+        z, tbs, w: altitud (msnm), Tbs (°C) y W (kg/kg); escalares o arreglos
+        con_cota (bool): devolver también la cota de error (°C) de cada valor
+    Returns:
+        np.ndarray (o tupla (valores, cotas) con con_cota=True)
+    """
+    valores, cotas = _por_altitud(z, tbs, w, superficie_tbh, tbh_exacto, directorio_cache)
+    return (valores, cotas) if con_cota else valores
+
+
+def hr_tabulada(z, tbs, tbh, directorio_cache=None, con_cota=False):
+    """
+    HR (fracción) del psicrómetro por interpolación en superficie_hr; fuera
+    de la malla se usa la forma cerrada (hr_psicrometrica).
+    Returns:
+        np.ndarray (o tupla (valores, cotas) con con_cota=True)
+    """
+    valores, cotas = _por_altitud(z, tbs, tbh, superficie_hr, _hr_exacta, directorio_cache)
+    return (valores, cotas) if con_cota else valores
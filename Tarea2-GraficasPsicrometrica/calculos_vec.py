@@ -2,15 +2,186 @@
 # 7° 6
 import math
 import csv
+import itertools
 import os
+import warnings
+from collections import OrderedDict
 import numpy as np
 import matplotlib.pyplot as plt
 
+# -----------------------
+# Funciones psicrométricas sin estado
+# -----------------------
+# Cada función depende sólo de sus argumentos y no guarda nada, así que se
+# puede llamar a la vez desde varios hilos o tareas asyncio. Con escalares
+# devuelven float (mismas operaciones de math que la calculadora original);
+# con arreglos devuelven np.ndarray calculado con el motor por lotes.
+
+def _es_escalar(*valores):
+    return all(np.ndim(v) == 0 for v in valores)
+
+
+def _arreglos(*valores):
+    """Difunde las entradas a una forma común float (1D para el motor por lotes)."""
+    arreglos = np.broadcast_arrays(*[_como_flotante(v) for v in valores])
+    return arreglos[0].shape, [np.ravel(a) for a in arreglos]
+
+
+def presion_atmosferica(z):
+    """Presión atmosférica (kPa) en función de la altitud z (msnm)."""
+    if _es_escalar(z):
+        return 101.325 * (1 - (2.25577 * 10 ** -5) * float(z)) ** 5.2529
+    return _presion_atmosferica_np(_como_flotante(z))
+
+
+def presion_vapor_saturado(t):
+    """
+    Presión de vapor saturado (Pa) a la temperatura t (°C): sobre hielo bajo
+    0 °C y sobre agua líquida de 0 a 200 °C.
+    Raises:
+        ValueError: si t está fuera de (-100, 200) °C
+    """
+    if not _es_escalar(t):
+        return _presion_vapor_saturado_np(t)
+    temperatura = float(t)
+    temp_k = 273.15 + temperatura
+    if -100 < temperatura < 0:
+        return math.exp(
+            (-(5.6745359 * 10 ** 3) / temp_k) + 6.3925247 -
+            ((9.6778430 * 10 ** -3) * temp_k) +
+            ((6.2215701 * 10 ** -7) * (temp_k) ** 2) +
+            ((2.0747825 * 10 ** -9) * (temp_k) ** 3) -
+            ((9.484024 * 10 ** -13) * (temp_k) ** 4) +
+            (4.1635019 * math.log(temp_k))
+        )
+    elif 0 <= temperatura < 200:
+        return math.exp(
+            (-(5.8002206 * 10 ** 3) / temp_k) + 1.3914993 -
+            ((48.640239 * 10 ** -3) * temp_k) +
+            ((41.764768 * 10 ** -6) * (temp_k) ** 2) -
+            ((14.452093 * 10 ** -9) * (temp_k) ** 3) +
+            (6.5459673 * math.log(temp_k))
+        )
+    raise ValueError(f"Temperatura {temperatura}°C fuera del rango válido (-100 a 200°C)")
+
+
+def razon_humedad(pv, patm):
+    """Razón de humedad W (kg_vapor/kg_aire_seco) con pv en Pa y patm en kPa."""
+    if not _es_escalar(pv, patm):
+        return _razon_humedad_np(_como_flotante(pv), _como_flotante(patm))
+    pv_kpa = pv / 1000
+    return 0.621945 * (pv_kpa / (patm - pv_kpa))
+
+
+def grado_saturacion(w, ws):
+    """mu = W/Ws (None o NaN si Ws es 0)."""
+    if _es_escalar(w, ws):
+        return w / ws if ws != 0 else None
+    w, ws = _como_flotante(w), _como_flotante(ws)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ws != 0, w / ws, np.nan)
+
+
+def volumen_especifico(tbs, w, patm):
+    """Volumen específico del aire húmedo (m3/kg_as), con patm en kPa."""
+    if not _es_escalar(tbs, w, patm):
+        tbs, w, patm = _como_flotante(tbs), _como_flotante(w), _como_flotante(patm)
+    tbsk = 273.15 + tbs
+    return ((CalculadoraPsicrometrica.RA * tbsk) / (patm * 1000.0)) * ((1 + 1.6087 * w) / (1 + w))
+
+
+def entalpia(tbs, w):
+    """Entalpía del aire húmedo (kJ/kg_as)."""
+    if not _es_escalar(tbs, w):
+        tbs, w = _como_flotante(tbs), _como_flotante(w)
+    return (1.006 * tbs) + w * (2501 + 1.805 * tbs)
+
+
+def temperatura_punto_rocio(tbs, pv):
+    """
+    Temperatura de punto de rocío (°C) con pv en Pa. Fuera de -60 a 70 °C
+    devuelve None (escalares) o NaN (arreglos).
+    """
+    if not _es_escalar(tbs, pv):
+        forma, (tbs, pv) = _arreglos(tbs, pv)
+        return _temperatura_punto_rocio_np(tbs, pv).reshape(forma)
+    if -60 < tbs < 0:
+        return -60.450 + 7.0322 * math.log(pv) + 0.3700 * (math.log(pv)) ** 2
+    elif 0 <= tbs < 70:
+        return -35.957 - 1.8726 * math.log(pv) + 1.1689 * (math.log(pv)) ** 2
+    return None
+
+
+def razon_humedad_psicrometrica(tbs, tbh, patm):
+    """W (kg/kg) a partir de Tbs y Tbh (°C) con la ecuación psicrométrica."""
+    if not _es_escalar(tbs, tbh, patm):
+        tbs, tbh, patm = _como_flotante(tbs), _como_flotante(tbh), _como_flotante(patm)
+    ws_tbh = razon_humedad(presion_vapor_saturado(tbh), patm)
+    numerador = ((2501 - 2.326 * tbh) * ws_tbh - 1.006 * (tbs - tbh))
+    denominador = (2501 + 1.86 * tbs - 4.186 * tbh)
+    return numerador / denominador
+
+
+def hr_psicrometrica(tbs, tbh, patm):
+    """Humedad relativa (fracción 0-1) a partir de Tbs y Tbh del psicrómetro."""
+    w = razon_humedad_psicrometrica(tbs, tbh, patm)
+    # invertir W = 0.621945 * pv / (patm - pv), con pv en kPa
+    pv = 1000.0 * w * patm / (0.621945 + w)
+    return pv / presion_vapor_saturado(tbs)
+
+
+def temperatura_bulbo_humedo(tbs, w, patm, hr=None, tolerancia=0.001, max_iteraciones=100):
+    """
+    Temperatura de bulbo húmedo (°C) por bisección en [-50, Tbs]; si la
+    ecuación no cambia de signo usa el respaldo empírico con hr.
+    Args:
+        tbs (°C), w (kg/kg), patm (kPa): escalares o arreglos
+        hr (fracción, opcional): para el respaldo; por defecto se obtiene de W
+        tolerancia (kg/kg), max_iteraciones: criterio de paro de la bisección
+    """
+    if hr is None:
+        if not _es_escalar(w, patm):
+            w, patm = _como_flotante(w), _como_flotante(patm)
+        hr = 1000.0 * w * patm / (0.621945 + w) / presion_vapor_saturado(tbs)
+    if not _es_escalar(tbs, w, patm, hr):
+        forma, (tbs, w, patm, hr) = _arreglos(tbs, w, patm, hr)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tbh = _temperatura_bulbo_humedo_np(tbs, hr, w, patm, tolerancia, max_iteraciones)
+        return tbh.reshape(forma)
+
+    def funcion_objetivo(tbh_prueba):
+        return razon_humedad_psicrometrica(tbs, tbh_prueba, patm) - w
+
+    tbh_min = -50.0
+    tbh_max = tbs
+    f_min = funcion_objetivo(tbh_min)
+    f_max = funcion_objetivo(tbh_max)
+
+    if f_min * f_max > 0:
+        # fallback empírico si no cambia de signo
+        return tbs - (1 - hr) * (tbs - 14) / 3
+
+    iteracion = 0
+    while iteracion < max_iteraciones:
+        tbh_prueba = (tbh_min + tbh_max) / 2.0
+        error = funcion_objetivo(tbh_prueba)
+        if abs(error) < tolerancia:
+            return tbh_prueba
+        if error > 0:
+            tbh_max = tbh_prueba
+        else:
+            tbh_min = tbh_prueba
+        iteracion += 1
+    return (tbh_min + tbh_max) / 2.0
+
+
 class CalculadoraPsicrometrica:
     """
     Clase para realizar cálculos psicrométricos del aire húmedo (por muestra).
     RA en J/kg*K.
-    Nota: el código original se ha preservado; las funciones devuelven valores escalares.
+    Nota: los métodos conservan la interfaz original y delegan en las
+    funciones sin estado de arriba; guardan cada resultado en la instancia,
+    así que una instancia no debe compartirse entre hilos (las funciones sí).
     """
 
     RA = 287.055  # J/kg*K, Constante del Gas para el Aire Seco
@@ -41,7 +212,7 @@ class CalculadoraPsicrometrica:
 
     def calcular_presion_atmosferica(self):
         """Calcula la presión atmosférica en kPa en función de la altitud (msnm)."""
-        self.patm = 101.325 * (1 - (2.25577 * 10 ** -5) * self.z) ** 5.2529
+        self.patm = presion_atmosferica(self.z)
         return self.patm
 
     def convertir_temperatura_kelvin(self):
@@ -53,38 +224,12 @@ class CalculadoraPsicrometrica:
         """
         Calcula la presión de vapor saturado.
         Devuelve pvs en Pa (como en tu versión original).
+        Sólo sin argumento (a Tbs) se guarda en self.pvs.
         """
-        if temperatura is None:
-            temperatura = self.tbs
-            temp_k = self.tbsk if self.tbsk is not None else 273.15 + self.tbs
-        else:
-            temp_k = 273.15 + temperatura
-
-        if -100 < temperatura < 0:
-            pvs = math.exp(
-                (-(5.6745359 * 10 ** 3) / temp_k) + 6.3925247 -
-                ((9.6778430 * 10 ** -3) * temp_k) +
-                ((6.2215701 * 10 ** -7) * (temp_k) ** 2) +
-                ((2.0747825 * 10 ** -9) * (temp_k) ** 3) -
-                ((9.484024 * 10 ** -13) * (temp_k) ** 4) +
-                (4.1635019 * math.log(temp_k))
-            )
-        elif 0 <= temperatura < 200:
-            pvs = math.exp(
-                (-(5.8002206 * 10 ** 3) / temp_k) + 1.3914993 -
-                ((48.640239 * 10 ** -3) * temp_k) +
-                ((41.764768 * 10 ** -6) * (temp_k) ** 2) -
-                ((14.452093 * 10 ** -9) * (temp_k) ** 3) +
-                (6.5459673 * math.log(temp_k))
-            )
-        else:
-            raise ValueError(f"Temperatura {temperatura}°C fuera del rango válido (-100 a 200°C)")
-
-        # Guardar en self.pvs solo si se calculó para la temperatura principal
-        if temperatura == self.tbs:
-            self.pvs = pvs
-
-        return pvs
+        if temperatura is not None:
+            return presion_vapor_saturado(temperatura)
+        self.pvs = presion_vapor_saturado(self.tbs)
+        return self.pvs
 
     def calcular_presion_vapor(self):
         """Calcula la presión de vapor Pv en Pa usando hr * pvs."""
@@ -116,9 +261,7 @@ class CalculadoraPsicrometrica:
             if self.patm is None:
                 self.calcular_presion_atmosferica()
             presion_atmosferica = self.patm
-
-        pv_kpa = presion_vapor / 1000
-        return 0.621945 * (pv_kpa / (presion_atmosferica - pv_kpa))
+        return razon_humedad(presion_vapor, presion_atmosferica)
 
     def calcular_grado_saturacion(self):
         """Calcula mu = W/Ws."""
@@ -128,20 +271,17 @@ class CalculadoraPsicrometrica:
             if self.pvs is None:
                 self.calcular_presion_vapor_saturado()
             self.ws = self.calcular_razon_humedad(self.pvs, self.patm)
-        self.mu = self.w / self.ws if self.ws != 0 else None
+        self.mu = grado_saturacion(self.w, self.ws)
         return self.mu
 
     def calcular_volumen_especifico(self):
         """Calcula el volumen específico del aire húmedo (m3/kg_as)."""
-        if self.tbsk is None:
-            self.convertir_temperatura_kelvin()
         if self.patm is None:
             self.calcular_presion_atmosferica()
         if self.w is None:
             self.w = self.calcular_razon_humedad()
-
-        # patm en kPa -> convertir a Pa multiplicando por 1000
-        self.veh = ((self.RA * self.tbsk) / (self.patm * 1000.0)) * ((1 + 1.6087 * self.w) / (1 + self.w))
+        self.convertir_temperatura_kelvin()
+        self.veh = volumen_especifico(self.tbs, self.w, self.patm)
         return self.veh
 
     def calcular_entalpia(self, temperatura=None, razon_humedad=None):
@@ -152,25 +292,33 @@ class CalculadoraPsicrometrica:
             if self.w is None:
                 self.w = self.calcular_razon_humedad()
             razon_humedad = self.w
-
-        self.h = (1.006 * temperatura) + razon_humedad * (2501 + 1.805 * temperatura)
+        self.h = entalpia(temperatura, razon_humedad)
         return self.h
 
     def calcular_temperatura_punto_rocio(self):
         """Calcula temperatura del punto de rocío Tpr en °C (aprox.)"""
         if self.pv is None:
             self.calcular_presion_vapor()
-
-        # Estas fórmulas usan ln(pv) con pv en Pa
-        if -60 < self.tbs < 0:
-            self.tpr = -60.450 + 7.0322 * math.log(self.pv) + 0.3700 * (math.log(self.pv)) ** 2
-        elif 0 <= self.tbs < 70:
-            self.tpr = -35.957 - 1.8726 * math.log(self.pv) + 1.1689 * (math.log(self.pv)) ** 2
-        else:
-            # Si está fuera de rango, lo dejamos None pero no rompemos
-            self.tpr = None
+        # Si está fuera de rango queda None pero no rompemos
+        self.tpr = temperatura_punto_rocio(self.tbs, self.pv)
         return self.tpr
 
+    def calcular_hr_psicrometrica(self, tbh):
+        """
+        Calcula la humedad relativa a partir de Tbs y de la temperatura de
+        bulbo húmedo medida (psicrómetro), con la misma ecuación psicrométrica
+        de calcular_temperatura_bulbo_humedo. Actualiza self.hr, self.pv y self.w.
+        Devuelve HR en % (0-100).
+        """
+        if self.patm is None:
+            self.calcular_presion_atmosferica()
+        self.w = razon_humedad_psicrometrica(self.tbs, tbh, self.patm)
+        # invertir W = 0.621945 * pv / (patm - pv), con pv en kPa
+        self.pv = 1000.0 * self.w * self.patm / (0.621945 + self.w)
+        self.calcular_presion_vapor_saturado()
+        self.hr = self.pv / self.pvs
+        return self.hr * 100.0
+
     def calcular_temperatura_bulbo_humedo(self, tolerancia=0.001, max_iteraciones=100):
         """
         Calcula la temperatura de bulbo húmedo (Tbh) por bisección.
@@ -181,40 +329,8 @@ class CalculadoraPsicrometrica:
         if self.w is None:
             self.calcular_presion_vapor()
             self.w = self.calcular_razon_humedad(self.pv, self.patm)
-
-        def funcion_objetivo(tbh_prueba):
-            pvs_tbh = self.calcular_presion_vapor_saturado(tbh_prueba)
-            ws_tbh = self.calcular_razon_humedad(pvs_tbh, self.patm)
-            # Ecuación psicrométrica aproximada (unidades SI)
-            numerador = ((2501 - 2.326 * tbh_prueba) * ws_tbh - 1.006 * (self.tbs - tbh_prueba))
-            denominador = (2501 + 1.86 * self.tbs - 4.186 * tbh_prueba)
-            w_calculada = numerador / denominador
-            return w_calculada - self.w
-
-        tbh_min = -50.0
-        tbh_max = self.tbs
-        f_min = funcion_objetivo(tbh_min)
-        f_max = funcion_objetivo(tbh_max)
-
-        if f_min * f_max > 0:
-            # fallback empírico si no cambia de signo
-            self.tbh = self.tbs - (1 - self.hr) * (self.tbs - 14) / 3
-            return self.tbh
-
-        iteracion = 0
-        while iteracion < max_iteraciones:
-            tbh_prueba = (tbh_min + tbh_max) / 2.0
-            error = funcion_objetivo(tbh_prueba)
-            if abs(error) < tolerancia:
-                self.tbh = tbh_prueba
-                return self.tbh
-            if error > 0:
-                tbh_max = tbh_prueba
-            else:
-                tbh_min = tbh_prueba
-            iteracion += 1
-
-        self.tbh = (tbh_min + tbh_max) / 2.0
+        self.tbh = temperatura_bulbo_humedo(self.tbs, self.w, self.patm, self.hr,
+                                            tolerancia, max_iteraciones)
         return self.tbh
 
     def calcular_todo(self):
@@ -262,6 +378,8 @@ def _ensure_list(x):
     """Si x no es iterable (o es str), lo convierte en lista de un elemento."""
     if x is None:
         return []
+    if isinstance(x, np.ndarray):
+        return x.tolist()
     if isinstance(x, (list, tuple)):
         return list(x)
     # strings considered single scalar
@@ -276,7 +394,8 @@ def calcular_vectorial(z, tbs_list, hr_list):
         tbs_list (iterable): temperaturas bulbo seco (°C)
         hr_list (iterable): humid relativa (0-1 o 0-100)
     Returns:
-        list of dicts: resultados por muestra
+        TablaResultados: resultados por muestra (se indexa e itera como la
+        lista de dicts de antes; r['W_kgkg'] da la columna completa)
     """
     tbs_l = _ensure_list(tbs_list)
     hr_l = _ensure_list(hr_list)
@@ -284,145 +403,314 @@ def calcular_vectorial(z, tbs_list, hr_list):
     if len(tbs_l) != len(hr_l):
         raise ValueError("tbs_list y hr_list deben tener la misma longitud.")
 
-    resultados = []
+    columnas = {campo: [] for campo in CAMPOS_SALIDA}
     for tbs, hr in zip(tbs_l, hr_l):
         calc = CalculadoraPsicrometrica(z, tbs, hr)
         res = calc.calcular_todo()
         # añadir datos de entrada para referencia
         res['Tbs_C'] = float(tbs)
         res['HR_frac'] = float(hr) / 100.0 if float(hr) > 1.0 else float(hr)
-        resultados.append(res)
-    return resultados
+        for campo in CAMPOS_SALIDA:
+            valor = res[campo]
+            columnas[campo].append(np.nan if valor is None else valor)
+    return TablaResultados({campo: np.array(valores, dtype=np.float64) for campo, valores in columnas.items()})
 
 
-def leer_csv_o_txt(filepath, delim=None, encabezados_esperados=None):
+# -----------------------
+# Lectura de archivos (CSV/TXT y Excel)
+# -----------------------
+
+# Nombres de encabezado aceptados por columna (sin distinguir mayúsculas).
+# Los usan leer_csv_o_txt, procesar_archivo y leer_tbs_tbh (carta_p2.py).
+ALIAS_COLUMNAS = {
+    'tbs': ['Tbs', 'T_bulbo_sec', 'Tbulbo', 'T', 't_seca', 't_bulbo_seco', 'temp'],
+    'hr': ['HR', 'Humedad', 'phi', 'phi%', 'hum%'],
+    'tbh': ['Tbh', 't_humeda', 't_bulbo_humedo', 'wet', 'tw'],
+}
+MAX_LINEAS_INVALIDAS = 100  # líneas inválidas que se listan en el informe
+LINEAS_POR_BLOQUE = 100000  # líneas que se convierten juntas al leer texto
+
+
+def registrar_alias(columna, *nombres):
+    """Agrega nombres de encabezado aceptados para una columna (p. ej. 'tbs')."""
+    lista = ALIAS_COLUMNAS.setdefault(columna, [])
+    for nombre in nombres:
+        if nombre.lower() not in [a.lower() for a in lista]:
+            lista.append(nombre)
+
+
+def _detectar_delimitador(muestra):
+    """',' si aparece en la muestra; si no ';' o tabulador; ',' por defecto."""
+    for delim in (',', ';', '\t'):
+        if delim in muestra:
+            return delim
+    return ','
+
+
+def _es_numero(celda):
+    try:
+        float(celda)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _ubicar_columnas(primera_fila, columnas, alias):
     """
-    Lee un CSV o TXT delimitado y busca columnas para Tbs y HR.
-    delim: si None, intenta detectar por coma o tab.
-    encabezados_esperados: lista de posibles nombres para Tbs y HR:
-       {'tbs': ['Tbs','tbs','T_bulbo_sec','Tbulbo'],'hr': ['HR','hr','humedad','phi','phi%']}
-    Devuelve (tbs_list, hr_list)
+    Busca cada columna por nombre en la primera fila. Si ningún nombre se
+    reconoce, las columnas se toman por posición (0, 1, ...); si sólo se
+    reconocen algunas, la posición podría repetir una columna ya ubicada
+    (Tbs leída como HR), así que se lanza ValueError.
+    Returns:
+        tuple: (índices, hay_encabezado)
     """
-    if encabezados_esperados is None:
-        encabezados_esperados = {
-            'tbs': ['Tbs', 'tbs', 'T_bulbo_sec', 'Tbulbo', 'T'],
-            'hr': ['HR', 'hr', 'Humedad', 'humedad', 'phi', 'phi%','hum%']
-        }
+    encabezado = ['' if c is None else str(c).strip().lower() for c in primera_fila]
+    por_nombre = {}
+    for columna in columnas:
+        nombres = [n.lower() for n in alias.get(columna, [])] + [columna.lower()]
+        coincidencias = [i for i, c in enumerate(encabezado) if c in nombres]
+        if coincidencias:
+            por_nombre[columna] = coincidencias[-1]
+    if por_nombre:
+        faltantes = [c for c in columnas if c not in por_nombre]
+        if faltantes:
+            aceptados = {c: list(alias.get(c, [])) + [c] for c in faltantes}
+            raise ValueError(f"Columnas no encontradas en el encabezado {list(primera_fila)}: "
+                             f"{faltantes}. Nombres aceptados: {aceptados}")
+        return [por_nombre[c] for c in columnas], True
+    indices = list(range(len(columnas)))
+    # sin nombres reconocidos, la primera fila es encabezado sólo si no es numérica
+    hay_encabezado = not all(i < len(primera_fila) and _es_numero(primera_fila[i]) for i in indices)
+    return indices, hay_encabezado
+
+
+def _columnas_a_arreglos(filas, indices):
+    """
+    Convierte filas ya separadas en celdas a un arreglo float64 por columna.
+    Cada columna se convierte en bloque; sólo si falla se revisa celda por
+    celda para marcar las filas cortas, vacías o no numéricas.
+    Returns:
+        tuple: (valores (n_columnas, n_filas), filas válidas (bool))
+    """
+    n = len(filas)
+    valores = np.empty((len(indices), n), dtype=np.float64)
+    validas = np.ones(n, dtype=bool)
+    for j, i in enumerate(indices):
+        celdas = [f[i] if i < len(f) else None for f in filas]
+        try:
+            if any(c is None for c in celdas):
+                raise TypeError  # numpy convertiría None en NaN
+            valores[j] = celdas
+        except (TypeError, ValueError):
+            for k, celda in enumerate(celdas):
+                try:
+                    valores[j, k] = float(celda)
+                except (TypeError, ValueError):
+                    valores[j, k] = np.nan
+                    validas[k] = False
+    return valores, validas
+
+
+def _informe_lectura(n_filas, validas, numeros_fila, motor):
+    invalidas = np.flatnonzero(~validas)
+    return {
+        'filas': n_filas,
+        'validas': n_filas - len(invalidas),
+        'invalidas': len(invalidas),
+        'lineas_invalidas': [int(numeros_fila[k]) for k in invalidas[:MAX_LINEAS_INVALIDAS]],
+        'motor': motor,
+    }
+
 
-    with open(filepath, 'r', newline='', encoding='utf-8') as f:
-        sample = f.read(2048)
+def _filas_excel(filepath, ext):
+    """Filas (tuplas de celdas) de la primera hoja de un .xlsx o .xls."""
+    try:
+        if ext == '.xlsx':
+            import openpyxl
+            wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+            return list(wb.active.iter_rows(values_only=True))
+        import xlrd
+        sh = xlrd.open_workbook(filepath).sheet_by_index(0)
+        return [sh.row_values(i) for i in range(sh.nrows)]
+    except Exception:
+        raise RuntimeError("No se pudo leer archivo Excel: instala 'openpyxl' (xlsx) o 'xlrd' (xls), "
+                           "o convierte el archivo a CSV.")
+
+
+def leer_columnas(filepath, columnas=('tbs', 'hr'), delim=None, alias=None, dtype=np.float64):
+    """
+    Lector único de columnas numéricas para CSV/TXT y Excel.
+    Las columnas se ubican por nombre (ALIAS_COLUMNAS) y se convierten
+    directo a arreglos. El texto se lee por bloques de LINEAS_POR_BLOQUE con
+    np.loadtxt (en C); sólo un bloque con filas cortas o no numéricas se
+    relee con el módulo csv, y esas filas se descartan y se cuentan.
+    Args:
+        filepath (str): .csv, .txt, .xlsx o .xls
+        columnas (tuple): claves de ALIAS_COLUMNAS a leer; si no hay
+            encabezado reconocible se toman por posición
+        delim (str, opcional): delimitador; None = detectar (',', ';' o tab)
+        alias (dict, opcional): {columna: [nombres]} en lugar de ALIAS_COLUMNAS
+        dtype: tipo de los arreglos devueltos
+    Returns:
+        tuple: ({columna: np.ndarray}, informe) con informe = {'filas',
+        'validas', 'invalidas', 'lineas_invalidas' (número de línea en el
+        archivo, hasta MAX_LINEAS_INVALIDAS), 'motor' ('numpy', 'csv' o 'excel')}
+    """
+    if alias is None:
+        alias = ALIAS_COLUMNAS
+    ext = os.path.splitext(filepath)[1].lower()
+
+    if ext in ('.xls', '.xlsx'):
+        filas = _filas_excel(filepath, ext)
+        filas = [f for f in filas if f and any(c not in (None, '') for c in f)]
+        if not filas:
+            return {c: np.empty(0, dtype=dtype) for c in columnas}, _informe_lectura(0, np.ones(0, bool), [], 'excel')
+        indices, hay_encabezado = _ubicar_columnas(filas[0], columnas, alias)
+        saltar = 1 if hay_encabezado else 0
+        valores, validas = _columnas_a_arreglos(filas[saltar:], indices)
+        informe = _informe_lectura(len(validas), validas, range(saltar + 1, len(filas) + 1), 'excel')
+        return {c: valores[j][validas].astype(dtype) for j, c in enumerate(columnas)}, informe
+
+    bloques, validas, numeros_fila = [], [], []
+    motor = 'numpy'
+    for valores, validas_bloque, numeros_bloque, motor_bloque in _bloques_texto(filepath, columnas, delim, alias):
+        bloques.append(valores)
+        validas.append(validas_bloque)
+        numeros_fila.append(numeros_bloque)
+        if motor_bloque == 'csv':
+            motor = 'csv'
+
+    valores = np.concatenate(bloques, axis=1) if bloques else np.empty((len(columnas), 0))
+    validas = np.concatenate(validas) if validas else np.ones(0, dtype=bool)
+    numeros_fila = np.concatenate(numeros_fila) if numeros_fila else []
+    informe = _informe_lectura(len(validas), validas, numeros_fila, motor)
+    return {c: valores[j][validas].astype(dtype) for j, c in enumerate(columnas)}, informe
+
+
+def _bloques_texto(filepath, columnas, delim, alias):
+    """
+    Bloques de LINEAS_POR_BLOQUE líneas de un CSV/TXT ya convertidos.
+    Yields:
+        tuple: (valores (n_columnas, n_filas), filas válidas, número de
+        línea de cada fila, motor del bloque ('numpy' o 'csv'))
+    """
+    with open(filepath, 'r', newline='', encoding='utf-8-sig') as f:
+        muestra = f.read(2048)
         f.seek(0)
-        # detectar delimitador sencillo
         if delim is None:
-            if ',' in sample:
-                delim = ','
-            elif '\t' in sample:
-                delim = '\t'
-            else:
-                delim = ','
-
-        reader = csv.reader(f, delimiter=delim)
-        rows = list(reader)
-        if not rows:
-            return [], []
-
-        header = [h.strip() for h in rows[0]]
-        # intentar identificar columnas por nombre
-        col_tbs = None
-        col_hr = None
-        for i, col in enumerate(header):
-            low = col.lower()
-            for candidate in encabezados_esperados['tbs']:
-                if candidate.lower() == low:
-                    col_tbs = i
-            for candidate in encabezados_esperados['hr']:
-                if candidate.lower() == low:
-                    col_hr = i
-
-        data_rows = rows[1:] if col_tbs is not None and col_hr is not None else rows  # si no hay header, leer todo
-        tbs_list = []
-        hr_list = []
-        for r in data_rows:
-            # proteger si fila corta
-            if col_tbs is not None and col_hr is not None:
-                try:
-                    tbs_list.append(float(r[col_tbs]))
-                    hr_list.append(float(r[col_hr]))
-                except Exception:
-                    # intentar saltar filas corruptas
-                    continue
-            else:
-                # si no hay encabezado, intentar tomar las primeras 2 columnas como tbs,hr
-                if len(r) >= 2:
-                    try:
-                        tbs_list.append(float(r[0]))
-                        hr_list.append(float(r[1]))
-                    except Exception:
+            delim = _detectar_delimitador(muestra)
+        primera_fila = next(csv.reader(f, delimiter=delim), None)
+    if not primera_fila:
+        return
+    indices, hay_encabezado = _ubicar_columnas(primera_fila, columnas, alias)
+    saltar = 1 if hay_encabezado else 0
+
+    # por bloques de líneas: np.loadtxt (en C) convierte cada bloque limpio;
+    # sólo los bloques con filas cortas o no numéricas pasan por csv
+    with open(filepath, 'r', newline='', encoding='utf-8-sig') as f:
+        n_linea = saltar
+        for _ in range(saltar):
+            f.readline()
+        while True:
+            lineas = list(itertools.islice(f, LINEAS_POR_BLOQUE))
+            if not lineas:
+                break
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', UserWarning)  # bloque sin datos
+                    valores = np.loadtxt(lineas, delimiter=delim, usecols=indices, dtype=np.float64,
+                                         ndmin=2, comments=None, quotechar='"').T
+                validas_bloque = np.ones(valores.shape[1], dtype=bool)
+                numeros_bloque = np.zeros(valores.shape[1], dtype=int)  # sólo se consultan las inválidas
+                motor = 'numpy'
+            except ValueError:
+                motor = 'csv'
+                filas, numeros_bloque = [], []
+                for n, fila in enumerate(csv.reader(lineas, delimiter=delim), start=n_linea + 1):
+                    if not fila or (len(fila) == 1 and not fila[0].strip()):
                         continue
+                    filas.append(fila)
+                    numeros_bloque.append(n)
+                valores, validas_bloque = _columnas_a_arreglos(filas, indices)
+            yield valores, validas_bloque, np.asarray(numeros_bloque, dtype=int), motor
+            n_linea += len(lineas)
+
+
+def iterar_columnas(filepath, columnas=('tbs', 'hr'), delim=None, alias=None, dtype=np.float64):
+    """
+    Como leer_columnas, pero por bloques de LINEAS_POR_BLOQUE líneas para no
+    tener el archivo completo en memoria (un Excel se entrega en un solo
+    bloque). Las filas no numéricas se descartan sin informe.
+    Yields:
+        dict: {columna: np.ndarray} de cada bloque
+    """
+    if alias is None:
+        alias = ALIAS_COLUMNAS
+    if os.path.splitext(filepath)[1].lower() in ('.xls', '.xlsx'):
+        yield leer_columnas(filepath, columnas, delim, alias, dtype)[0]
+        return
+    for valores, validas, _, _ in _bloques_texto(filepath, columnas, delim, alias):
+        yield {c: valores[j][validas].astype(dtype) for j, c in enumerate(columnas)}
+
 
-    return tbs_list, hr_list
+def _avisar_filas_invalidas(filepath, informe):
+    """RuntimeWarning (silenciable con warnings.filterwarnings) si se omitieron filas."""
+    if informe['invalidas']:
+        lineas = ', '.join(str(n) for n in informe['lineas_invalidas'][:10])
+        if informe['invalidas'] > 10:
+            lineas += ', ...'
+        warnings.warn(f"Se omitieron {informe['invalidas']} de {informe['filas']} filas no numéricas "
+                      f"de {filepath} (líneas {lineas}).", RuntimeWarning, stacklevel=3)
 
 
-def procesar_archivo(filepath, z, delim=None, encabezados_esperados=None, guardar_salida=None):
+def leer_csv_o_txt(filepath, delim=None, encabezados_esperados=None):
+    """
+    Lee un CSV o TXT delimitado (o un Excel) y busca columnas para Tbs y HR.
+    delim: si None, detecta coma, punto y coma o tab.
+    encabezados_esperados: nombres posibles para Tbs y HR; por defecto ALIAS_COLUMNAS:
+       {'tbs': ['Tbs','T_bulbo_sec','Tbulbo',...],'hr': ['HR','Humedad','phi','phi%',...]}
+    Devuelve (tbs_list, hr_list); las filas no numéricas se omiten (ver leer_columnas).
+    """
+    datos, informe = leer_columnas(filepath, ('tbs', 'hr'), delim=delim, alias=encabezados_esperados)
+    _avisar_filas_invalidas(filepath, informe)
+    return datos['tbs'].tolist(), datos['hr'].tolist()
+
+
+def procesar_archivo(filepath, z, delim=None, encabezados_esperados=None, guardar_salida=None,
+                     resolucion=None, cache=None, dtype=None, errores='lanzar'):
     """
     Lee un archivo (CSV/TXT). Devuelve resultados vectoriales.
     Si el archivo es .xls/.xlsx intentará usar openpyxl/xlrd si están disponibles.
     guardar_salida: ruta de archivo CSV donde escribir resultados (opcional).
+    resolucion / cache / dtype: si se indica alguno, usa el motor por lotes
+       con deduplicación (ver calcular_lote). La misma cache puede pasarse a
+       varios archivos para reutilizar estados ya calculados.
+    errores: 'lanzar' (por defecto) o 'mascara'; en modo 'mascara' las filas
+       inválidas quedan en None con la columna 'estado' (ver calcular_lote) y
+       el archivo se procesa completo sin excepciones.
+    Devuelve una TablaResultados (ver calcular_vectorial).
     """
     ext = os.path.splitext(filepath)[1].lower()
-    if ext in ['.csv', '.txt']:
-        tbs_list, hr_list = leer_csv_o_txt(filepath, delim=delim, encabezados_esperados=encabezados_esperados)
-    elif ext in ['.xls', '.xlsx']:
-        # intentar usar librería si está instalada
-        try:
-            if ext == '.xlsx':
-                import openpyxl
-                wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
-                ws = wb.active
-                rows = list(ws.values)
-                # asumir primera fila header si strings
-                header = rows[0]
-                tbs_list = []
-                hr_list = []
-                # intentar detectar columnas por nombre
-                headers = [str(h).strip().lower() if h is not None else '' for h in header]
-                col_tbs = None
-                col_hr = None
-                for i, col in enumerate(headers):
-                    if col in ('tbs','t','t_bulbo_sec','tbulbo'):
-                        col_tbs = i
-                    if col in ('hr','humedad','phi','phi%'):
-                        col_hr = i
-                for r in rows[1:]:
-                    try:
-                        if col_tbs is not None and col_hr is not None:
-                            tbs_list.append(float(r[col_tbs]))
-                            hr_list.append(float(r[col_hr]))
-                        else:
-                            tbs_list.append(float(r[0]))
-                            hr_list.append(float(r[1]))
-                    except Exception:
-                        continue
-            else:
-                import xlrd
-                wb = xlrd.open_workbook(filepath)
-                sh = wb.sheet_by_index(0)
-                rows = [sh.row_values(i) for i in range(sh.nrows)]
-                # reusar lector csv logic:
-                # escribir temporal csv-like in memory is possible but por brevedad:
-                tbs_list, hr_list = leer_csv_o_txt(filepath, delim=delim, encabezados_esperados=encabezados_esperados)
-        except Exception:
-            raise RuntimeError("No se pudo leer archivo Excel: instala 'openpyxl' (xlsx) o convierte el archivo a CSV.")
-    else:
+    if ext not in ['.csv', '.txt', '.xls', '.xlsx']:
         raise ValueError("Extensión no soportada. Use .csv, .txt, .xls o .xlsx (o convierta a .csv).")
+    datos, informe = leer_columnas(filepath, ('tbs', 'hr'), delim=delim, alias=encabezados_esperados)
+    _avisar_filas_invalidas(filepath, informe)
+    tbs_list, hr_list = datos['tbs'], datos['hr']
 
     # ahora calcular vectorial
-    resultados = calcular_vectorial(z, tbs_list, hr_list)
+    if resolucion is not None or cache is not None or dtype is not None or errores != 'lanzar':
+        # motor por lotes: cada estado distinto se calcula una sola vez
+        columnas = calcular_lote(z, tbs_list, hr_list, resolucion=resolucion,
+                                 deduplicar=True, cache=cache,
+                                 dtype=dtype if dtype is not None else np.float64,
+                                 errores=errores)
+        resultados = TablaResultados(columnas)
+    else:
+        resultados = calcular_vectorial(z, tbs_list, hr_list)
 
     # si se solicita guardar salida, escribir CSV con columnas ordenadas
     if guardar_salida:
-        campos = ['Tbs_C', 'HR_frac', 'patm_kPa', 'pv_Pa', 'pvs_Pa', 'dpva_Pa',
-                  'W_kgkg', 'Ws_kgkg', 'mu', 'veh_m3kg', 'h_kJkg', 'Tpr_C', 'Tbh_C']
+        campos = CAMPOS_SALIDA + (['estado'] if errores == 'mascara' else [])
         with open(guardar_salida, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=campos)
             writer.writeheader()
@@ -434,3 +722,520 @@ def procesar_archivo(filepath, z, delim=None, encabezados_esperados=None, guarda
     return resultados
 
 
+# -----------------------
+# Motor por lotes (NumPy)
+# -----------------------
+
+CAMPOS_SALIDA = ['Tbs_C', 'HR_frac', 'patm_kPa', 'pv_Pa', 'pvs_Pa', 'dpva_Pa',
+                 'W_kgkg', 'Ws_kgkg', 'mu', 'veh_m3kg', 'h_kJkg', 'Tpr_C', 'Tbh_C']
+
+
+def _como_flotante(x, dtype=None):
+    """Arreglo flotante; conserva float32/float64 si ya lo es (dtype lo fuerza)."""
+    x = np.asarray(x)
+    if dtype is not None:
+        return x.astype(dtype, copy=False)
+    if x.dtype not in (np.float32, np.float64):
+        return x.astype(np.float64)
+    return x
+
+
+def _presion_atmosferica_np(z):
+    """Presión atmosférica (kPa) para un arreglo de altitudes (msnm)."""
+    return 101.325 * (1 - (2.25577 * 10 ** -5) * z) ** 5.2529
+
+
+def _presion_vapor_saturado_np(t):
+    """
+    Presión de vapor saturado (Pa) para un arreglo de temperaturas (°C).
+    Misma correlación (hielo / agua líquida) que
+    CalculadoraPsicrometrica.calcular_presion_vapor_saturado.
+    El exponente siempre se evalúa en float64 (sus términos, de magnitud ~40,
+    se cancelan hasta ~8) y el resultado se devuelve en el dtype de t.
+    """
+    t = _como_flotante(t)
+    validos = (t > -100) & (t < 200)
+    if not np.all(validos):
+        malo = t[~validos].flat[0]
+        raise ValueError(f"Temperatura {malo}°C fuera del rango válido (-100 a 200°C)")
+    tk = 273.15 + t.astype(np.float64)
+    pvs = np.empty_like(tk)
+    hielo = t < 0
+    th = tk[hielo]
+    pvs[hielo] = np.exp(
+        (-(5.6745359 * 10 ** 3) / th) + 6.3925247 -
+        ((9.6778430 * 10 ** -3) * th) +
+        ((6.2215701 * 10 ** -7) * th ** 2) +
+        ((2.0747825 * 10 ** -9) * th ** 3) -
+        ((9.484024 * 10 ** -13) * th ** 4) +
+        (4.1635019 * np.log(th))
+    )
+    ta = tk[~hielo]
+    pvs[~hielo] = np.exp(
+        (-(5.8002206 * 10 ** 3) / ta) + 1.3914993 -
+        ((48.640239 * 10 ** -3) * ta) +
+        ((41.764768 * 10 ** -6) * ta ** 2) -
+        ((14.452093 * 10 ** -9) * ta ** 3) +
+        (6.5459673 * np.log(ta))
+    )
+    return pvs.astype(t.dtype, copy=False)
+
+
+def _razon_humedad_np(pv, patm):
+    """W (kg/kg) con pv en Pa y patm en kPa."""
+    pv_kpa = pv / 1000
+    return 0.621945 * (pv_kpa / (patm - pv_kpa))
+
+
+def _temperatura_punto_rocio_np(tbs, pv):
+    """Tpr (°C); NaN donde la calculadora escalar devuelve None (fuera de -60..70 °C)."""
+    tpr = np.full_like(pv, np.nan)
+    hielo = (tbs > -60) & (tbs < 0)
+    agua = (tbs >= 0) & (tbs < 70)
+    rango = hielo | agua
+    if np.any(pv[rango] <= 0):
+        raise ValueError("math domain error: Pv <= 0 en el cálculo de Tpr")
+    ln_pv = np.log(pv, where=rango, out=np.zeros_like(pv))
+    tpr[hielo] = -60.450 + 7.0322 * ln_pv[hielo] + 0.3700 * ln_pv[hielo] ** 2
+    tpr[agua] = -35.957 - 1.8726 * ln_pv[agua] + 1.1689 * ln_pv[agua] ** 2
+    return tpr
+
+
+def _residuo_bulbo_humedo_np(tbh_prueba, tbs, w, patm):
+    """Residuo de la ecuación psicrométrica: W(Tbs, Tbh) - W (kg/kg)."""
+    ws_tbh = _razon_humedad_np(_presion_vapor_saturado_np(tbh_prueba), patm)
+    numerador = (2501 - 2.326 * tbh_prueba) * ws_tbh - 1.006 * (tbs - tbh_prueba)
+    denominador = 2501 + 1.86 * tbs - 4.186 * tbh_prueba
+    return numerador / denominador - w
+
+
+def _temperatura_bulbo_humedo_np(tbs, hr, w, patm, tolerancia=0.001, max_iteraciones=100):
+    """
+    Tbh (°C) por bisección vectorizada. Reproduce paso a paso el algoritmo de
+    calcular_temperatura_bulbo_humedo (intervalo [-50, Tbs], mismo criterio de
+    paro y mismo respaldo empírico), pero resolviendo todas las muestras a la
+    vez; las que convergen salen del arreglo activo.
+    """
+    funcion_objetivo = _residuo_bulbo_humedo_np
+    tbh = np.empty_like(tbs)
+    tbh_min = np.full_like(tbs, -50.0)
+    tbh_max = tbs.copy()
+    f_min = funcion_objetivo(tbh_min, tbs, w, patm)
+    f_max = funcion_objetivo(tbh_max, tbs, w, patm)
+
+    # fallback empírico si no cambia de signo
+    sin_cambio = f_min * f_max > 0
+    tbh[sin_cambio] = tbs[sin_cambio] - (1 - hr[sin_cambio]) * (tbs[sin_cambio] - 14) / 3
+
+    activos = np.flatnonzero(~sin_cambio)
+    tbh_min, tbh_max = tbh_min[activos], tbh_max[activos]
+    tbs_a, w_a, patm_a = tbs[activos], w[activos], patm[activos]
+    for _ in range(max_iteraciones):
+        if activos.size == 0:
+            break
+        tbh_prueba = (tbh_min + tbh_max) / 2.0
+        error = funcion_objetivo(tbh_prueba, tbs_a, w_a, patm_a)
+        listo = np.abs(error) < tolerancia
+        tbh[activos[listo]] = tbh_prueba[listo]
+
+        sigue = ~listo
+        activos, tbh_prueba, error = activos[sigue], tbh_prueba[sigue], error[sigue]
+        tbh_min, tbh_max = tbh_min[sigue], tbh_max[sigue]
+        tbs_a, w_a, patm_a = tbs_a[sigue], w_a[sigue], patm_a[sigue]
+        positivo = error > 0
+        tbh_max = np.where(positivo, tbh_prueba, tbh_max)
+        tbh_min = np.where(positivo, tbh_min, tbh_prueba)
+
+    tbh[activos] = (tbh_min + tbh_max) / 2.0
+    return tbh
+
+
+def _calcular_columnas(z, tbs, hr):
+    """
+    Núcleo del motor por lotes: recibe arreglos 1D float de igual longitud
+    (hr ya en fracción) y devuelve un dict {campo: np.ndarray}.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        patm = _presion_atmosferica_np(z)
+        tbsk = 273.15 + tbs
+        pvs = _presion_vapor_saturado_np(tbs)
+        pv = hr * pvs
+        dpva = pvs - pv
+        w = _razon_humedad_np(pv, patm)
+        ws = _razon_humedad_np(pvs, patm)
+        mu = np.where(ws != 0, w / ws, np.nan)
+        veh = ((CalculadoraPsicrometrica.RA * tbsk) / (patm * 1000.0)) * ((1 + 1.6087 * w) / (1 + w))
+        h = (1.006 * tbs) + w * (2501 + 1.805 * tbs)
+        tpr = _temperatura_punto_rocio_np(tbs, pv)
+        tbh = _temperatura_bulbo_humedo_np(tbs, hr, w, patm)
+
+    return {
+        'Tbs_C': tbs, 'HR_frac': hr, 'patm_kPa': patm, 'pv_Pa': pv,
+        'pvs_Pa': pvs, 'dpva_Pa': dpva, 'W_kgkg': w, 'Ws_kgkg': ws, 'mu': mu,
+        'veh_m3kg': veh, 'h_kJkg': h, 'Tpr_C': tpr, 'Tbh_C': tbh
+    }
+
+
+class CacheEstados:
+    """
+    Caché LRU acotada de estados psicrométricos ya resueltos.
+    La clave es la tupla (Tbs, HR, z) ya cuantizada y el valor la fila de
+    resultados (en el orden de CAMPOS_SALIDA). Una misma instancia puede
+    pasarse a varias llamadas de calcular_lote (bloques, archivos).
+    """
+
+    def __init__(self, max_estados=100000):
+        """
+        Args:
+            max_estados (int): número máximo de estados guardados; al
+                superarlo se descarta el usado hace más tiempo.
+        """
+        self.max_estados = int(max_estados)
+        self._estados = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._estados)
+
+    def obtener(self, clave):
+        """Devuelve la fila guardada para clave (o None) y la marca como reciente."""
+        fila = self._estados.get(clave)
+        if fila is None:
+            self.fallos += 1
+            return None
+        self._estados.move_to_end(clave)
+        self.aciertos += 1
+        return fila
+
+    def guardar(self, clave, fila):
+        """Guarda una fila de resultados y recorta la caché a max_estados."""
+        self._estados[clave] = fila
+        self._estados.move_to_end(clave)
+        while len(self._estados) > self.max_estados:
+            self._estados.popitem(last=False)
+
+    def limpiar(self):
+        self._estados.clear()
+        self.aciertos = 0
+        self.fallos = 0
+
+
+def _cuantizar(valores, paso):
+    """Redondea valores a la malla de resolución paso (None = sin cambio)."""
+    if not paso:
+        return valores
+    return np.round(valores / paso) * paso
+
+
+# Banderas de la columna 'estado' (modo errores='mascara'); se combinan por bits
+ESTADO_OK = 0
+ESTADO_NO_NUMERICO = 1      # Tbs, HR o z es NaN/inf
+ESTADO_TBS_FUERA_RANGO = 2  # Tbs fuera de (-100, 200) °C
+ESTADO_HR_FUERA_RANGO = 4   # HR (en fracción) fuera de (0, 1]
+ESTADO_Z_FUERA_RANGO = 8    # altitud sin presión atmosférica positiva
+ESTADO_SIN_TPR = 16         # Tbs fuera de (-60, 70) °C: Tpr no definido (fila válida)
+ESTADOS_INVALIDOS = (ESTADO_NO_NUMERICO | ESTADO_TBS_FUERA_RANGO |
+                     ESTADO_HR_FUERA_RANGO | ESTADO_Z_FUERA_RANGO)
+NOMBRES_ESTADO = {
+    ESTADO_NO_NUMERICO: 'no_numerico',
+    ESTADO_TBS_FUERA_RANGO: 'tbs_fuera_rango',
+    ESTADO_HR_FUERA_RANGO: 'hr_fuera_rango',
+    ESTADO_Z_FUERA_RANGO: 'z_fuera_rango',
+    ESTADO_SIN_TPR: 'sin_tpr',
+}
+
+
+def clasificar_estados(z, tbs, hr):
+    """
+    Banderas de validez por muestra (hr ya en fracción).
+    Returns:
+        np.ndarray uint8 con la combinación de banderas ESTADO_*
+    """
+    estado = np.zeros(np.shape(tbs), dtype=np.uint8)
+    no_numerico = ~(np.isfinite(tbs) & np.isfinite(hr) & np.isfinite(z))
+    estado[no_numerico] |= ESTADO_NO_NUMERICO
+    with np.errstate(invalid='ignore'):
+        estado[~no_numerico & ~((tbs > -100) & (tbs < 200))] |= ESTADO_TBS_FUERA_RANGO
+        estado[~no_numerico & ~((hr > 0) & (hr <= 1))] |= ESTADO_HR_FUERA_RANGO
+        estado[~no_numerico & ~((1 - (2.25577 * 10 ** -5) * z) > 0)] |= ESTADO_Z_FUERA_RANGO
+        sin_tpr = ~((tbs > -60) & (tbs < 70))
+    estado[((estado & ESTADOS_INVALIDOS) == 0) & sin_tpr] |= ESTADO_SIN_TPR
+    return estado
+
+
+def resumen_estados(estado):
+    """
+    Cuenta filas por bandera de la columna 'estado'.
+    Returns:
+        dict: {'total', 'validos', 'rechazados', <nombre de bandera>: cuenta}
+    """
+    estado = np.asarray(estado)
+    rechazados = (estado & ESTADOS_INVALIDOS) != 0
+    resumen = {'total': int(estado.size), 'validos': int((~rechazados).sum()),
+               'rechazados': int(rechazados.sum())}
+    for bandera, nombre in NOMBRES_ESTADO.items():
+        resumen[nombre] = int(((estado & bandera) != 0).sum())
+    return resumen
+
+
+def calcular_lote(z, tbs, hr, resolucion=None, deduplicar=False, cache=None, dtype=np.float64,
+                  errores='lanzar', hr_en_fraccion=False):
+    """
+    Calcula propiedades psicrométricas de arreglos completos sin crear un
+    objeto CalculadoraPsicrometrica por muestra.
+    Args:
+        z (float o iterable): altitud msnm, escalar o un valor por muestra
+        tbs (iterable): temperaturas bulbo seco (°C)
+        hr (iterable): humedad relativa (0-1 o 0-100)
+        resolucion (dict, opcional): resolución declarada de cada sensor, p. ej.
+            {'tbs': 0.1, 'hr': 1, 'z': 1}. Las entradas se redondean a esa
+            malla antes de calcular (hr en las mismas unidades de entrada).
+        deduplicar (bool): calcula una sola vez cada tupla (Tbs, HR, z) distinta
+            (incluida la bisección de Tbh) y reparte los resultados con un
+            arreglo de índices.
+        cache (CacheEstados, opcional): caché LRU que conserva estados entre
+            llamadas; implica deduplicar.
+        dtype: np.float64 (referencia) o np.float32 (modo compacto: la mitad
+            de memoria; errores acotados en COTAS_FLOAT32, ver validar_float32).
+        errores (str): 'lanzar' (como calcular_todo, una fila inválida aborta
+            todo el lote) o 'mascara' (las filas inválidas quedan en NaN y
+            nunca se lanza excepción a mitad del lote).
+        hr_en_fraccion (bool): si True, hr siempre está en fracción y no se
+            aplica la regla "hr > 1 es porcentaje".
+    Returns:
+        dict: {campo: np.ndarray} con las columnas de CAMPOS_SALIDA. Tbs_C y
+        HR_frac son los valores ya cuantizados con los que se calculó. Con
+        errores='mascara' incluye además 'estado' (banderas ESTADO_* por fila,
+        ver resumen_estados).
+    """
+    if errores not in ('lanzar', 'mascara'):
+        raise ValueError("errores debe ser 'lanzar' o 'mascara'.")
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("dtype debe ser float32 o float64.")
+    tbs = _como_flotante(tbs, dtype).ravel()
+    hr = _como_flotante(hr, dtype).ravel()
+    if tbs.shape != hr.shape:
+        raise ValueError("tbs y hr deben tener la misma longitud.")
+    z = np.broadcast_to(_como_flotante(z, dtype), tbs.shape)
+
+    resolucion = resolucion or {}
+    tbs = _cuantizar(tbs, resolucion.get('tbs'))
+    hr = _cuantizar(hr, resolucion.get('hr'))
+    z = _cuantizar(z, resolucion.get('z'))
+    if not hr_en_fraccion:
+        hr = np.where(hr > 1.0, hr / 100.0, hr)
+    # sin cuantizar ni convertir, tbs y hr siguen siendo vistas de los arreglos
+    # del llamador; Tbs_C y HR_frac de la salida deben ser copias propias
+    tbs = tbs.copy()
+    hr = hr.copy()
+
+    if errores == 'lanzar':
+        return _resolver_estados(z, tbs, hr, deduplicar, cache, dtype)
+
+    estado = clasificar_estados(z, tbs, hr)
+    invalidos = (estado & ESTADOS_INVALIDOS) != 0
+    # las filas inválidas se calculan con un estado de relleno y luego se enmascaran
+    columnas = _resolver_estados(np.where(invalidos, 0.0, z), np.where(invalidos, 20.0, tbs),
+                                 np.where(invalidos, 0.5, hr), deduplicar, cache, dtype)
+    for campo in CAMPOS_SALIDA:
+        columnas[campo][invalidos] = np.nan
+    columnas['Tbs_C'] = tbs
+    columnas['HR_frac'] = hr
+    columnas['estado'] = estado
+    return columnas
+
+
+def _resolver_estados(z, tbs, hr, deduplicar, cache, dtype):
+    """Calcula las columnas directamente o vía deduplicación / caché."""
+    if not deduplicar and cache is None:
+        return _calcular_columnas(z, tbs, hr)
+
+    entradas = np.column_stack([tbs, hr, z])
+    unicos, indices = np.unique(entradas, axis=0, return_inverse=True)
+    indices = indices.reshape(-1)
+
+    if cache is None:
+        columnas = _calcular_columnas(unicos[:, 2], unicos[:, 0], unicos[:, 1])
+        return {campo: columnas[campo][indices] for campo in CAMPOS_SALIDA}
+
+    # consultar la caché; sólo se calculan los estados que no estén guardados
+    claves = [tuple(fila) for fila in unicos.tolist()]
+    tabla = np.empty((len(claves), len(CAMPOS_SALIDA)), dtype=dtype)
+    faltantes = []
+    for i, clave in enumerate(claves):
+        fila = cache.obtener(clave)
+        if fila is None:
+            faltantes.append(i)
+        else:
+            tabla[i] = fila
+    if faltantes:
+        nuevos = unicos[faltantes]
+        columnas = _calcular_columnas(nuevos[:, 2], nuevos[:, 0], nuevos[:, 1])
+        filas = np.column_stack([columnas[campo] for campo in CAMPOS_SALIDA])
+        tabla[faltantes] = filas
+        for i, fila in zip(faltantes, filas):
+            # copia: una vista de filas mantendría vivo todo el lote en la caché
+            cache.guardar(claves[i], fila.copy())
+
+    tabla = tabla[indices]
+    return {campo: tabla[:, j].copy() for j, campo in enumerate(CAMPOS_SALIDA)}
+
+
+def _filas(columnas, inicio, fin):
+    """Dicts por muestra de las filas inicio..fin-1 (NaN -> None)."""
+    listas = {campo: valores[inicio:fin].tolist() for campo, valores in columnas.items()}
+    resultados = []
+    for valores in zip(*listas.values()):
+        resultados.append({campo: None if valor != valor else valor
+                           for campo, valor in zip(listas, valores)})
+    return resultados
+
+
+class TablaResultados:
+    """
+    Resultados por columnas: un arreglo contiguo por campo (unos 100 bytes
+    por muestra en lugar de un dict). Conserva la interfaz de la lista de
+    dicts que devolvían calcular_vectorial y procesar_archivo: len(),
+    r[i] (dict de la fila, NaN -> None) e iteración por filas. Además
+    r['W_kgkg'] devuelve la columna sin copiarla y r[a:b] otra tabla que
+    comparte memoria con ésta.
+    """
+
+    FILAS_POR_BLOQUE = 10000  # filas que se convierten juntas al iterar
+
+    def __init__(self, columnas):
+        """
+        Args:
+            columnas (dict): {campo: arreglo 1D}, todos de la misma longitud
+                (p. ej. la salida de calcular_lote)
+        """
+        self.columnas = {campo: np.asarray(valores) for campo, valores in columnas.items()}
+        if len({valores.shape for valores in self.columnas.values()}) > 1 or \
+                any(valores.ndim != 1 for valores in self.columnas.values()):
+            raise ValueError("Todas las columnas deben ser arreglos 1D de la misma longitud.")
+
+    @property
+    def campos(self):
+        return list(self.columnas)
+
+    def __len__(self):
+        for valores in self.columnas.values():
+            return valores.size
+        return 0
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            return self.columnas[clave]
+        if isinstance(clave, (int, np.integer)):
+            n = len(self)
+            i = clave + n if clave < 0 else clave
+            if not 0 <= i < n:
+                raise IndexError("Índice de fila fuera de rango.")
+            return _filas(self.columnas, i, i + 1)[0]
+        # rebanada: vistas; arreglo de índices o máscara booleana: copia
+        return TablaResultados({campo: valores[clave] for campo, valores in self.columnas.items()})
+
+    def __iter__(self):
+        for inicio in range(0, len(self), self.FILAS_POR_BLOQUE):
+            yield from _filas(self.columnas, inicio, inicio + self.FILAS_POR_BLOQUE)
+
+    def __add__(self, otra):
+        if not isinstance(otra, TablaResultados):
+            return NotImplemented
+        return TablaResultados.concatenar([self, otra])
+
+    def __repr__(self):
+        return f"TablaResultados({len(self)} filas: {', '.join(self.columnas)})"
+
+    @classmethod
+    def concatenar(cls, tablas):
+        """Une varias tablas con los mismos campos (p. ej. de varios archivos o bloques)."""
+        tablas = list(tablas)
+        if not tablas:
+            raise ValueError("Se necesita al menos una tabla.")
+        campos = tablas[0].campos
+        if any(t.campos != campos for t in tablas):
+            raise ValueError("Sólo se concatenan tablas con los mismos campos.")
+        return cls({campo: np.concatenate([t.columnas[campo] for t in tablas]) for campo in campos})
+
+    def a_numpy(self):
+        """Arreglo estructurado (un campo por columna, cada uno con su dtype)."""
+        arreglo = np.empty(len(self), dtype=[(campo, valores.dtype) for campo, valores in self.columnas.items()])
+        for campo, valores in self.columnas.items():
+            arreglo[campo] = valores
+        return arreglo
+
+    def a_pandas(self):
+        """DataFrame de pandas con las mismas columnas (pandas es opcional)."""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError("Se requiere 'pandas' para a_pandas(); instálalo o usa a_numpy().")
+        return pd.DataFrame(self.columnas, copy=False)
+
+    def a_lista(self):
+        """Lista de dicts por fila, como la que devolvían antes calcular_vectorial y procesar_archivo."""
+        return list(self)
+
+
+# Cotas de error del modo float32 frente a float64 (error absoluto, relativo);
+# se cumple la más holgada. Medidas con validar_float32 sobre 10^6 estados
+# aleatorios (-40..60 °C, HR 1..100 %, z 0..4000 m) con margen ~x3.
+# Tbh no se compara contra float64: la bisección de referencia acepta
+# cualquier Tbh con |residuo| < 0.001 kg/kg, de modo que dos soluciones
+# válidas pueden diferir más de 1 °C (sobre todo cerca de saturación). Para
+# Tbh la cota es ese mismo residuo, evaluado en float64.
+COTAS_FLOAT32 = {
+    'Tbs_C': (1e-5, 1e-6),
+    'HR_frac': (1e-7, 1e-6),
+    'patm_kPa': (1e-4, 1e-6),
+    'pv_Pa': (1e-2, 1e-6),
+    'pvs_Pa': (1e-2, 1e-6),
+    'dpva_Pa': (1e-2, 1e-6),
+    'W_kgkg': (1e-6, 2e-6),
+    'Ws_kgkg': (1e-6, 2e-6),
+    'mu': (1e-6, 1e-6),
+    'veh_m3kg': (3e-6, 2e-6),
+    'h_kJkg': (2e-3, 1e-6),
+    'Tpr_C': (1e-4, 1e-6),
+    'Tbh_C': (0.001 + 1e-6, 0.0),
+}
+
+
+def validar_float32(z, tbs, hr):
+    """
+    Compara calcular_lote en float32 contra float64 para las mismas entradas.
+    Args:
+        z, tbs, hr: como en calcular_lote
+    Returns:
+        dict: {campo: {'max_abs', 'max_rel', 'ok'}}; para Tbh_C, max_abs es el
+        mayor |residuo| de la ecuación psicrométrica (kg/kg) con el Tbh float32.
+    """
+    ref = calcular_lote(z, tbs, hr)
+    compacto = calcular_lote(z, tbs, hr, dtype=np.float32)
+    reporte = {}
+    for campo in CAMPOS_SALIDA:
+        a = ref[campo]
+        b = compacto[campo].astype(np.float64)
+        cota_abs, cota_rel = COTAS_FLOAT32[campo]
+        if campo == 'Tbh_C':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                error = np.abs(_residuo_bulbo_humedo_np(b, ref['Tbs_C'], ref['W_kgkg'], ref['patm_kPa']))
+                error_ref = np.abs(_residuo_bulbo_humedo_np(a, ref['Tbs_C'], ref['W_kgkg'], ref['patm_kPa']))
+            relativo = np.zeros_like(error)
+            # filas con respaldo empírico: basta no empeorar a la referencia
+            cota_abs = np.maximum(cota_abs, error_ref + 1e-6)
+        else:
+            error = np.abs(a - b)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relativo = np.where(a != 0, error / np.abs(a), 0.0)
+        validos = ~np.isnan(error)
+        ok = bool(np.all(((error <= cota_abs) | (relativo <= cota_rel))[validos]))
+        reporte[campo] = {
+            'max_abs': float(np.max(error[validos])) if validos.any() else 0.0,
+            'max_rel': float(np.max(relativo[validos])) if validos.any() else 0.0,
+            'ok': ok,
+        }
+    return reporte
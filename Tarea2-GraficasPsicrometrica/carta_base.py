@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# Eduardo Cano García - Fondo de carta psicrométrica reutilizable
+# Mismo estilo que grafica_est_N.py, pero calculado una vez por altitud y
+# dibujado una vez por figura; sólo la capa de datos cambia entre estaciones.
+from functools import lru_cache
+import hashlib
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from calculos_vec import calcular_lote
+from frecuencias import dibujar_frecuencias
+
+# ========= CONFIGURACIÓN DE LA CARTA =========
+Tbs_vals = [t for t in range(-10, 41, 5)]   # -10 a 40°C
+phi_vals = [i / 100 for i in range(10, 101, 10)]  # 10% a 100%
+
+
+@lru_cache(maxsize=None)
+def _carta_cacheada(z, Tbs_vals, phi_vals):
+    T, PHI = np.meshgrid(Tbs_vals, phi_vals)
+    res = calcular_lote(z, T.ravel(), PHI.ravel())
+    return {clave: res[campo].reshape(T.shape)
+            for clave, campo in (("W", "W_kgkg"), ("H", "h_kJkg"), ("Veh", "veh_m3kg"), ("Tbh", "Tbh_C"))}
+
+
+def generar_carta_lote(z, Tbs_vals=Tbs_vals, phi_vals=phi_vals):
+    """
+    Mismos datos que generar_carta_psicrometrica (W, H, Veh, Tbh por curva de
+    HR), calculados con el motor por lotes y guardados en caché por altitud.
+    """
+    return _carta_cacheada(float(z), tuple(Tbs_vals), tuple(phi_vals))
+
+
+def limites_carta(z, Tbs_vals=Tbs_vals, phi_vals=phi_vals):
+    """Límites de datos (xmin, xmax, ymin, ymax) de la carta para la altitud z."""
+    carta = generar_carta_lote(z, Tbs_vals, phi_vals)
+    return (Tbs_vals[0], Tbs_vals[-1] + 4, 0.0, float(np.nanmax(carta["W"])) * 1.05)
+
+
+def dibujar_fondo(ax, z, Tbs_vals=Tbs_vals, phi_vals=phi_vals):
+    """Dibuja en ax las curvas de HR y los contornos de h, Tbh y v."""
+    carta = generar_carta_lote(z, Tbs_vals, phi_vals)
+    ax.set_xlabel("Temperatura de Bulbo Seco (°C)")
+    ax.set_ylabel("Razón de Humedad W (kg vapor/kg aire seco)")
+
+    # ----------  LÍNEAS DE HUMEDAD RELATIVA ----------
+    for i, hr in enumerate(phi_vals):
+        etiqueta = f"{int(hr * 100)} % HR"
+        ax.plot(Tbs_vals, carta["W"][i], color='blue', alpha=0.4)
+        ax.text(Tbs_vals[-1] + 0.5, carta["W"][i][-1], etiqueta, fontsize=8, color='blue')
+
+    T, PHI = np.meshgrid(Tbs_vals, phi_vals)
+    W = carta["W"]
+    # ----------  LÍNEAS DE ENTALPÍA (h) ----------
+    niveles_h = np.arange(np.nanmin(carta["H"]), np.nanmax(carta["H"]), 50)
+    cs_h = ax.contour(T, W, carta["H"], niveles_h, colors='black', linestyles='--', alpha=0.5)
+    ax.clabel(cs_h, fmt='%d', fontsize=7)
+    # ----------  LÍNEAS DE BULBO HÚMEDO (Tbh) ----------
+    niveles_tbh = np.arange(np.nanmin(carta["Tbh"]), np.nanmax(carta["Tbh"]), 5)
+    cs_tbh = ax.contour(T, W, carta["Tbh"], niveles_tbh, colors='green', linestyles=':', alpha=0.6)
+    ax.clabel(cs_tbh, fmt='%d', fontsize=7)
+    # ----------  LÍNEAS DE VOLUMEN ESPECÍFICO (Veh) ----------
+    niveles_v = np.linspace(np.nanmin(carta["Veh"]), np.nanmax(carta["Veh"]), 6)
+    cs_v = ax.contour(T, W, carta["Veh"], niveles_v, colors='purple', linestyles='-.', alpha=0.5)
+    ax.clabel(cs_v, fmt='%.3f', fontsize=7)
+
+    ax.text(0.02, 0.95, "h [kJ/kg]", color='black', fontsize=9, transform=ax.transAxes)
+    ax.text(0.02, 0.91, "Tbh [°C]", color='green', fontsize=9, transform=ax.transAxes)
+    ax.text(0.02, 0.87, "v [m³/kg]", color='purple', fontsize=9, transform=ax.transAxes)
+
+    # ---------- ESTILO GENERAL ----------
+    ax.grid(True, which="both", linestyle="--", linewidth=0.5)
+    xmin, xmax, ymin, ymax = limites_carta(z, Tbs_vals, phi_vals)
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+
+
+# ========= FONDOS PRE-RENDERIZADOS =========
+_RASTERS = {}
+
+
+def fondo_raster(z, Tbs_vals=Tbs_vals, phi_vals=phi_vals, tamano_px=(1200, 800), directorio_cache=None):
+    """
+    Renderiza una vez el fondo de la carta (área de datos, sin ejes) como
+    imagen RGBA (uint8) cuyos bordes coinciden exactamente con los límites de datos.
+    Se guarda en memoria y, si se indica directorio_cache, en PNG para
+    reutilizarse entre corridas y procesos.
+    Returns:
+        tuple: (imagen (alto, ancho, 4), extent (xmin, xmax, ymin, ymax)) para ax.imshow
+    """
+    clave = (float(z), tuple(Tbs_vals), tuple(phi_vals), tuple(tamano_px))
+    extent = limites_carta(z, Tbs_vals, phi_vals)
+    if clave in _RASTERS:
+        return _RASTERS[clave], extent
+
+    ruta = None
+    if directorio_cache:
+        huella = hashlib.md5(repr(clave).encode('utf-8')).hexdigest()[:12]
+        ruta = os.path.join(directorio_cache, f"fondo_z{float(z):g}_{huella}.png")
+    if ruta and os.path.exists(ruta):
+        # RGBA uint8: matplotlib la dibuja sin convertirla en cada guardado
+        imagen = (plt.imread(ruta) * 255).round().astype(np.uint8)
+    else:
+        dpi = 100
+        fig = plt.figure(figsize=(tamano_px[0] / dpi, tamano_px[1] / dpi), dpi=dpi)
+        # ejes ocupando todo el lienzo: pixel (0, 0) = (xmin, ymax)
+        ax = fig.add_axes([0, 0, 1, 1])
+        dibujar_fondo(ax, z, Tbs_vals, phi_vals)
+        ax.set_xlabel('')
+        ax.set_ylabel('')
+        ax.tick_params(which='both', length=0, labelbottom=False, labelleft=False)
+        for borde in ax.spines.values():
+            borde.set_visible(False)
+        fig.canvas.draw()
+        imagen = np.asarray(fig.canvas.buffer_rgba()).copy()
+        plt.close(fig)
+        if ruta:
+            os.makedirs(directorio_cache, exist_ok=True)
+            plt.imsave(ruta, imagen)
+    _RASTERS[clave] = imagen
+    return imagen, extent
+
+
+def dibujar_fondo_raster(ax, z, Tbs_vals=Tbs_vals, phi_vals=phi_vals, tamano_px=None,
+                         directorio_cache=None):
+    """
+    Coloca el fondo pre-renderizado en ax; sólo las capas de datos quedan
+    vectoriales. Con tamano_px=None la imagen se genera al tamaño en pixeles
+    que ocupa ax, así no hay que re-muestrearla al guardar (llamar después de
+    tight_layout).
+    """
+    extent = limites_carta(z, Tbs_vals, phi_vals)
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    ax.set_xlabel("Temperatura de Bulbo Seco (°C)")
+    ax.set_ylabel("Razón de Humedad W (kg vapor/kg aire seco)")
+    if tamano_px is None:
+        caja = ax.get_window_extent()
+        tamano_px = (int(round(caja.width)), int(round(caja.height)))
+    imagen, extent = fondo_raster(z, Tbs_vals, phi_vals, tamano_px, directorio_cache)
+    ax.imshow(imagen, extent=extent, aspect='auto', interpolation='none', zorder=0)
+
+
+class CartaReutilizable:
+    """
+    Una figura por altitud con el fondo ya dibujado; para cada estación sólo
+    se actualizan el título y los puntos medidos.
+    Con raster=True el fondo es una imagen pre-renderizada (fondo_raster).
+    """
+
+    def __init__(self, Tbs_vals=Tbs_vals, phi_vals=phi_vals, figsize=(12, 8), raster=False,
+                 directorio_cache=None):
+        self.Tbs_vals = Tbs_vals
+        self.phi_vals = phi_vals
+        self.figsize = figsize
+        self.raster = raster
+        self.directorio_cache = directorio_cache
+        self._figuras = {}
+        self._capas = {}  # capa de frecuencias vigente por altitud
+
+    def _obtener(self, z):
+        if z not in self._figuras:
+            fig, ax = plt.subplots(figsize=self.figsize)
+            puntos = ax.scatter([], [], color='red', s=60, edgecolors='black', zorder=5)
+            if self.raster:
+                # primero el acomodo de la figura, luego la imagen al tamaño final de ax
+                xmin, xmax, ymin, ymax = limites_carta(z, self.Tbs_vals, self.phi_vals)
+                ax.set_title(" ", fontsize=14)
+                ax.set_xlabel("Temperatura de Bulbo Seco (°C)")
+                ax.set_ylabel("Razón de Humedad W (kg vapor/kg aire seco)")
+                ax.set_xlim(xmin, xmax)
+                ax.set_ylim(ymin, ymax)
+                fig.tight_layout()
+                dibujar_fondo_raster(ax, z, self.Tbs_vals, self.phi_vals,
+                                     directorio_cache=self.directorio_cache)
+            else:
+                dibujar_fondo(ax, z, self.Tbs_vals, self.phi_vals)
+                fig.tight_layout()
+            self._figuras[z] = (fig, ax, puntos)
+        return self._figuras[z]
+
+    def graficar(self, z, tbs, w, titulo="Carta Psicrométrica - Aire Húmedo"):
+        """Coloca los puntos (Tbs, W) sobre el fondo de la altitud z y devuelve la figura."""
+        fig, ax, puntos = self._obtener(float(z))
+        self._quitar_capa(float(z))
+        ax.set_title(titulo, fontsize=14)
+        puntos.set_offsets(np.column_stack([np.asarray(tbs, dtype=float), np.asarray(w, dtype=float)]))
+        return fig
+
+    def graficar_frecuencias(self, z, tabla, titulo="Frecuencia de condiciones (horas por celda)"):
+        """
+        Dibuja una TablaFrecuencias (ejes Tbs_C, W_kgkg) como capa de calor
+        sobre el fondo de la altitud z, en lugar de los puntos medidos.
+        """
+        z = float(z)
+        fig, ax, puntos = self._obtener(z)
+        ax.set_title(titulo, fontsize=14)
+        puntos.set_offsets(np.empty((0, 2)))
+        self._quitar_capa(z)
+        self._capas[z] = dibujar_frecuencias(ax, tabla)
+        return fig
+
+    def _quitar_capa(self, z):
+        """Quita la capa de frecuencias (y su barra de color) de la figura de z, si la hay."""
+        capa = self._capas.pop(z, None)
+        if capa is not None:
+            capa.colorbar.ax.remove()
+            capa.remove()
+
+    def cerrar(self):
+        for fig, _, _ in self._figuras.values():
+            plt.close(fig)
+        self._figuras.clear()
+        self._capas.clear()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Eduardo Cano García - Tablas de frecuencia por celdas (Tbs, W) o (Tbs, Tbh)
+# para análisis de condiciones de diseño: horas por celda y promedios
+# coincidentes, acumuladas por bloques y combinables entre procesos
+import csv
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.colors import LogNorm
+from calculos_vec import calcular_lote, iterar_columnas
+
+# Bordes por defecto de cada eje (mismas unidades que las columnas de calcular_lote)
+BORDES = {
+    'Tbs_C': np.arange(-10.0, 45.0 + 0.5, 1.0),
+    'W_kgkg': np.arange(0.0, 0.030 + 0.00025, 0.0005),
+    'Tbh_C': np.arange(-15.0, 35.0 + 0.5, 1.0),
+    'HR_frac': np.arange(0.0, 1.0 + 0.025, 0.05),
+}
+COINCIDENTES = ('h_kJkg', 'HR_frac', 'Tbh_C')
+
+
+class TablaFrecuencias:
+    """
+    Acumulador de 2 o 3 dimensiones: número de muestras por celda y suma de
+    las variables coincidentes para obtener su promedio en cada celda.
+    Dos tablas con los mismos ejes se combinan sumando sus arreglos, así que
+    cada bloque o proceso puede llenar la suya y juntarlas al final.
+    """
+
+    def __init__(self, ejes=('Tbs_C', 'W_kgkg'), bordes=None, coincidentes=COINCIDENTES, horas_por_muestra=1.0):
+        """
+        Args:
+            ejes (tuple): 2 o 3 columnas de calcular_lote (p. ej. ('Tbs_C', 'Tbh_C'))
+            bordes (dict, opcional): {eje: bordes crecientes}; por defecto BORDES
+            coincidentes (tuple): columnas a promediar por celda
+            horas_por_muestra (float): 1 para datos horarios, 1/6 para 10 min
+        """
+        if len(ejes) not in (2, 3):
+            raise ValueError("La tabla debe tener 2 o 3 ejes.")
+        bordes = bordes or {}
+        self.ejes = tuple(ejes)
+        self.bordes = {e: np.asarray(bordes.get(e, BORDES.get(e)), dtype=float) for e in self.ejes}
+        for eje, b in self.bordes.items():
+            if b.ndim != 1 or b.size < 2 or np.any(np.diff(b) <= 0):
+                raise ValueError(f"Bordes inválidos para {eje}: se esperan al menos 2 valores crecientes.")
+        self.coincidentes = tuple(c for c in coincidentes if c not in self.ejes)
+        self.horas_por_muestra = horas_por_muestra
+        self.forma = tuple(self.bordes[e].size - 1 for e in self.ejes)
+        self.conteo = np.zeros(self.forma, dtype=np.int64)
+        self.sumas = {c: np.zeros(self.forma) for c in self.coincidentes}
+        self.validos = {c: np.zeros(self.forma, dtype=np.int64) for c in self.coincidentes}
+        self.fuera = 0  # muestras con algún eje NaN o fuera de los bordes
+
+    def agregar(self, columnas):
+        """
+        Suma un bloque de resultados (dict de columnas, p. ej. de calcular_lote).
+        Returns:
+            TablaFrecuencias: la misma tabla, para encadenar
+        """
+        n = len(columnas[self.ejes[0]])
+        dentro = np.ones(n, dtype=bool)
+        indices = []
+        for eje in self.ejes:
+            valores = np.asarray(columnas[eje], dtype=float)
+            bordes = self.bordes[eje]
+            # searchsorted sirve igual para bordes uniformes o no; el borde final es inclusivo
+            i = np.searchsorted(bordes, valores, side='right') - 1
+            i[valores == bordes[-1]] = bordes.size - 2
+            with np.errstate(invalid='ignore'):
+                dentro &= (i >= 0) & (i < bordes.size - 1) & np.isfinite(valores)
+            indices.append(i)
+        self.fuera += int(n - dentro.sum())
+        celda = np.ravel_multi_index([i[dentro] for i in indices], self.forma)
+        tamano = self.conteo.size
+        self.conteo += np.bincount(celda, minlength=tamano).reshape(self.forma)
+        for c in self.coincidentes:
+            valores = np.asarray(columnas[c], dtype=float)[dentro]
+            finitos = np.isfinite(valores)
+            self.sumas[c] += np.bincount(celda[finitos], weights=valores[finitos], minlength=tamano).reshape(self.forma)
+            self.validos[c] += np.bincount(celda[finitos], minlength=tamano).reshape(self.forma)
+        return self
+
+    def combinar(self, otra):
+        """Suma otra tabla con los mismos ejes y bordes (de otro bloque o proceso)."""
+        if otra.ejes != self.ejes or any(not np.array_equal(self.bordes[e], otra.bordes[e]) for e in self.ejes) \
+                or otra.coincidentes != self.coincidentes:
+            raise ValueError("Sólo se combinan tablas con los mismos ejes, bordes y coincidentes.")
+        self.conteo += otra.conteo
+        for c in self.coincidentes:
+            self.sumas[c] += otra.sumas[c]
+            self.validos[c] += otra.validos[c]
+        self.fuera += otra.fuera
+        return self
+
+    def __iadd__(self, otra):
+        return self.combinar(otra)
+
+    @property
+    def horas(self):
+        return self.conteo * self.horas_por_muestra
+
+    def promedio(self, campo):
+        """Promedio coincidente de campo en cada celda (NaN en celdas vacías)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.validos[campo] > 0, self.sumas[campo] / self.validos[campo], np.nan)
+
+    def tabla(self):
+        """
+        Celdas con al menos una muestra, en orden de los ejes.
+        Returns:
+            list: dicts con '<eje>_min', '<eje>_max', 'horas', 'fraccion' y
+            'promedio_<campo>' por cada coincidente
+        """
+        ocupadas = np.nonzero(self.conteo)
+        total = self.conteo.sum()
+        filas = {}
+        for eje, i in zip(self.ejes, ocupadas):
+            filas[eje + '_min'] = self.bordes[eje][i]
+            filas[eje + '_max'] = self.bordes[eje][i + 1]
+        filas['horas'] = self.horas[ocupadas]
+        filas['fraccion'] = self.conteo[ocupadas] / total if total else self.conteo[ocupadas] * 0.0
+        for c in self.coincidentes:
+            filas['promedio_' + c] = self.promedio(c)[ocupadas]
+        nombres = list(filas)
+        return [dict(zip(nombres, valores)) for valores in zip(*[filas[n].tolist() for n in nombres])]
+
+    def exportar_csv(self, ruta):
+        """Escribe tabla() en un CSV (una fila por celda ocupada)."""
+        filas = self.tabla()
+        with open(ruta, 'w', newline='', encoding='utf-8') as f:
+            nombres = [e + s for e in self.ejes for s in ('_min', '_max')] + ['horas', 'fraccion'] + \
+                      ['promedio_' + c for c in self.coincidentes]
+            escritor = csv.DictWriter(f, fieldnames=nombres)
+            escritor.writeheader()
+            escritor.writerows(filas)
+        return len(filas)
+
+
+def dibujar_frecuencias(ax, tabla, cmap='YlOrRd', alpha=0.75, escala_log=True, barra=True):
+    """
+    Capa de calor de horas por celda sobre la carta (ejes Tbs_C y W_kgkg; un
+    tercer eje se suma). Las celdas vacías quedan transparentes.
+    Returns:
+        QuadMesh de matplotlib (su barra de color queda en .colorbar)
+    """
+    if tabla.ejes[:2] != ('Tbs_C', 'W_kgkg'):
+        raise ValueError("Sólo las tablas con ejes (Tbs_C, W_kgkg, ...) se dibujan sobre la carta.")
+    horas = tabla.horas
+    if horas.ndim == 3:
+        horas = horas.sum(axis=2)
+    horas = np.ma.masked_equal(horas.T, 0)
+    norma = LogNorm(vmin=max(horas.min(), tabla.horas_por_muestra), vmax=horas.max()) \
+        if escala_log and horas.count() else None
+    malla = ax.pcolormesh(tabla.bordes['Tbs_C'], tabla.bordes['W_kgkg'], horas, cmap=cmap, alpha=alpha,
+                          norm=norma, shading='flat', zorder=1)
+    if barra:
+        # dentro de ax, en la zona sobre la curva de saturación (siempre vacía),
+        # para no cambiar el acomodo de la figura ni el tamaño del fondo
+        ax.figure.colorbar(malla, cax=ax.inset_axes([0.03, 0.42, 0.015, 0.38]), label='Horas por celda')
+    return malla
+
+
+def _tabla_archivo(archivo, z, opciones):
+    """
+    Tabla de un archivo, leído y calculado por bloques de líneas (la memoria
+    no crece con el archivo); función de módulo para ProcessPoolExecutor.
+    """
+    tabla = TablaFrecuencias(**opciones)
+    for datos in iterar_columnas(archivo, ('tbs', 'hr')):
+        tabla.agregar(calcular_lote(z, datos['tbs'], datos['hr'], errores='mascara', deduplicar=True))
+    return tabla
+
+
+def frecuencias_archivos(estaciones, trabajadores=None, **opciones):
+    """
+    Una tabla por archivo en procesos paralelos, combinadas en una sola.
+    Args:
+        estaciones (list): dicts con 'archivo' y 'z' (como en reporte_estaciones)
+        trabajadores (int, opcional): procesos; por defecto os.cpu_count()
+        opciones: argumentos de TablaFrecuencias
+    Returns:
+        TablaFrecuencias
+    """
+    total = TablaFrecuencias(**opciones)
+    with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+        futuros = [ejecutor.submit(_tabla_archivo, e['archivo'], e['z'], opciones) for e in estaciones]
+        for futuro in futuros:
+            total.combinar(futuro.result())
+    return total
@@ -44,12 +44,8 @@ carta = generar_carta_psicrometrica(Z, Tbs_vals, phi_vals)
 archivo_excel = "estacion_1.csv"
 tbs_medidos, hr_medidos = leer_csv_o_txt(archivo_excel)  # tu función detecta Excel si es xlsx
 
-# Calcular W de cada punto usando la clase
-W_medidos = []
-for Tbs, HR in zip(tbs_medidos, hr_medidos):
-    calc = CalculadoraPsicrometrica(Z, Tbs, HR)
-    res = calc.calcular_todo()
-    W_medidos.append(res['W_kgkg'])
+# Calcular W de cada punto usando la clase (la columna W_kgkg ya es un arreglo)
+W_medidos = calcular_vectorial(Z, tbs_medidos, hr_medidos)['W_kgkg']
 
 
 # ========= GRAFICAR =========
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Eduardo Cano García - Reporte de varias estaciones EMA en un solo PDF o HTML
+# Reemplaza correr grafica_est_1/2/3.py por separado: las figuras y los fondos
+# por altitud se reutilizan entre estaciones.
+import base64
+import html
+import io
+import os
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from calculos_vec import CacheEstados, calcular_lote, leer_columnas, resumen_estados
+from carta_base import CartaReutilizable
+
+# ========= ESTACIONES =========
+ESTACIONES = [
+    {'nombre': 'Estación 1', 'archivo': 'estacion_1.csv', 'z': 1562},
+    {'nombre': 'Estación 2', 'archivo': 'estacion_2.csv', 'z': 2022},
+    {'nombre': 'Estación 3', 'archivo': 'estacion_3.csv', 'z': 2451},
+]
+
+# Propiedades resumidas en la tabla: (columna, encabezado, escala, decimales)
+PROPIEDADES_TABLA = [
+    ('Tbs_C', 'Tbs (°C)', 1, 2),
+    ('HR_frac', 'HR (%)', 100, 1),
+    ('pv_Pa', 'Pv (kPa)', 1e-3, 4),
+    ('dpva_Pa', 'DPVa (Pa)', 1, 1),
+    ('W_kgkg', 'W (kg/kg)', 1, 6),
+    ('veh_m3kg', 'veh (m³/kg)', 1, 4),
+    ('h_kJkg', 'h (kJ/kg)', 1, 2),
+    ('Tpr_C', 'Tpr (°C)', 1, 2),
+    ('Tbh_C', 'Tbh (°C)', 1, 2),
+]
+
+
+def resumir_columnas(columnas):
+    """
+    Tabla resumen (mínimo, media, máximo) de cada propiedad de PROPIEDADES_TABLA.
+    Returns:
+        list: filas [encabezado, min, media, max] ya formateadas
+    """
+    filas = []
+    for campo, encabezado, escala, decimales in PROPIEDADES_TABLA:
+        valores = np.asarray(columnas[campo], dtype=float) * escala
+        if np.all(np.isnan(valores)):
+            filas.append([encabezado, '-', '-', '-'])
+            continue
+        filas.append([encabezado] + [f"{v:.{decimales}f}" for v in
+                                     (np.nanmin(valores), np.nanmean(valores), np.nanmax(valores))])
+    return filas
+
+
+def _procesar_estacion(estacion, cache):
+    datos, informe = leer_columnas(estacion['archivo'], ('tbs', 'hr'))
+    columnas = calcular_lote(estacion['z'], datos['tbs'], datos['hr'], deduplicar=True, cache=cache,
+                             resolucion=estacion.get('resolucion'), errores='mascara')
+    return columnas, informe
+
+
+def _figura_a_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def generar_reporte(estaciones=ESTACIONES, salida='reporte_estaciones.pdf', fondo_raster=False,
+                    directorio_cache=None):
+    """
+    Genera un reporte con una carta psicrométrica y una tabla de propiedades
+    por estación.
+    Args:
+        estaciones (list): dicts con 'nombre', 'archivo' (CSV/TXT con Tbs y HR),
+            'z' (msnm) y opcionalmente 'resolucion' (ver calcular_lote)
+        salida (str): ruta .pdf (multipágina) o .html (estático, imágenes embebidas)
+        fondo_raster (bool): usar fondos pre-renderizados (ver carta_base.fondo_raster)
+        directorio_cache (str, opcional): carpeta donde persistir esos fondos
+    Returns:
+        dict: {nombre: resumen_estados} con las filas válidas/rechazadas y
+        'filas_ilegibles' (filas del archivo que no se pudieron leer)
+    """
+    formato = os.path.splitext(salida)[1].lower()
+    if formato not in ('.pdf', '.html'):
+        raise ValueError("La salida debe ser .pdf o .html")
+
+    cartas = CartaReutilizable(raster=fondo_raster, directorio_cache=directorio_cache)
+    cache = CacheEstados()
+    fig_tabla, ax_tabla = plt.subplots(figsize=(12, 4))
+    encabezados = ['Propiedad', 'Mínimo', 'Media', 'Máximo']
+    secciones_html = []
+    resumenes = {}
+    pdf = PdfPages(salida) if formato == '.pdf' else None
+    try:
+        for estacion in estaciones:
+            if not os.path.exists(estacion['archivo']):
+                print(f"Error: El archivo {estacion['archivo']} no existe.")
+                continue
+            columnas, informe = _procesar_estacion(estacion, cache)
+            resumenes[estacion['nombre']] = resumen_estados(columnas['estado'])
+            resumenes[estacion['nombre']]['filas_ilegibles'] = informe['invalidas']
+            titulo = f"Carta Psicrométrica - {estacion['nombre']} (Z={estacion['z']} m)"
+            fig = cartas.graficar(estacion['z'], columnas['Tbs_C'], columnas['W_kgkg'], titulo)
+            filas = resumir_columnas(columnas)
+
+            if pdf is not None:
+                pdf.savefig(fig)
+                ax_tabla.clear()
+                ax_tabla.axis('off')
+                ax_tabla.set_title(f"{estacion['nombre']} - {resumenes[estacion['nombre']]['validos']} muestras válidas")
+                tabla = ax_tabla.table(cellText=filas, colLabels=encabezados, loc='center', cellLoc='center')
+                tabla.scale(1, 1.4)
+                pdf.savefig(fig_tabla)
+            else:
+                celdas = ''.join('<tr>' + ''.join(f'<td>{html.escape(c)}</td>' for c in fila) + '</tr>'
+                                 for fila in filas)
+                secciones_html.append(
+                    f"<h2>{html.escape(estacion['nombre'])}</h2>"
+                    f"<img src=\"data:image/png;base64,{_figura_a_png(fig)}\">"
+                    f"<table><tr>{''.join(f'<th>{h}</th>' for h in encabezados)}</tr>{celdas}</table>"
+                    f"<p>Muestras válidas: {resumenes[estacion['nombre']]['validos']}, "
+                    f"rechazadas: {resumenes[estacion['nombre']]['rechazados']}, "
+                    f"filas no numéricas: {informe['invalidas']}</p>")
+    finally:
+        if pdf is not None:
+            pdf.close()
+        cartas.cerrar()
+        plt.close(fig_tabla)
+
+    if formato == '.html':
+        with open(salida, 'w', encoding='utf-8') as f:
+            f.write("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Reporte de estaciones</title>"
+                    "<style>table{border-collapse:collapse}td,th{border:1px solid #999;padding:4px 8px}</style>"
+                    "</head><body><h1>Reporte de estaciones EMA</h1>" + ''.join(secciones_html) + "</body></html>")
+    return resumenes
+
+
+if __name__ == '__main__':
+    # sin ventanas: sólo como script, para no cambiar el backend de quien importe el módulo
+    matplotlib.use('Agg')
+    generar_reporte(ESTACIONES, 'reporte_estaciones.pdf')
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# Eduardo Cano García - Unión por marca de tiempo de varias estaciones y
+# diferencias entre ellas (p. ej. Teziutlán contra Tecamachalco) en una
+# sola pasada por bloques
+import numpy as np
+from calculos_vec import ESTADO_NO_NUMERICO, calcular_lote
+
+# Diferencias por defecto: W, h y DPV, más las corregidas por altitud de derivadas()
+CAMPOS_DIFERENCIA = ['Tbs_C', 'W_kgkg', 'h_kJkg', 'dpva_Pa', 'theta_C', 'xv']
+P_REFERENCIA = 100.0  # kPa, presión de referencia de la temperatura potencial
+KAPPA = 0.2857        # R/cp del aire seco
+
+
+def _a_segundos(tiempos):
+    t = np.asarray(tiempos)
+    if t.dtype.kind == 'M':
+        return t.astype('datetime64[s]').astype(np.int64)
+    return t.astype(np.int64)
+
+
+def _sin_dato(campo, dtype):
+    """Relleno de una marca sin lectura: NaN, o ESTADO_NO_NUMERICO en 'estado' (0 sería OK)."""
+    if np.dtype(dtype).kind == 'f':
+        return np.nan
+    return ESTADO_NO_NUMERICO if campo == 'estado' else 0
+
+
+def bloques_lote(tiempos, z, tbs, hr, filas_por_bloque=1000000, **opciones_lote):
+    """
+    Flujo de resultados de una estación: calcular_lote por bloques con su
+    columna 'tiempo' (entrada típica de unir).
+    Yields:
+        dict: columnas de calcular_lote más 'tiempo'
+    """
+    opciones_lote.setdefault('errores', 'mascara')
+    opciones_lote.setdefault('deduplicar', True)
+    for inicio in range(0, len(tiempos), filas_por_bloque):
+        fin = inicio + filas_por_bloque
+        columnas = calcular_lote(z, tbs[inicio:fin], hr[inicio:fin], **opciones_lote)
+        columnas['tiempo'] = np.asarray(tiempos[inicio:fin])
+        yield columnas
+
+
+def derivadas(columnas):
+    """
+    Propiedades comparables entre altitudes distintas, a partir de las
+    columnas de calcular_lote:
+        theta_C: temperatura potencial (Tbs llevada a P_REFERENCIA)
+        xv: fracción molar de vapor, pv / patm
+        rho_kgm3: densidad del aire húmedo, (1 + W) / veh
+    Returns:
+        dict: las tres columnas nuevas
+    """
+    patm = columnas['patm_kPa']
+    return {
+        'theta_C': (columnas['Tbs_C'] + 273.15) * (P_REFERENCIA / patm) ** KAPPA - 273.15,
+        'xv': columnas['pv_Pa'] / (1000.0 * patm),
+        'rho_kgm3': (1.0 + columnas['W_kgkg']) / columnas['veh_m3kg'],
+    }
+
+
+class UnionEstaciones:
+    """
+    Alinea flujos de varias estaciones en una malla común de intervalo_s
+    segundos (alineada al reloj). Cada estación se agrega por bloques
+    ordenados; extraer() entrega sólo las marcas de la malla que ya no
+    pueden cambiar, es decir, anteriores a la última lectura de la estación
+    más atrasada (menos la tolerancia). Así la memoria se limita a lo que
+    separa a las estaciones entre sí. Una estación marcada con terminar() ya
+    no detiene la entrega de las demás.
+    """
+
+    def __init__(self, nombres, intervalo_s=600, tolerancia_s=None, metodo='cercano', campos=None):
+        """
+        Args:
+            nombres (list): estaciones a unir
+            intervalo_s (int): paso de la malla común
+            tolerancia_s (int, opcional): distancia máxima a la marca de la
+                malla para metodo='cercano'; por defecto intervalo_s / 2
+            metodo (str): 'cercano' (la lectura más próxima dentro de la
+                tolerancia) o 'promedio' (media de las lecturas en
+                [marca - intervalo/2, marca + intervalo/2))
+            campos (list, opcional): columnas a conservar; por defecto todas
+        """
+        if metodo not in ('cercano', 'promedio'):
+            raise ValueError("metodo debe ser 'cercano' o 'promedio'.")
+        self.nombres = list(nombres)
+        self.intervalo_s = int(intervalo_s)
+        self.tolerancia_s = self.intervalo_s // 2 if tolerancia_s is None else int(tolerancia_s)
+        self.metodo = metodo
+        self.campos = campos
+        # bloques pendientes por estación; se juntan sólo al extraer
+        self._tiempos = {n: [] for n in self.nombres}
+        self._columnas = {n: [] for n in self.nombres}
+        self._ultima = {n: None for n in self.nombres}
+        self._terminadas = set()
+        self._siguiente = None  # primera marca de la malla aún no entregada
+        self._primera = None    # lectura más antigua recibida antes de la primera entrega
+        self._es_fecha = False
+
+    @property
+    def _alcance(self):
+        # distancia máxima entre una lectura y la marca a la que puede aportar
+        return self.tolerancia_s if self.metodo == 'cercano' else self.intervalo_s // 2
+
+    def ultima(self, nombre):
+        """Segundos de la última lectura recibida de una estación (None si ninguna)."""
+        return self._ultima[nombre]
+
+    def terminar(self, nombre):
+        """Indica que una estación ya no enviará más bloques."""
+        self._terminadas.add(nombre)
+
+    def agregar(self, nombre, bloque):
+        """
+        Args:
+            nombre (str): estación
+            bloque (dict): 'tiempo' (segundos o datetime64, ordenado) y columnas
+        """
+        tiempo = np.asarray(bloque['tiempo'])
+        self._es_fecha = self._es_fecha or tiempo.dtype.kind == 'M'
+        s = _a_segundos(tiempo)
+        if s.size == 0:
+            return
+        if self._ultima[nombre] is not None and s[0] < self._ultima[nombre]:
+            raise ValueError(f"{nombre}: los bloques deben llegar ordenados por tiempo.")
+        campos = self.campos or [c for c in bloque if c != 'tiempo']
+        self._columnas[nombre].append({c: np.asarray(bloque[c]) for c in campos})
+        self._tiempos[nombre].append(s)
+        self._ultima[nombre] = int(s[-1])
+        if self._siguiente is None:
+            self._primera = int(s[0]) if self._primera is None else min(self._primera, int(s[0]))
+
+    def _juntar(self, nombre):
+        """Pendientes de una estación como (tiempos, columnas) contiguos."""
+        if len(self._tiempos[nombre]) > 1:
+            bloques = self._columnas[nombre]
+            self._tiempos[nombre] = [np.concatenate(self._tiempos[nombre])]
+            self._columnas[nombre] = [{c: np.concatenate([b[c] for b in bloques]) for c in bloques[0]}]
+        if not self._tiempos[nombre]:
+            return np.empty(0, dtype=np.int64), {c: np.empty(0) for c in (self.campos or [])}
+        return self._tiempos[nombre][0], self._columnas[nombre][0]
+
+    def _alinear(self, nombre, malla):
+        t, columnas = self._juntar(nombre)
+        salida = {}
+        if t.size == 0:
+            salida = {c: np.full(malla.size, _sin_dato(c, v.dtype), dtype=v.dtype) for c, v in columnas.items()}
+            if self.metodo == 'promedio':
+                salida['n'] = np.zeros(malla.size, dtype=np.int64)
+            return salida
+        if self.metodo == 'cercano':
+            derecha = np.clip(np.searchsorted(t, malla), 0, t.size - 1)
+            izquierda = np.clip(derecha - 1, 0, t.size - 1)
+            usar_izq = np.abs(t[izquierda] - malla) <= np.abs(t[derecha] - malla)
+            indice = np.where(usar_izq, izquierda, derecha)
+            valido = np.abs(t[indice] - malla) <= self.tolerancia_s
+            for c, v in columnas.items():
+                salida[c] = np.where(valido, v[indice], _sin_dato(c, v.dtype)).astype(v.dtype)
+            return salida
+        # promedio por celda de la malla, con np.bincount
+        celda = (t - malla[0] + self.intervalo_s // 2) // self.intervalo_s
+        dentro = (celda >= 0) & (celda < malla.size)
+        celda = celda[dentro]
+        conteo = np.bincount(celda, minlength=malla.size)
+        for c, v in columnas.items():
+            v = v[dentro].astype(float)
+            finitos = np.isfinite(v)
+            suma = np.bincount(celda[finitos], weights=v[finitos], minlength=malla.size)
+            n = np.bincount(celda[finitos], minlength=malla.size)
+            with np.errstate(invalid='ignore'):
+                salida[c] = np.where(n > 0, suma / np.maximum(n, 1), np.nan)
+        salida['n'] = conteo
+        return salida
+
+    def extraer(self, final=False):
+        """
+        Entrega las marcas de la malla ya definitivas (todas con final=True).
+        Returns:
+            dict: 'tiempo' y {'estaciones': {nombre: {campo: arreglo}}}, o
+            None si todavía no hay marcas definitivas
+        """
+        if self._primera is None:
+            return None
+        if self._siguiente is None:
+            # primera marca a la que puede aportar la lectura más antigua
+            self._siguiente = -(-(self._primera - self._alcance) // self.intervalo_s) * self.intervalo_s
+        activas = [self.ultima(n) for n in self.nombres if n not in self._terminadas]
+        if final or not activas:
+            conocidas = [u for u in map(self.ultima, self.nombres) if u is not None]
+            if not conocidas:
+                return None
+            limite = max(conocidas) + self._alcance
+        else:
+            if any(u is None for u in activas):
+                return None
+            # una marca es definitiva si ninguna lectura futura puede aportarle;
+            # las estaciones terminadas ya no recibirán lecturas
+            limite = min(activas) - self._alcance - 1
+        ultima_marca = limite // self.intervalo_s * self.intervalo_s
+        if ultima_marca < self._siguiente:
+            return None
+        malla = np.arange(self._siguiente, ultima_marca + 1, self.intervalo_s, dtype=np.int64)
+        estaciones = {n: self._alinear(n, malla) for n in self.nombres}
+        self._siguiente = int(malla[-1]) + self.intervalo_s
+        # se descartan las lecturas que ya no pueden aportar a marcas futuras
+        for n in self.nombres:
+            t, columnas = self._juntar(n)
+            if t.size:
+                conservar = np.searchsorted(t, self._siguiente - self._alcance)
+                self._tiempos[n] = [t[conservar:]]
+                self._columnas[n] = [{c: v[conservar:] for c, v in columnas.items()}]
+        return {'tiempo': malla.astype('datetime64[s]') if self._es_fecha else malla,
+                'estaciones': estaciones}
+
+
+def unir(fuentes, intervalo_s=600, tolerancia_s=None, metodo='cercano', campos=None):
+    """
+    Mezcla ordenada de varios flujos por bloques: siempre se lee el siguiente
+    bloque de la estación más atrasada y se entrega lo que ya es definitivo.
+    Cuando una estación se agota, las demás siguen entregándose por bloques.
+    Args:
+        fuentes (dict): {nombre: iterable de bloques} (p. ej. bloques_lote)
+        resto: ver UnionEstaciones
+    Yields:
+        dict: bloques alineados (ver UnionEstaciones.extraer)
+    """
+    union = UnionEstaciones(list(fuentes), intervalo_s, tolerancia_s, metodo, campos)
+    iteradores = {n: iter(f) for n, f in fuentes.items()}
+    while iteradores:
+        # la estación sin datos o con la última lectura más antigua va primero
+        nombre = min(iteradores, key=lambda n: (union.ultima(n) is not None,
+                                                union.ultima(n) or 0))
+        try:
+            union.agregar(nombre, next(iteradores[nombre]))
+        except StopIteration:
+            del iteradores[nombre]
+            union.terminar(nombre)
+        bloque = union.extraer()
+        if bloque is not None:
+            yield bloque
+    bloque = union.extraer(final=True)
+    if bloque is not None:
+        yield bloque
+
+
+def diferencias(bloque, estacion_a, estacion_b, campos=CAMPOS_DIFERENCIA):
+    """
+    Diferencias A - B marca por marca de un bloque alineado. Los campos de
+    derivadas() (theta_C, xv, rho_kgm3) se calculan si no vienen en el bloque.
+    Returns:
+        dict: 'tiempo' y 'd' + campo para cada campo (p. ej. 'dW_kgkg', 'ddpva_Pa')
+    """
+    a = dict(bloque['estaciones'][estacion_a])
+    b = dict(bloque['estaciones'][estacion_b])
+    for columnas in (a, b):
+        if any(c not in columnas for c in campos):
+            columnas.update(derivadas(columnas))
+    salida = {'tiempo': bloque['tiempo']}
+    for c in campos:
+        salida['d' + c] = a[c] - b[c]
+    return salida